@@ -0,0 +1,188 @@
+"""
+Structured, leveled logging for the app and its helpers.
+
+Records are written as one JSON object per line carrying the request's
+correlation ID, so the lines from a single request can be grepped together.
+Logging calls only enqueue the record; a listener thread per process does
+the formatting and the stdout writes, so request threads never block on log
+I/O. Large debug payloads (result sets, response bodies) go through
+log_payload(), which serializes nothing unless DEBUG is enabled and the
+request is picked by LOG_DEBUG_SAMPLE_RATE.
+"""
+
+import atexit
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+
+from flask import g, has_request_context, request
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")  # "json" or "text"
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_PAYLOAD_MAX_CHARS = int(os.environ.get("LOG_PAYLOAD_MAX_CHARS", "4000"))
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """ Formats a record as a single-line JSON object, including extra= fields. """
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+                  + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Stamps each record with the current request's correlation ID. Runs in the
+    calling thread, before the record is queued, where the request context
+    is still available.
+    """
+
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = g.get("request_id") if has_request_context() else None
+        return True
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records without formatting them (the listener thread does that)
+    and drops them instead of blocking when the queue is full.
+    """
+
+    def prepare(self, record):
+        # Resolve the message now, while its arguments are still unchanged,
+        # but leave the JSON encoding to the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # Losing a log line beats stalling a worker
+        with contextlib.suppress(queue.Full):
+            self.queue.put_nowait(record)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns a logger under the app's "prymal" namespace, starting this
+    process's log listener on first use.
+    """
+    _ensure_listener()
+    return logging.getLogger(f"prymal.{name}")
+
+
+def log_payload(logger: logging.Logger, message: str, payload, **fields):
+    """
+    Logs a large payload at DEBUG level for a sample of requests only. The
+    payload is serialized (and truncated to LOG_PAYLOAD_MAX_CHARS) only when
+    the record will actually be written; every request that is picked logs
+    all of its payloads, so sampled requests can be followed end to end.
+    """
+    if not logger.isEnabledFor(logging.DEBUG) or not _sampled():
+        return
+
+    body = json.dumps(payload, default=str)
+    if len(body) > LOG_PAYLOAD_MAX_CHARS:
+        body = body[:LOG_PAYLOAD_MAX_CHARS] + "...(truncated)"
+    logger.debug(message, extra={"payload": body, **fields})
+
+
+def init_logging(app):
+    """
+    Configures the "prymal" loggers and assigns every request a correlation
+    ID, taken from the X-Request-ID header when the caller sends one and
+    echoed back on the response.
+    """
+    _ensure_listener()
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        g.debug_sampled = random.random() < LOG_DEBUG_SAMPLE_RATE
+
+    @app.after_request
+    def add_request_id_header(response):
+        response.headers[REQUEST_ID_HEADER] = g.get("request_id", "")
+        return response
+
+
+def _sampled() -> bool:
+    """
+    Returns whether debug payloads should be logged: decided once per
+    request, or per call outside of a request.
+    """
+    if has_request_context():
+        return g.get("debug_sampled", False)
+    return random.random() < LOG_DEBUG_SAMPLE_RATE
+
+
+def _ensure_listener():
+    """
+    Installs the queue handler and starts the listener thread that writes to
+    stdout, once per process, so each gunicorn worker gets its own after fork.
+    """
+    global _listener, _listener_pid
+
+    pid = os.getpid()
+    if _listener_pid == pid:
+        return
+
+    with _listener_lock:
+        if _listener_pid == pid:
+            return
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        if LOG_FORMAT == "json":
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(logging.Formatter(
+                "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        queue_handler = _NonBlockingQueueHandler(log_queue)
+        queue_handler.addFilter(RequestContextFilter())
+
+        logger = logging.getLogger("prymal")
+        logger.handlers.clear()  # Handlers inherited from the parent process
+        logger.addHandler(queue_handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+        _listener.start()
+        atexit.register(_listener.stop)  # Flush queued records on shutdown
+        _listener_pid = pid
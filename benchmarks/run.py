@@ -0,0 +1,261 @@
+"""
+Drives the running app's catalog, inventory and manufacturing order routes
+under concurrency and reports throughput and p50/p95/p99 latency per route.
+
+Usage (from the repo root, with the app serving a database seeded by
+benchmarks/seed.py):
+
+    python benchmarks/run.py --base-url http://localhost:5000
+    python benchmarks/run.py --requests 2000 --concurrency 16 --save-baseline main
+    python benchmarks/run.py --compare main
+
+Baselines are stored as JSON under benchmarks/baselines/. --compare exits
+with status 1 when any scenario's p95 latency (or its error count) got worse
+than the baseline by more than --threshold, so the run can gate a change.
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.append('')  # Adding root of the repo to path for importing modules
+from seed import NAME_WORDS, SKU_PREFIX, TAG_COUNT, TAG_PREFIX
+
+from utils import get_db_connection
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+SCENARIOS = ("products", "raw_materials", "raw_materials_by_tag", "recipes",
+             "search_products", "fetch_recipe", "inventory_as_of", "mrp",
+             "margins", "mo_update_status")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """ Reports redirects (the POST routes' success response) instead of following them. """
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):  # noqa: ARG002
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def load_targets(sample_size: int = 500) -> dict:
+    """
+    Reads ids of seeded rows to aim the scenarios at: product ids for the
+    recipe lookups and pending manufacturing orders for the status updates.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "SELECT id FROM products WHERE sku LIKE %s ORDER BY RANDOM() LIMIT %s;",
+        (SKU_PREFIX + "%", sample_size))
+    product_ids = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute(
+        """
+        SELECT mo.id
+        FROM manufacturing_orders mo
+        JOIN products p ON p.id = mo.product_id
+        WHERE p.sku LIKE %s AND mo.status = 'Pending'
+        ORDER BY mo.id;
+        """, (SKU_PREFIX + "%", ))
+    pending_orders = [row[0] for row in cursor.fetchall()]
+
+    cursor.close()
+    conn.close()
+
+    if not product_ids:
+        raise SystemExit("No seeded products found; run benchmarks/seed.py first.")
+    return {"product_ids": product_ids, "pending_orders": pending_orders}
+
+
+def build_scenarios(targets: dict) -> dict:
+    """
+    Returns scenario name -> function producing the (method, path, form) of
+    the next request. Scenario functions are called from worker threads.
+    """
+    product_ids = targets["product_ids"]
+    pending_orders = list(targets["pending_orders"])
+    orders_lock = threading.Lock()
+
+    def next_order():
+        # Each pending order can be moved to In Progress only once
+        with orders_lock:
+            order_id = pending_orders.pop() if pending_orders else None
+        if order_id is None:
+            return None
+        return "POST", f"/manufacturing_orders/update_status/{order_id}", {"status": "In Progress"}
+
+    def past_date():
+        return (datetime.date.today() - datetime.timedelta(days=random.randint(0, 364))).isoformat()
+
+    def search_term():
+        word = random.choice(NAME_WORDS)
+        return word[:random.randint(3, len(word))]
+
+    return {
+        "products": lambda: ("GET", "/products", None),
+        "raw_materials": lambda: ("GET", "/raw_materials", None),
+        "raw_materials_by_tag": lambda: (
+            "GET", f"/raw_materials?tag={TAG_PREFIX}{random.randrange(TAG_COUNT)}", None),
+        "recipes": lambda: ("GET", "/recipes", None),
+        "search_products": lambda: (
+            "GET", "/search_products?" + urllib.parse.urlencode({"query": search_term()}), None),
+        "fetch_recipe": lambda: (
+            "GET", f"/fetch_recipe?product_id={random.choice(product_ids)}", None),
+        "inventory_as_of": lambda: (
+            "GET", f"/raw_materials/inventory_as_of?as_of={past_date()}", None),
+        "mrp": lambda: ("GET", "/mrp", None),
+        "margins": lambda: ("GET", "/reports/margins", None),
+        "mo_update_status": next_order,
+    }
+
+
+def send(base_url: str, method: str, path: str, form) -> tuple:
+    """ Sends one request and returns (latency in seconds, ok). """
+    data = urllib.parse.urlencode(form).encode("utf-8") if form else None
+    req = urllib.request.Request(base_url + path, data=data, method=method)
+    started_at = time.perf_counter()
+    try:
+        with _opener.open(req, timeout=60) as response:
+            response.read()
+            ok = response.status < 400
+    except urllib.error.HTTPError as e:
+        e.read()
+        ok = 300 <= e.code < 400  # Redirect after a successful POST
+    except (urllib.error.URLError, TimeoutError):
+        ok = False
+    return time.perf_counter() - started_at, ok
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """ Nearest-rank percentile of an already sorted list. """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_scenario(base_url: str, next_request, requests: int, concurrency: int,
+                 warmup: int) -> dict:
+    """
+    Sends warmup requests (not measured), then requests more across
+    concurrency threads, and summarizes their latencies.
+    """
+    for _ in range(warmup):
+        request_args = next_request()
+        if request_args is not None:
+            send(base_url, *request_args)
+
+    def one():
+        request_args = next_request()
+        if request_args is None:
+            return None
+        return send(base_url, *request_args)
+
+    started_at = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = [r for r in executor.map(lambda _: one(), range(requests)) if r is not None]
+    elapsed = time.perf_counter() - started_at
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, ok in results if not ok),
+        "throughput": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def print_report(results: dict, baseline: dict = None):
+    header = f"{'scenario':<18}{'requests':>9}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    if baseline:
+        header += f"{'p95 vs base':>13}"
+    print(header)
+
+    for name, r in results.items():
+        line = (f"{name:<18}{r['requests']:>9}{r['errors']:>8}{r['throughput']:>10.1f}"
+                f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+        base = (baseline or {}).get(name)
+        if base and base["p95_ms"]:
+            line += f"{(r['p95_ms'] / base['p95_ms'] - 1) * 100:>+12.1f}%"
+        print(line)
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list:
+    """ Lists scenarios whose p95 or error count got worse than the baseline allows. """
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base["p95_ms"] and r["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms -> {r['p95_ms']}ms")
+        if r["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {r['errors']}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="run only this scenario (repeatable)")
+    parser.add_argument("--save-baseline", metavar="NAME",
+                        help="store the results as benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME",
+                        help="compare against benchmarks/baselines/NAME.json")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed p95 slowdown before --compare fails (0.2 = 20 percent)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    scenarios = build_scenarios(load_targets())
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json"), "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        results[name] = run_scenario(args.base_url.rstrip("/"), scenarios[name],
+                                     args.requests, args.concurrency, args.warmup)
+
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "settings": {"requests": args.requests, "concurrency": args.concurrency,
+                             "base_url": args.base_url},
+                "results": results,
+            }, f, indent=2)
+        print(f"Saved baseline to {path}")
+
+    if baseline:
+        regressions = find_regressions(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
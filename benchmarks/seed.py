@@ -0,0 +1,280 @@
+"""
+Seeds the database with synthetic catalog, inventory and manufacturing data
+for the benchmark suite (see benchmarks/run.py).
+
+Usage (from the repo root, against a local Postgres configured with the usual
+PG* environment variables):
+
+    python benchmarks/seed.py --scale small
+    python benchmarks/seed.py --scale full --reset
+    python benchmarks/seed.py --products 2000 --versions 10
+
+Every seeded row is recognisable by its "Bench " name or "BENCH-" SKU prefix,
+so --reset removes a previous seed without touching real data. Generation is
+deterministic (driven by generate_series), so the same scale always produces
+the same data set.
+"""
+
+import argparse
+import sys
+import time
+
+sys.path.append('')  # Adding root of the repo to path for importing modules
+from inventory_ledger import create_checkpoints
+from migrate import run_migrations
+from utils import get_db_connection
+
+# Named data set sizes; individual flags override them
+SCALES = {
+    "small": {
+        "products": 1000,
+        "raw_materials": 500,
+        "versions": 5,
+        "lines": 6,
+        "adjustments": 10000,
+        "orders": 2000,
+    },
+    "full": {
+        "products": 10000,
+        "raw_materials": 5000,
+        "versions": 50,
+        "lines": 8,
+        "adjustments": 100000,
+        "orders": 5000,
+    },
+}
+
+# Words mixed into product names so /search_products has realistic matches
+NAME_WORDS = ["Chocolate", "Vanilla", "Salted", "Caramel", "Coffee", "Mocha",
+              "Berry", "Original", "Peanut", "Coconut", "Cinnamon", "Maple"]
+
+REFERENCE_SIZE = 10  # Categories, flavors and sizes each
+VENDOR_COUNT = 50
+PREFIX = "Bench "
+SKU_PREFIX = "BENCH-"
+TAG_PREFIX = "bench-group-"
+TAG_COUNT = 25
+
+
+def reset(cursor):
+    """
+    Deletes everything a previous seed created. Recipes have no foreign key
+    to products, so they are removed explicitly; the rest cascades.
+    """
+    cursor.execute(
+        """
+        DELETE FROM recipes
+        WHERE product_id IN (SELECT id FROM products WHERE sku LIKE %(sku)s);
+        DELETE FROM products WHERE sku LIKE %(sku)s;
+        DELETE FROM raw_materials WHERE name LIKE %(name)s;
+        DELETE FROM vendors WHERE name LIKE %(name)s;
+        DELETE FROM unit_of_measure WHERE name LIKE %(name)s;
+        DELETE FROM categories WHERE name LIKE %(name)s;
+        DELETE FROM flavors WHERE name LIKE %(name)s;
+        DELETE FROM sizes WHERE name LIKE %(name)s;
+        DELETE FROM tags WHERE name LIKE %(tag)s;
+        """, {"sku": SKU_PREFIX + "%", "name": PREFIX + "%", "tag": TAG_PREFIX + "%"})
+
+
+def seed(cursor, scale):
+    """
+    Inserts the synthetic data set with set-based statements. Raw materials
+    get effectively unlimited stock so manufacturing order transitions never
+    fail for lack of inventory; stock adjustments are ledger movements spread
+    over the past year.
+    """
+    params = {**scale, "prefix": PREFIX, "sku_prefix": SKU_PREFIX,
+              "like": PREFIX + "%", "sku_like": SKU_PREFIX + "%",
+              "words": NAME_WORDS, "reference_size": REFERENCE_SIZE,
+              "vendor_count": VENDOR_COUNT, "tag_prefix": TAG_PREFIX,
+              "tag_count": TAG_COUNT}
+
+    # Reference data
+    cursor.execute(
+        """
+        INSERT INTO categories (name)
+        SELECT %(prefix)s || 'Category ' || i FROM generate_series(1, %(reference_size)s) i
+        ON CONFLICT (name) DO NOTHING;
+
+        INSERT INTO flavors (name)
+        SELECT %(prefix)s || 'Flavor ' || i FROM generate_series(1, %(reference_size)s) i
+        ON CONFLICT (name) DO NOTHING;
+
+        INSERT INTO sizes (name, weight_g)
+        SELECT %(prefix)s || 'Size ' || i, i * 100 FROM generate_series(1, %(reference_size)s) i
+        ON CONFLICT (name) DO NOTHING;
+
+        INSERT INTO vendors (name, email)
+        SELECT %(prefix)s || 'Vendor ' || i, 'vendor' || i || '@example.com'
+        FROM generate_series(1, %(vendor_count)s) i
+        ON CONFLICT (name) DO NOTHING;
+
+        INSERT INTO unit_of_measure (name, tag)
+        VALUES (%(prefix)s || 'Gram', 'bench-g'),
+               (%(prefix)s || 'Kilogram', 'bench-kg'),
+               (%(prefix)s || 'Unit', 'bench-u')
+        ON CONFLICT (name) DO NOTHING;
+        """, params)
+
+    # Raw materials, spread across vendors and units
+    cursor.execute(
+        """
+        WITH vendor_ids AS (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY id) - 1 AS n
+            FROM vendors WHERE name LIKE %(like)s
+        ),
+        unit_ids AS (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY id) - 1 AS n
+            FROM unit_of_measure WHERE name LIKE %(like)s
+        )
+        INSERT INTO raw_materials (name, vendor_id, unit_of_measure_id, moq, created_at)
+        SELECT
+            %(prefix)s || 'Material ' || LPAD(i::TEXT, 6, '0'),
+            v.id,
+            u.id,
+            (i %% 10) * 5,
+            NOW() - INTERVAL '366 days'
+        FROM generate_series(1, %(raw_materials)s) i
+        JOIN vendor_ids v ON v.n = i %% (SELECT COUNT(*) FROM vendor_ids)
+        JOIN unit_ids u ON u.n = i %% (SELECT COUNT(*) FROM unit_ids);
+
+        INSERT INTO tags (name)
+        SELECT %(tag_prefix)s || i FROM generate_series(0, %(tag_count)s - 1) i
+        ON CONFLICT (name) DO NOTHING;
+
+        INSERT INTO raw_material_tags (raw_material_id, tag_id)
+        SELECT rm.id, t.id
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY id) AS n
+            FROM raw_materials WHERE name LIKE %(like)s
+        ) rm
+        JOIN tags t ON t.name IN (%(tag_prefix)s || rm.n %% %(tag_count)s,
+                                  %(tag_prefix)s || (rm.n / 7) %% %(tag_count)s)
+        ON CONFLICT DO NOTHING;
+        """, params)
+
+    # Products
+    cursor.execute(
+        """
+        WITH category_ids AS (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY id) - 1 AS n FROM categories WHERE name LIKE %(like)s
+        ),
+        flavor_ids AS (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY id) - 1 AS n FROM flavors WHERE name LIKE %(like)s
+        ),
+        size_ids AS (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY id) - 1 AS n FROM sizes WHERE name LIKE %(like)s
+        )
+        INSERT INTO products (name, sku, price, category_id, flavor_id, size_id)
+        SELECT
+            %(prefix)s || (%(words)s::TEXT[])[1 + i %% CARDINALITY(%(words)s::TEXT[])]
+                || ' ' || (%(words)s::TEXT[])[1 + (i / 7) %% CARDINALITY(%(words)s::TEXT[])]
+                || ' Bar ' || i,
+            %(sku_prefix)s || LPAD(i::TEXT, 6, '0'),
+            ROUND((1 + (i %% 50) * 0.5)::NUMERIC, 2),
+            c.id,
+            f.id,
+            s.id
+        FROM generate_series(1, %(products)s) i
+        JOIN category_ids c ON c.n = i %% %(reference_size)s
+        JOIN flavor_ids f ON f.n = (i / 3) %% %(reference_size)s
+        JOIN size_ids s ON s.n = (i / 5) %% %(reference_size)s;
+        """, params)
+
+    # Recipe versions (latest one active) and their lines
+    cursor.execute(
+        """
+        CREATE TEMP TABLE bench_products ON COMMIT DROP AS
+        SELECT id, ROW_NUMBER() OVER (ORDER BY id) AS n
+        FROM products WHERE sku LIKE %(sku_like)s;
+
+        CREATE TEMP TABLE bench_materials ON COMMIT DROP AS
+        SELECT id, ROW_NUMBER() OVER (ORDER BY id) - 1 AS n
+        FROM raw_materials WHERE name LIKE %(like)s;
+        CREATE INDEX ON bench_materials (n);
+
+        INSERT INTO recipes (product_id, version, active, created_at)
+        SELECT p.id, v, v = %(versions)s, NOW() - (%(versions)s - v) * INTERVAL '1 day'
+        FROM bench_products p
+        CROSS JOIN generate_series(1, %(versions)s) v;
+
+        INSERT INTO product_version_counters (product_id, last_recipe_version)
+        SELECT id, %(versions)s FROM bench_products
+        ON CONFLICT (product_id) DO UPDATE SET last_recipe_version = EXCLUDED.last_recipe_version;
+
+        INSERT INTO recipe_raw_materials (recipe_id, raw_material_id, quantity)
+        SELECT r.id, m.id, 1 + ((p.n + k + r.version) %% 20) * 0.25
+        FROM recipes r
+        JOIN bench_products p ON p.id = r.product_id
+        CROSS JOIN generate_series(0, %(lines)s - 1) k
+        JOIN bench_materials m
+            ON m.n = (p.n * 7 + k * 13) %% (SELECT COUNT(*) FROM bench_materials)
+        ON CONFLICT (recipe_id, raw_material_id) DO NOTHING;
+        """, params)
+
+    # Stock adjustment history, material costs and pending manufacturing orders
+    cursor.execute(
+        """
+        INSERT INTO inventory_movements (raw_material_id, movement_type, on_hand_delta, reason, created_at)
+        SELECT m.id, 'adjustment', 1e9, 'Benchmark opening stock', NOW() - INTERVAL '366 days'
+        FROM bench_materials m;
+
+        INSERT INTO raw_material_costs (raw_material_id, unit_cost, effective_from)
+        SELECT m.id, 0.05 + (m.n %% 40) * 0.125, NOW() - INTERVAL '366 days'
+        FROM bench_materials m;
+
+        INSERT INTO inventory_movements (raw_material_id, movement_type, on_hand_delta, reason, created_at)
+        SELECT m.id, 'adjustment', ((i %% 21) - 10) * 1.5, 'Benchmark adjustment ' || i,
+               NOW() - (i %% 365) * INTERVAL '1 day'
+        FROM generate_series(1, %(adjustments)s) i
+        JOIN bench_materials m ON m.n = i %% (SELECT COUNT(*) FROM bench_materials);
+
+        INSERT INTO manufacturing_orders (product_id, units_to_produce, planned_start_date, status)
+        SELECT p.id, 1 + i %% 20, CURRENT_DATE + (i %% 60), 'Pending'
+        FROM generate_series(1, %(orders)s) i
+        JOIN bench_products p ON p.n = 1 + i %% (SELECT COUNT(*) FROM bench_products);
+        """, params)
+
+    cursor.execute("ANALYZE;")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--reset", action="store_true",
+                        help="remove a previous benchmark seed first")
+    for name in SCALES["small"]:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name,
+                            help=f"override the scale's {name.replace('_', ' ')} count")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    scale = {name: getattr(args, name) or count for name, count in SCALES[args.scale].items()}
+
+    run_migrations()
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    started_at = time.perf_counter()
+
+    try:
+        if args.reset:
+            reset(cur)
+        seed(cur, scale)
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        cur.close()
+        conn.close()
+
+    # Monthly inventory checkpoints across the seeded year of movements
+    for days_ago in range(330, -1, -30):
+        create_checkpoints(lag=days_ago * 86400)
+
+    print(f"Seeded {scale} in {time.perf_counter() - started_at:.1f}s")
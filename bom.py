@@ -0,0 +1,103 @@
+"""
+Compiled bills of materials: each product's active recipe, resolved once into
+parallel arrays of raw material ids and quantities per unit and cached per
+product.
+
+Manufacturing order transitions, /fetch_recipe and MRP pass these arrays to
+their queries instead of joining recipes and recipe_raw_materials on every
+call. Triggers on both tables (sql/migrations/0009_add_bom_change_notifications.sql)
+NOTIFY the changed product ids, so every worker drops its copy as soon as a
+recipe is activated, deactivated, deleted or its lines change; entries also
+expire after BOM_CACHE_TTL seconds. Notifications arrive asynchronously, so
+the reservation and consumption queries also check the recipe's lines_version
+(sql/migrations/0015_add_recipe_lines_version.sql) and return nothing for a
+stale BOM.
+"""
+
+import os
+import threading
+from typing import NamedTuple
+
+from notifications import ensure_listener, subscribe
+from utils import TTLCache, execute_sql
+
+BOM_CACHE_TTL = float(os.environ.get("BOM_CACHE_TTL", "300"))  # seconds
+BOM_CACHE_SIZE = int(os.environ.get("BOM_CACHE_SIZE", "10000"))  # products
+NOTIFY_CHANNEL = "bom_changed"
+
+
+class CompiledBOM(NamedTuple):
+    recipe_id: int
+    lines_version: int  # recipes.lines_version the BOM was compiled from
+    raw_material_ids: list
+    quantities: list  # per unit produced, same order as raw_material_ids
+
+
+_MISSING = object()
+_cache = TTLCache(ttl=BOM_CACHE_TTL, maxsize=BOM_CACHE_SIZE)
+# Bumped on every invalidation, so a compile racing one is not cached
+_invalidations = 0
+_invalidations_lock = threading.Lock()
+
+
+def _invalidate(*product_ids: int):
+    global _invalidations
+    with _invalidations_lock:
+        _invalidations += 1
+        for product_id in product_ids:
+            _cache.delete(product_id)
+
+
+def _reset():
+    global _invalidations
+    with _invalidations_lock:
+        _invalidations += 1
+        _cache.clear()
+
+
+subscribe(NOTIFY_CHANNEL, lambda payload: _invalidate(int(payload)), _reset)
+
+
+def get_boms(cursor, product_ids) -> dict:
+    """
+    Returns product_id -> CompiledBOM for the given products. Products without
+    an active recipe are left out (and cached as such). Every miss is compiled
+    in a single query on the given cursor.
+    """
+    ensure_listener()
+
+    boms = {}
+    misses = []
+    for product_id in set(product_ids):
+        bom = _cache.get(product_id, _MISSING)
+        if bom is _MISSING:
+            misses.append(product_id)
+        elif bom is not None:
+            boms[product_id] = bom
+
+    if misses:
+        invalidations = _invalidations
+        execute_sql(cursor, "sql/get_active_boms.sql", (misses, ))
+        compiled = {product_id: CompiledBOM(*bom) for product_id, *bom in cursor.fetchall()}
+        with _invalidations_lock:
+            # An invalidation during the query may already be reflected in it or
+            # not; caching the result could outlive it, so skip caching this time
+            if invalidations == _invalidations:
+                for product_id in misses:
+                    _cache.set(product_id, compiled.get(product_id))
+        boms.update(compiled)
+
+    return boms
+
+
+def get_bom(cursor, product_id: int):
+    """ Returns the product's CompiledBOM, or None without an active recipe. """
+    return get_boms(cursor, [product_id]).get(product_id)
+
+
+def invalidate_bom(*product_ids: int):
+    """
+    Drops the products from this worker's cache right away; the other workers
+    are notified by the recipe triggers when the change commits.
+    """
+    _invalidate(*product_ids)
@@ -0,0 +1,92 @@
+"""
+Bulk CSV and NDJSON exports, served at GET /exports/<name>?format=csv|ndjson.
+
+An export runs its query on a server-side cursor (utils.open_server_cursor)
+and streams the result to the client fetchmany() batch by batch, so memory
+stays flat however many rows there are and the first bytes go out as soon
+as the first batch arrives. The export holds a pooled connection, and one
+consistent snapshot of the data, until the last row is sent.
+"""
+
+import csv
+import io
+import os
+
+from flask import current_app, stream_with_context
+
+from app_logging import get_logger
+from json_provider import dumps_bytes
+from utils import get_db_connection, open_server_cursor
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "2000"))
+
+# Export name -> query
+EXPORTS = {
+    "products": "sql/export_products.sql",
+    "raw_materials": "sql/export_raw_materials.sql",
+    "recipes": "sql/export_recipes.sql",
+    "stock_adjustments": "sql/export_stock_adjustments.sql",
+}
+
+# Format -> mimetype
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+logger = get_logger("exports")
+
+
+def _csv_chunks(cursor, batch_size: int):
+    """ Yields a header line, then one chunk of CSV lines per batch. """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    rows = cursor.fetchmany(batch_size)
+    # Named cursors only have a description after the first fetch
+    writer.writerow(col[0] for col in cursor.description)
+    while True:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+
+
+def _ndjson_chunks(cursor, batch_size: int):
+    """ Yields one chunk of newline-terminated JSON objects per batch. """
+    rows = cursor.fetchmany(batch_size)
+    columns = [col[0] for col in cursor.description]
+    while rows:
+        yield b"".join(dumps_bytes(dict(zip(columns, row, strict=True))) + b"\n" for row in rows)
+        rows = cursor.fetchmany(batch_size)
+
+
+def export_response(name: str, export_format: str, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Returns a streaming response with the named export in the given format.
+    Raises KeyError for an unknown export or format.
+    """
+    filename = EXPORTS[name]
+    mimetype = EXPORT_FORMATS[export_format]
+    chunks = _csv_chunks if export_format == "csv" else _ndjson_chunks
+
+    conn = get_db_connection()
+    cursor = open_server_cursor(conn, filename, itersize=batch_size)
+
+    def generate():
+        try:
+            yield from chunks(cursor, batch_size)
+        except Exception:
+            logger.exception("Export failed", extra={"export": name, "format": export_format})
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    response = current_app.response_class(stream_with_context(generate()), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{name}.{export_format}"'
+    return response
@@ -0,0 +1,80 @@
+"""
+Conditional GET (ETag / Last-Modified, 304 Not Modified) for the JSON fetch
+endpoints behind the front-end dropdowns.
+
+A route reads the change counters of the tables it depends on
+(table_versions, bumped by triggers, see
+sql/migrations/0011_add_table_versions.sql) before its query. When the
+client's If-None-Match or If-Modified-Since still matches, the route answers
+304 after that single primary-key read and skips its query and serialization.
+Counters are read before the data, so a write committing in between can only
+make a response look older than it is, never newer.
+"""
+
+import hashlib
+import os
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from flask import current_app, request
+
+from utils import execute_sql
+
+# Seconds a client may reuse a response without revalidating; 0 revalidates every time
+HTTP_CACHE_MAX_AGE = int(os.environ.get("HTTP_CACHE_MAX_AGE", "0"))
+
+
+class Validator(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime] = None
+
+
+def _digest(value) -> str:
+    return hashlib.sha1(repr(value).encode("utf-8")).hexdigest()[:20]
+
+
+def get_validator(cursor, *tables: str) -> Validator:
+    """
+    Builds the validator for a response that reads the given tables from
+    their change counters.
+    """
+    execute_sql(cursor, "sql/get_table_versions.sql", (list(tables), ))
+    versions = cursor.fetchall()
+    return Validator(_digest([(name, version) for name, version, _ in versions]),
+                     max((changed_at for _, _, changed_at in versions), default=None))
+
+
+def validator_for(data) -> Validator:
+    """
+    Builds a validator from the response data itself, for data with no change
+    counter (it saves the client re-downloading, not the query).
+    """
+    return Validator(_digest(data))
+
+
+def is_not_modified(validator: Validator) -> bool:
+    """ Whether the request's conditional headers match the validator. """
+    if request.if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since
+        return request.if_none_match.contains_weak(validator.etag)
+    if request.if_modified_since and validator.last_modified:
+        return validator.last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def add_cache_headers(response, validator: Validator):
+    """ Sets the ETag, Last-Modified and Cache-Control headers on a response. """
+    response.set_etag(validator.etag, weak=True)
+    if validator.last_modified:
+        response.last_modified = validator.last_modified
+    response.cache_control.private = True
+    if HTTP_CACHE_MAX_AGE:
+        response.cache_control.max_age = HTTP_CACHE_MAX_AGE
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(validator: Validator):
+    """ Returns an empty 304 Not Modified response carrying the validator. """
+    return add_cache_headers(current_app.response_class(status=304), validator)
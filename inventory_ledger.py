@@ -0,0 +1,52 @@
+"""
+Periodic balance checkpoints for the inventory ledger (inventory_movements,
+see sql/migrations/0007_add_inventory_ledger.sql).
+
+Point-in-time inventory is read from the nearest checkpoint plus the
+movements after it, so checkpoints should be taken regularly, e.g. hourly
+from a scheduled job:
+
+    python inventory_ledger.py
+"""
+
+import os
+
+from utils import execute_sql, get_db_connection
+
+# Checkpoints cover movements up to this many seconds ago, so transactions
+# still in flight (their movements carry the transaction start time) are
+# never skipped
+CHECKPOINT_LAG = float(os.environ.get("INVENTORY_CHECKPOINT_LAG", "300"))
+
+
+def create_checkpoints(lag: float = CHECKPOINT_LAG, cursor=None) -> int:
+    """
+    Checkpoints every raw material with movements since its latest
+    checkpoint and returns how many were written. Runs on the given cursor,
+    leaving the commit to the caller, or on a pooled connection if none is
+    given.
+    """
+    if cursor is not None:
+        execute_sql(cursor, "sql/create_inventory_checkpoints.sql", (lag, ))
+        return cursor.rowcount
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        created = create_checkpoints(lag, cursor)
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        cursor.close()
+        conn.close()
+
+    return created
+
+
+if __name__ == "__main__":
+    print(f"Created {create_checkpoints()} inventory checkpoint(s).")
@@ -0,0 +1,197 @@
+"""
+Postgres-backed queue for work too slow to run inside a web request.
+
+A route (or POST /jobs) enqueues a job and answers straight away; the client
+polls GET /jobs/<id> for its status and result. Jobs are rows in the jobs
+table (sql/migrations/0010_add_jobs.sql), claimed with FOR UPDATE SKIP LOCKED
+by worker processes run alongside the web server:
+
+    python jobs.py
+    python jobs.py --burst    # exit once no job is due, e.g. from cron
+
+The run and deployment commands in .replit start one worker in the
+background next to gunicorn (after migrate.py) and restart it if it exits.
+Without a worker, enqueued jobs stay queued. For more throughput, start
+more `python jobs.py` processes. On hosts that only allocate CPU while
+serving a request (Cloud Run's default), enable always-allocated CPU or run
+the worker as its own service.
+
+A job's work and its success record commit in one transaction, so a job that
+fails, or whose worker dies, is rolled back and retried whole, with
+exponential backoff, until it runs out of attempts.
+"""
+
+import argparse
+import json
+import os
+import select
+import socket
+import time
+
+import psycopg2
+
+from app_logging import get_logger
+from inventory_ledger import CHECKPOINT_LAG, create_checkpoints
+from mrp import plan_material_requirements
+from notifications import notify
+from utils import execute_sql, get_connection_params, get_db_connection
+
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "5"))  # seconds
+# Running jobs not finished after this many seconds are presumed dead and retried
+JOB_TIMEOUT = float(os.environ.get("JOB_TIMEOUT", "3600"))
+NOTIFY_CHANNEL = "jobs_enqueued"
+
+JOB_COLUMNS = ("id", "job_type", "payload", "status", "attempts", "max_attempts",
+               "run_at", "last_error", "result", "created_at", "finished_at")
+
+logger = get_logger("jobs")
+
+
+def _inventory_checkpoints(cursor, payload: dict) -> dict:
+    """ Payload: optional "lag" in seconds (see inventory_ledger.py). """
+    created = create_checkpoints(float(payload.get("lag", CHECKPOINT_LAG)), cursor)
+    return {"created": created}
+
+
+def _material_requirements(cursor, payload: dict) -> dict:  # noqa: ARG001
+    return {"shortages": plan_material_requirements(cursor)}
+
+
+def _product_snapshots(cursor, payload: dict) -> dict:
+    """
+    Payload: optional "product_ids"; without it every product with an active
+    recipe is snapshotted.
+    """
+    product_ids = payload.get("product_ids")
+    execute_sql(cursor, "sql/create_product_snapshots.sql", (product_ids, product_ids))
+    return {"created": cursor.rowcount}
+
+
+# job_type -> handler(cursor, payload) returning a JSON-serializable result.
+# Handlers must not commit: the worker commits their work with the result.
+JOB_HANDLERS = {
+    "inventory_checkpoints": _inventory_checkpoints,
+    "material_requirements": _material_requirements,
+    "product_snapshots": _product_snapshots,
+}
+
+
+def enqueue_job(cursor, job_type: str, payload: dict = None,
+                max_attempts: int = JOB_MAX_ATTEMPTS, delay: float = 0) -> int:
+    """
+    Queues a job to run after delay seconds and returns its id. Raises
+    ValueError for an unknown job type. Call conn.commit() afterwards: the job
+    (and the NOTIFY waking the workers) only exists once committed.
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+
+    execute_sql(cursor, "sql/enqueue_job.sql",
+                (job_type, json.dumps(payload or {}), max_attempts, delay))
+    job_id = cursor.fetchone()[0]
+    notify(cursor, NOTIFY_CHANNEL, str(job_id))
+    return job_id
+
+
+def get_job(cursor, job_id: int):
+    """ Returns the job's status record as a dict, or None if it does not exist. """
+    execute_sql(cursor, "sql/get_job.sql", (job_id, ))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+
+    job = dict(zip(JOB_COLUMNS, row, strict=True))
+    for column in ("run_at", "created_at", "finished_at"):
+        if job[column] is not None:
+            job[column] = job[column].isoformat()
+    return job
+
+
+def run_next_job(worker_id: str) -> bool:
+    """
+    Claims and runs the next due job, recording its result or failure.
+    Returns False when no job was due.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        execute_sql(cursor, "sql/fail_stale_jobs.sql", (JOB_TIMEOUT, ))
+        execute_sql(cursor, "sql/claim_job.sql", (worker_id, JOB_TIMEOUT))
+        job = cursor.fetchone()
+        conn.commit()
+
+        if job is None:
+            return False
+
+        job_id, job_type, payload, attempt = job
+        fields = {"job_id": job_id, "job_type": job_type, "attempt": attempt}
+        started_at = time.perf_counter()
+
+        try:
+            result = JOB_HANDLERS[job_type](cursor, payload)
+            execute_sql(cursor, "sql/complete_job.sql",
+                        (json.dumps(result, default=str), job_id))
+            conn.commit()
+            logger.info("Job succeeded",
+                        extra={**fields, "seconds": round(time.perf_counter() - started_at, 3)})
+
+        except Exception as e:
+            conn.rollback()
+            logger.exception("Job failed", extra=fields)
+            execute_sql(cursor, "sql/fail_job.sql", (f"{type(e).__name__}: {e}", job_id))
+            conn.commit()
+
+        return True
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def run_worker(burst: bool = False):
+    """
+    Runs due jobs one at a time until none is left, then sleeps until a job
+    is enqueued (LISTEN) or JOB_POLL_INTERVAL passes, since retried and
+    delayed jobs become due without a notification. With burst, returns once
+    no job is due instead. Scale out by running more worker processes.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info("Job worker started", extra={"worker_id": worker_id})
+
+    while True:
+        listener = None
+        try:
+            if not burst:
+                listener = psycopg2.connect(**get_connection_params())
+                listener.autocommit = True
+                listener.cursor().execute(f"LISTEN {NOTIFY_CHANNEL};")
+
+            while True:
+                while run_next_job(worker_id):
+                    pass
+                if burst:
+                    return
+
+                if select.select([listener], [], [], JOB_POLL_INTERVAL) != ([], [], []):
+                    listener.poll()
+                    listener.notifies.clear()
+
+        except psycopg2.OperationalError:
+            logger.warning("Job worker lost its database connection; reconnecting",
+                           exc_info=True)
+            time.sleep(5)
+
+        finally:
+            if listener is not None:
+                listener.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run background jobs from the jobs table.")
+    parser.add_argument("--burst", action="store_true",
+                        help="exit once no job is due instead of waiting for more")
+    args = parser.parse_args()
+
+    run_worker(burst=args.burst)
@@ -0,0 +1,120 @@
+"""
+Compact JSON for the API responses.
+
+FastJSONProvider replaces Flask's default JSON provider (see init_json), so
+jsonify() and returned dicts and lists go through it. It serializes with
+orjson when that is installed and with the standard library json module
+otherwise, both without whitespace. Decimal columns (costs, prices) are
+written as numbers and datetime, date and time columns as ISO 8601 strings,
+so rows from the cursor need no per-value conversion first.
+
+stream_json_array() writes a query's rows straight into the response as a
+JSON array, one fetchmany() batch at a time, instead of building the whole
+list of dicts and the whole response body in memory.
+"""
+
+import datetime
+import decimal
+import json
+import os
+
+from flask import current_app, stream_with_context
+from flask.json.provider import JSONProvider
+
+from app_logging import get_logger
+
+try:
+    import orjson
+except ImportError:  # Optional; the standard library json module is used without it
+    orjson = None
+
+FAST_JSON = os.environ.get("FAST_JSON", "1") == "1"
+JSON_STREAM_BATCH_SIZE = int(os.environ.get("JSON_STREAM_BATCH_SIZE", "1000"))
+
+logger = get_logger("json_provider")
+
+
+def _default(value):
+    """ Serializes the column types psycopg2 returns that JSON has no type for. """
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj) -> bytes:
+    """ Serializes obj to compact UTF-8 JSON. """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(",", ":"),
+                      ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONProvider(JSONProvider):
+    """
+    Flask JSON provider built on dumps_bytes(). Calls passing formatting
+    options (indent, sort_keys, ...) fall back to the json module.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            kwargs.setdefault("default", _default)
+            return json.dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype="application/json")
+
+
+def init_json(app):
+    """ Installs FastJSONProvider on the app unless FAST_JSON=0. """
+    if FAST_JSON:
+        app.json = FastJSONProvider(app)
+
+
+def _row_to_dict(cursor):
+    columns = [col[0] for col in cursor.description]
+    return lambda row: dict(zip(columns, row, strict=True))
+
+
+def stream_json_array(conn, cursor, to_item=None, batch_size: int = JSON_STREAM_BATCH_SIZE):
+    """
+    Returns a response that streams the cursor's rows as a JSON array,
+    converting each row with to_item (default: a dict keyed by column name).
+    The response owns the cursor and connection and closes both once the
+    last row is sent; use a server-side cursor (utils.open_server_cursor) to
+    avoid fetching the whole result up front. Errors after the first byte
+    cannot change the status code, so they are logged and cut the array short.
+    """
+
+    def generate():
+        try:
+            rows = cursor.fetchmany(batch_size)
+            # Named cursors only have a description after the first fetch
+            convert = to_item or _row_to_dict(cursor)
+            separator = b"["
+            while rows:
+                yield separator + b",".join(dumps_bytes(convert(row)) for row in rows)
+                separator = b","
+                rows = cursor.fetchmany(batch_size)
+            yield b"[]" if separator == b"[" else b"]"
+        except Exception:
+            logger.exception("Streaming JSON response failed")
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    return current_app.response_class(stream_with_context(generate()),
+                                      mimetype="application/json")
@@ -2,14 +2,57 @@ from flask import Flask, render_template, request, redirect, url_for, jsonify
 from flask.json import loads
 
 import json
-
-from utils import get_db_connection, load_sql_file
+import os
+from datetime import date, datetime, time
+
+from psycopg2 import errors
+
+from app_logging import get_logger, init_logging, log_payload
+from bom import get_bom, invalidate_bom
+from exports import EXPORT_FORMATS, EXPORTS, export_response
+from metrics import init_metrics
+from http_cache import (add_cache_headers, get_validator, is_not_modified,
+                        not_modified, validator_for)
+from jobs import enqueue_job, get_job
+from json_provider import init_json, stream_json_array
+from migrate import run_migrations
+from mrp import plan_material_requirements
+from reference_data import get_reference_data, invalidate_reference_data
+from utils import (MAX_PAGE_SIZE, SEARCH_RESULT_LIMIT, TTLCache,
+                   decode_cursor, escape_like, execute_sql, get_db_connection,
+                   get_page_size, init_db_pool, init_sql_registry,
+                   jsonify_page, load_sql_file, open_server_cursor,
+                   parse_recipe_lines, parse_tag_input, split_page)
 
 app = Flask(__name__, static_folder="static")
+logger = get_logger("main")
+
+# Structured logs with a correlation ID per request
+init_logging(app)
+
+# Route, SQL, connection pool and template timings, served at /metrics
+init_metrics(app)
+
+# Return pooled database connections at the end of every request
+init_db_pool(app)
+
+# Compact JSON responses with Decimal and datetime support (orjson if installed)
+init_json(app)
+
+# Preload sql/*.sql and fail fast if a route references a missing file
+init_sql_registry(app)
+
+# Apply pending schema migrations at startup when requested (see migrate.py)
+if os.environ.get("MIGRATE_ON_STARTUP") == "1":
+    run_migrations()
 
 # Add the 'fromjson' filter
 app.jinja_env.filters['fromjson'] = loads
 
+# Recent /search_products results, so repeated autocomplete keystrokes for the
+# same term skip the database. Cleared whenever products change.
+search_cache = TTLCache(ttl=30, maxsize=512)
+
 # -----------------------------------------------------------------------------
 # ROUTES
 # -----------------------------------------------------------------------------
@@ -27,34 +70,37 @@ def home():
 @app.route("/products")
 def products():
     """
-    Home page route. Instantiate database tables (if not already exists) & Fetches all products from the 'products' table
-    and displays them in a simple HTML table.
+    Fetches one page of products from the 'products' table (newest first) and
+    displays them in a simple HTML table. Schema setup lives in migrate.py.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Create tables if not exists
-    # ---------
+    limit = get_page_size(request.args)
+    try:
+        after_created_at, after_id = decode_cursor(request.args.get("after"), datetime, int)
+    except ValueError:
+        return "Invalid page cursor.", 400
 
-    query = load_sql_file("sql/ddl.sql")
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute(query)
-    conn.commit()
 
-    # Select all products
+    # Select one page of products
     # ---------
 
-    query = load_sql_file("sql/list_product_variant_details.sql")
-    cursor.execute(query)
+    execute_sql(cursor, "sql/list_product_variant_details.sql",
+                (after_created_at, after_created_at, after_id, limit + 1))
     products = cursor.fetchall()  # returns list of tuples
     cursor.close()
     conn.close()
 
+    products, next_cursor = split_page(products, limit,
+                                       lambda product: (product[5], product[0]))
+
     # Return html table with products
     # ---------
 
-    return render_template("products.html", products=products)
+    return render_template("products.html",
+                           products=products,
+                           next_cursor=next_cursor,
+                           limit=limit)
 
 
 @app.route("/add_product", methods=["GET", "POST"])
@@ -87,17 +133,9 @@ def add_product():
         if sku_exists:
 
             # Fetch dropdown options
-            query = load_sql_file("sql/list_categories.sql")
-            cursor.execute(query)
-            categories = cursor.fetchall()
-
-            query = load_sql_file("sql/list_flavors.sql")
-            cursor.execute(query)
-            flavors = cursor.fetchall()
-
-            query = load_sql_file("sql/list_sizes.sql")
-            cursor.execute(query)
-            sizes = cursor.fetchall()
+            categories = get_reference_data("categories", cursor)
+            flavors = get_reference_data("flavors", cursor)
+            sizes = get_reference_data("sizes", cursor)
 
             cursor.close()
             conn.close()
@@ -117,23 +155,16 @@ def add_product():
             query,
             (name, sku, price, description, category_id, flavor_id, size_id))
         conn.commit()
+        search_cache.clear()
 
         cursor.close()
         conn.close()
         return redirect(url_for("products"))
 
     # Fetch dropdown options
-    query = load_sql_file("sql/list_categories.sql")
-    cursor.execute(query)
-    categories = cursor.fetchall()
-
-    query = load_sql_file("sql/list_flavors.sql")
-    cursor.execute(query)
-    flavors = cursor.fetchall()
-
-    query = load_sql_file("sql/list_sizes.sql")
-    cursor.execute(query)
-    sizes = cursor.fetchall()
+    categories = get_reference_data("categories", cursor)
+    flavors = get_reference_data("flavors", cursor)
+    sizes = get_reference_data("sizes", cursor)
 
     conn.close()
     return render_template("add_product.html",
@@ -166,6 +197,7 @@ def edit_product(product_id):
         cursor.execute(query, (name, sku, price, description, category_id,
                                flavor_id, size_id, product_id))
         conn.commit()
+        search_cache.clear()
 
         cursor.close()
         conn.close()
@@ -182,17 +214,9 @@ def edit_product(product_id):
         return "Product not found.", 404
 
     # Fetch dropdown options
-    query = load_sql_file("sql/list_categories.sql")
-    cursor.execute(query)
-    categories = cursor.fetchall()
-
-    query = load_sql_file("sql/list_flavors.sql")
-    cursor.execute(query)
-    flavors = cursor.fetchall()
-
-    query = load_sql_file("sql/list_sizes.sql")
-    cursor.execute(query)
-    sizes = cursor.fetchall()
+    categories = get_reference_data("categories", cursor)
+    flavors = get_reference_data("flavors", cursor)
+    sizes = get_reference_data("sizes", cursor)
 
     cursor.close()
     conn.close()
@@ -212,12 +236,16 @@ def delete_product(product_id):
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Delete the product by ID
+    # Give back anything the product's manufacturing orders still hold reserved,
+    # then delete the product (its MOs cascade; their ledger movements stay)
     # -----------
 
+    execute_sql(cursor, "sql/release_product_mo_reservations.sql", (product_id, ))
+
     query = load_sql_file("sql/delete_product.sql")
     cursor.execute(query, (product_id, ))
     conn.commit()
+    search_cache.clear()
 
     cursor.close()
     conn.close()
@@ -225,61 +253,73 @@ def delete_product(product_id):
     # Redirect back to the home page
     return redirect(url_for("products"))
 
-@app.route("/product/<int:product_id>", methods=["GET"])
-def product_detail(product_id):
+
+@app.route("/api/products/<int:product_id>", methods=["GET"])
+def product_overview(product_id):
     """
-    Fetch and display product details along with its snapshots.
+    Returns everything the product page needs in one response and one query:
+    the product, its active recipe with inventory levels, its recipe versions,
+    snapshots and cost rollup. Postgres builds the JSON, which is passed
+    through as is.
     """
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Load queries from SQL files
-    product_query = load_sql_file("sql/get_product_details.sql")
-    snapshot_query = load_sql_file("sql/get_product_snapshots.sql")
+    execute_sql(cursor, "sql/get_product_overview.sql", (product_id, ))
+    row = cursor.fetchone()
 
-    # Fetch product details
-    cursor.execute(product_query, (product_id,))
-    product = cursor.fetchone()
+    cursor.close()
+    conn.close()
 
-    if not product:
-        cursor.close()
-        conn.close()
-        return "Product not found.", 404
+    if not row:
+        return jsonify({"error": "Product not found"}), 404
 
-    # Ensure price is a float before passing it to the template
-    product = list(product)  # Convert tuple to list (mutable)
-    try:
-        product[3] = float(product[3])  # Convert price to float
-    except ValueError:
-        product[3] = 0.00  # Default value if conversion fails
+    validator = validator_for(row[0])
+    if is_not_modified(validator):
+        return not_modified(validator)
+    return add_cache_headers(app.response_class(row[0], mimetype="application/json"), validator)
+
+
+@app.route("/product/<int:product_id>", methods=["GET"])
+def product_detail(product_id):
+    """
+    Fetch and display product details along with its snapshots.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
 
-    # Fetch snapshots for the product
-    cursor.execute(snapshot_query, (product_id,))
-    snapshots = cursor.fetchall()
+    execute_sql(cursor, "sql/get_product_overview.sql", (product_id, ))
+    row = cursor.fetchone()
 
     cursor.close()
     conn.close()
 
-    return render_template("product_detail.html", product=product, snapshots=snapshots)
+    if not row:
+        return "Product not found.", 404
+
+    overview = json.loads(row[0])
+    return render_template("product_detail.html",
+                           product=overview["product"],
+                           snapshots=overview["snapshots"])
 
 @app.route("/product/<int:product_id>/create_snapshot", methods=["GET"])
 def create_snapshot_form(product_id):
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    product_query = load_sql_file("sql/get_product_details.sql")
-    recipe_query = load_sql_file("sql/get_product_recipes.sql")
-
-    cursor.execute(product_query, (product_id,))
-    product = cursor.fetchone()
-
-    cursor.execute(recipe_query, (product_id,))
-    recipes = cursor.fetchall()
+    execute_sql(cursor, "sql/get_product_overview.sql", (product_id, ))
+    row = cursor.fetchone()
 
     cursor.close()
     conn.close()
 
-    return render_template("create_snapshot.html", product=product, recipes=recipes)
+    if not row:
+        return "Product not found.", 404
+
+    overview = json.loads(row[0])
+    return render_template("create_snapshot.html",
+                           product=overview["product"],
+                           recipes=overview["recipe_versions"])
 
 @app.route("/products/<int:product_id>/snapshots/<int:snapshot_version>")
 def view_snapshot(product_id, snapshot_version):
@@ -308,8 +348,8 @@ def create_snapshot():
         product_id = request.form.get("product_id")
         recipe_version = request.form.get("recipe_version")
 
-        print("Product ID:", product_id)
-        print("Recipe Version:", recipe_version)
+        logger.debug("Creating snapshot",
+                     extra={"product_id": product_id, "recipe_version": recipe_version})
 
         if not product_id or not recipe_version:
             raise ValueError("Missing product_id or recipe_version")
@@ -330,8 +370,6 @@ def create_snapshot():
 
         name, sku, category_id, category_name, flavor_id, flavor_name, size_id, size_name = product_details
 
-        print("Executing Insert Query with:", product_id, recipe_version, name, sku, category_id, category_name, flavor_id, flavor_name, size_id, size_name)
-
         # Execute insert query
         cursor.execute(insert_query, (
             product_id, product_id, name, sku, category_id, category_name,
@@ -345,40 +383,53 @@ def create_snapshot():
         return jsonify({"success": True, "message": "Snapshot created successfully!"})
 
     except Exception as e:
-        print("Error inserting snapshot:", str(e))
+        logger.exception("Error inserting snapshot",
+                         extra={"product_id": request.form.get("product_id")})
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route("/search_products", methods=["GET"])
 def search_products():
     """
-    Searches for products by name (case-insensitive) and returns matching results.
+    Searches for products by name, SKU, category or flavor (case-insensitive)
+    and returns the best matches, exact SKU and name prefix matches first.
     """
     query = request.args.get("query", "").strip()
 
-    print(f"Searching for products with query: {query}")
-
     if not query:
         return jsonify([])  # Return empty list if no query provided
 
+    limit = min(get_page_size(request.args, default=SEARCH_RESULT_LIMIT),
+                SEARCH_RESULT_LIMIT)
+
+    cache_key = (query.lower(), limit)
+    results = search_cache.get(cache_key)
+    if results is not None:
+        return jsonify(results)
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Load SQL query from file
-    sql_query = load_sql_file("sql/search_products.sql")
+    contains_pattern = '%' + escape_like(query) + '%'
+    prefix_pattern = escape_like(query) + '%'
 
     try:
-        cursor.execute(sql_query, ('%' + query + '%',))  # Search by name (LIKE %query%)
+        execute_sql(cursor, "sql/search_products.sql",
+                    (contains_pattern, contains_pattern, contains_pattern,
+                     contains_pattern, query, prefix_pattern, query, limit))
         products = cursor.fetchall()
         cursor.close()
         conn.close()
 
-        print(f"Found {len(products)} products matching the query.")
+        logger.debug("Product search", extra={"query": query, "matches": len(products)})
 
         # Format response as a list of dictionaries
-        return jsonify([{
+        results = [{
             "id": product[0],
             "name": product[1]
-        } for product in products])
+        } for product in products]
+        search_cache.set(cache_key, results)
+
+        return jsonify(results)
 
     except Exception as e:
         cursor.close()
@@ -399,38 +450,22 @@ def fetch_product_snapshots():
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Load SQL query from file
-    sql_query = load_sql_file("sql/get_product_snapshots.sql")
-
-    cursor.execute(sql_query, (product_id,))
-    snapshots = cursor.fetchall()
-
-    cursor.close()
-    conn.close()
+    execute_sql(cursor, "sql/get_product_snapshots.sql", (product_id,))
 
-    # Format response as a list of dictionaries
-    results = [{
+    return stream_json_array(conn, cursor, lambda snapshot: {
         "snapshot_id": snapshot[0],
         "version": snapshot[1],
         "created_at": snapshot[2]
-    } for snapshot in snapshots]
-
-    return jsonify(results)
+    })
 
 
 @app.route("/categories")
 def categories():
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Fetch all categories
+    # Fetch all categories (cached)
     # -----------
 
-    query = load_sql_file("sql/list_categories.sql")
-    cursor.execute(query)
-    categories = cursor.fetchall()
-    conn.close()
+    categories = get_reference_data("categories")
 
     return render_template("categories.html", categories=categories)
 
@@ -451,6 +486,7 @@ def add_category():
 
         query = load_sql_file("sql/add_category.sql")
         cursor.execute(query, (name, description))
+        invalidate_reference_data(cursor, "categories")
         conn.commit()
         conn.close()
         return redirect(url_for("categories"))
@@ -479,6 +515,7 @@ def edit_category(id):
 
         query = load_sql_file("sql/edit_category.sql")
         cursor.execute(query, (name, description, id))
+        invalidate_reference_data(cursor, "categories")
         conn.commit()
         conn.close()
 
@@ -511,6 +548,7 @@ def delete_category(id):
 
     query = load_sql_file("sql/delete_category.sql")
     cursor.execute(query, (id, ))
+    invalidate_reference_data(cursor, "categories")
     conn.commit()
     conn.close()
 
@@ -520,15 +558,9 @@ def delete_category(id):
 @app.route("/flavors")
 def flavors():
     """
-    Fetches all flavors from the database and displays them in a table.
+    Fetches all flavors (cached) and displays them in a table.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    query = load_sql_file("sql/list_flavors.sql")
-    cursor.execute(query)
-    flavors = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    flavors = get_reference_data("flavors")
     return render_template("flavors.html", flavors=flavors)
 
 
@@ -547,6 +579,7 @@ def add_flavor():
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute(query, (name, ))
+        invalidate_reference_data(cursor, "flavors")
         conn.commit()
 
         cursor.close()
@@ -572,6 +605,7 @@ def edit_flavor(id):
         # Update flavor
         query = load_sql_file("sql/edit_flavor.sql")
         cursor.execute(query, (name, id))
+        invalidate_reference_data(cursor, "flavors")
         conn.commit()
 
         cursor.close()
@@ -601,6 +635,7 @@ def delete_flavor(id):
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute(query, (id, ))
+    invalidate_reference_data(cursor, "flavors")
     conn.commit()
 
     cursor.close()
@@ -611,17 +646,9 @@ def delete_flavor(id):
 @app.route("/sizes")
 def sizes():
     """
-    Fetches all sizes from the database and displays them.
+    Fetches all sizes (cached) and displays them.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    query = load_sql_file("sql/list_sizes.sql")
-    cursor.execute(query)
-    sizes = cursor.fetchall()
-
-    cursor.close()
-    conn.close()
+    sizes = get_reference_data("sizes")
 
     return render_template("sizes.html", sizes=sizes)
 
@@ -640,6 +667,7 @@ def add_size():
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute(query, (name, weight_g))
+        invalidate_reference_data(cursor, "sizes")
         conn.commit()
 
         cursor.close()
@@ -665,12 +693,13 @@ def edit_size(id):
 
         query = load_sql_file("sql/edit_size.sql")
         cursor.execute(query, (name, weight_g, id))
+        invalidate_reference_data(cursor, "sizes")
         conn.commit()
 
         cursor.close()
         conn.close()
 
-        return redirect(url_for("list_sizes"))
+        return redirect(url_for("sizes"))
 
     # Fetch size details
     query = load_sql_file("sql/select_size_to_edit.sql")
@@ -695,28 +724,40 @@ def delete_size(id):
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute(query, (id, ))
+    invalidate_reference_data(cursor, "sizes")
     conn.commit()
 
     cursor.close()
     conn.close()
 
-    return redirect(url_for("list_sizes"))
+    return redirect(url_for("sizes"))
 
 
 @app.route("/manufacturing_orders")
 def manufacturing_orders():
+    limit = get_page_size(request.args)
+    try:
+        after_date, after_id = decode_cursor(request.args.get("after"), date, int)
+    except ValueError:
+        return "Invalid page cursor.", 400
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    query = load_sql_file("sql/list_manufacturing_orders.sql")
-    cursor.execute(query)
+    execute_sql(cursor, "sql/list_manufacturing_orders.sql",
+                (after_date, after_date, after_id, limit + 1))
     manufacturing_orders = cursor.fetchall()
 
     cursor.close()
     conn.close()
 
+    manufacturing_orders, next_cursor = split_page(
+        manufacturing_orders, limit, lambda order: (order[3], order[0]))
+
     return render_template("manufacturing_orders.html",
-                           manufacturing_orders=manufacturing_orders)
+                           manufacturing_orders=manufacturing_orders,
+                           next_cursor=next_cursor,
+                           limit=limit)
 
 
 @app.route("/manufacturing_orders/add", methods=["GET", "POST"])
@@ -744,8 +785,6 @@ def add_manufacturing_order():
 
     # Fetch products with grams per unit
     query = load_sql_file("sql/fetch_products.sql")
-    conn = get_db_connection()
-    cursor = conn.cursor()
     cursor.execute(query)
     products = cursor.fetchall()
     cursor.close()
@@ -792,9 +831,7 @@ def edit_manufacturing_order(id):
     cursor.execute(query)
     products = cursor.fetchall()
 
-    query = load_sql_file("sql/list_sizes.sql")
-    cursor.execute(query)
-    sizes = cursor.fetchall()
+    sizes = get_reference_data("sizes", cursor)
 
     cursor.close()
     conn.close()
@@ -810,6 +847,10 @@ def delete_manufacturing_order(id):
     conn = get_db_connection()
     cursor = conn.cursor()
 
+    # Give back anything the order still holds reserved, then delete it (its
+    # ledger movements stay as history)
+    execute_sql(cursor, "sql/release_mo_reservations.sql", (id, id))
+
     query = load_sql_file("sql/delete_manufacturing_order.sql")
     cursor.execute(query, (id, ))
     conn.commit()
@@ -830,8 +871,7 @@ def update_manufacturing_order_status(id):
     cursor = conn.cursor()
 
     # Fetch the MO details
-    query = load_sql_file("sql/select_mo_details.sql")
-    cursor.execute(query, (id, ))
+    execute_sql(cursor, "sql/select_mo_details.sql", (id, ))
     mo = cursor.fetchone()
 
     if not mo:
@@ -846,111 +886,208 @@ def update_manufacturing_order_status(id):
         conn.close()
         return "Cannot change status of a completed manufacturing order.", 400
 
-    # Handle transitions
+    # Handle transitions: reserve or consume every raw material on the product's
+    # compiled BOM in a single all-or-nothing statement, recorded in the inventory ledger
+    material_query = None
     if current_status == "Pending" and new_status == "In Progress":
-        # Reserve raw materials
-        query = load_sql_file("sql/list_bom_for_product.sql")
-        cursor.execute(query, (product_id, ))
-        raw_materials = cursor.fetchall()
-
-        for rm_id, available, accounted, quantity_per_unit in raw_materials:
-            total_required = units_to_produce * quantity_per_unit
-            if available < total_required:
-                cursor.close()
-                conn.close()
-                return f"Not enough raw material (ID: {rm_id}). Needed: {total_required}, Available: {available}", 400
-            # Reserve the materials
-            query = load_sql_file("sql/reserve_raw_materials.sql")
-            cursor.execute(query, (total_required, total_required, rm_id))
-
+        material_query = "sql/reserve_raw_materials.sql"
+        mo_params = (id, )
     elif current_status == "In Progress" and new_status == "Complete":
-        # Deduct raw materials
-        query = load_sql_file("sql/list_bom_for_product.sql")
-        cursor.execute(query, (product_id, ))
-        raw_materials = cursor.fetchall()
+        material_query = "sql/deduct_raw_materials.sql"
+        mo_params = (id, id)
+
+    if material_query:
+        recipe_lines = []
+        for retry in (False, True):
+            # No rows back means the cached BOM's recipe was deactivated or its
+            # lines changed in the meantime: recompile it once
+            if retry:
+                invalidate_bom(product_id)
+            bom = get_bom(cursor, product_id)
+            if bom is None:
+                break
+            execute_sql(cursor, material_query,
+                        (units_to_produce, bom.raw_material_ids, bom.quantities,
+                         bom.recipe_id, bom.lines_version) + mo_params)
+            recipe_lines = cursor.fetchall()
+            if recipe_lines:
+                break
+
+        if not recipe_lines:
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return "No active recipe found for this product.", 400
 
-        for rm_id, accounted, quantity_per_unit in raw_materials:
-            total_used = units_to_produce * quantity_per_unit
-            query = load_sql_file("sql/deduct_raw_materials.sql")
-            cursor.execute(query, (total_used, rm_id))
+        shortages = [line for line in recipe_lines if line[4]]
+        if shortages:
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            details = "; ".join(
+                f"{name} (ID: {rm_id}) Needed: {required:.2f}, Available: {on_hand:.2f}"
+                for rm_id, name, required, on_hand, _ in shortages)
+            return f"Not enough raw materials. {details}", 400
 
     # Update the MO status
-    query = load_sql_file("sql/update_mo_status.sql")
-    cursor.execute(query, (new_status, id))
+    execute_sql(cursor, "sql/update_mo_status.sql", (new_status, id))
     conn.commit()
 
     cursor.close()
     conn.close()
 
-    return redirect(url_for("list_manufacturing_orders"))
+    return redirect(url_for("manufacturing_orders"))
 
 
-@app.route("/raw_materials")
-def raw_materials():
+@app.route("/mrp", methods=["GET"])
+def material_requirements():
     """
-    Display all raw materials with their associated details and tags.
+    Returns the time-phased raw material shortages for all open
+    manufacturing orders (see mrp.py).
     """
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Fetch raw materials
-    query = load_sql_file("sql/list_raw_materials.sql")
-    cursor.execute(query)
-    raw_materials = cursor.fetchall()
+    shortages = plan_material_requirements(cursor)
+
+    cursor.close()
+    conn.close()
 
-    # Process tags column
-    formatted_raw_materials = []
-    for raw_material in raw_materials:
-        raw_material = list(raw_material)  # Convert tuple to list
-        tags = raw_material[8]  # Extract tags column
+    return jsonify(shortages)
 
-        # Handle tags if it's a list containing a JSON string
-        if isinstance(tags, list) and len(tags) == 1 and isinstance(
-                tags[0], str):
-            try:
-                raw_material[8] = json.loads(
-                    tags[0])  # Deserialize JSON string
-            except json.JSONDecodeError:
-                raw_material[8] = []  # Default to empty list on error
-        elif not isinstance(tags, list):
-            raw_material[8] = [
-            ]  # Default to empty list if tags are not a list
 
-        formatted_raw_materials.append(raw_material)
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    """
+    Queues a background job (see jobs.py) from a JSON body such as
+    {"job_type": "product_snapshots", "payload": {"product_ids": [1, 2]}}
+    and returns its id and status URL without waiting for it to run.
+    """
+    data = request.get_json(silent=True) or {}
+    payload = data.get("payload") or {}
+    if not isinstance(payload, dict):
+        return jsonify({"error": "payload must be a JSON object"}), 400
 
-    print(formatted_raw_materials)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        job_id = enqueue_job(cursor, data.get("job_type"), payload)
+    except ValueError as e:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        return jsonify({"error": str(e)}), 400
+
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    status_url = url_for("job_status", id=job_id)
+    return jsonify({"id": job_id, "status": "queued", "status_url": status_url}), 202, {"Location": status_url}
+
+
+@app.route("/jobs/<int:id>", methods=["GET"])
+def job_status(id):
+    """ Returns a background job's status, attempts, error and result. """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    job = get_job(cursor, id)
+
+    cursor.close()
+    conn.close()
+
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@app.route("/raw_materials")
+def raw_materials():
+    """
+    Display one page of raw materials with their associated details and tags.
+    Repeat ?tag=<name> to only list materials carrying all of those tags.
+    """
+    limit = get_page_size(request.args)
+    try:
+        after_name, after_id = decode_cursor(request.args.get("after"), str, int)
+    except ValueError:
+        return "Invalid page cursor.", 400
+
+    # Deduplicated: the filter matches materials carrying as many tags as requested
+    tags = list(dict.fromkeys(request.args.getlist("tag"))) or None
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    # Fetch one page of raw materials, with their tag names
+    execute_sql(cursor, "sql/list_raw_materials_page.sql",
+                (tags, tags, tags, after_name, after_name, after_id, limit + 1))
+    raw_materials = cursor.fetchall()
+    raw_materials, next_cursor = split_page(raw_materials, limit,
+                                            lambda rm: (rm[1], rm[0]))
+
+    log_payload(logger, "Raw materials page", raw_materials)
 
     cursor.close()
     conn.close()
 
     return render_template("raw_materials.html",
-                           raw_materials=formatted_raw_materials)
+                           raw_materials=raw_materials,
+                           tags=tags or [],
+                           next_cursor=next_cursor,
+                           limit=limit)
 
 
 @app.route("/fetch_raw_materials", methods=["GET"])
 def fetch_raw_materials():
     """
-    Fetches all raw materials to update dropdown options dynamically.
+    Fetches raw materials to update dropdown options dynamically, one page at
+    a time (see jsonify_page for the next-page token). Repeat ?tag=<name> to
+    only return materials carrying all of those tags.
     """
+    limit = get_page_size(request.args, default=MAX_PAGE_SIZE)
+    try:
+        after_name, after_id = decode_cursor(request.args.get("after"), str, int)
+    except ValueError:
+        return jsonify({"error": "Invalid page cursor"}), 400
+
+    # Deduplicated: the filter matches materials carrying as many tags as requested
+    tags = list(dict.fromkeys(request.args.getlist("tag"))) or None
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    query = load_sql_file("sql/list_raw_materials.sql")
-    cursor.execute(query)
+    validator = get_validator(cursor, "raw_materials", "vendors", "unit_of_measure",
+                              "tags", "raw_material_tags")
+    if is_not_modified(validator):
+        cursor.close()
+        conn.close()
+        return not_modified(validator)
+
+    execute_sql(cursor, "sql/list_raw_materials_page.sql",
+                (tags, tags, tags, after_name, after_name, after_id, limit + 1))
     raw_materials = cursor.fetchall()
 
     cursor.close()
     conn.close()
 
+    raw_materials, next_cursor = split_page(raw_materials, limit,
+                                            lambda rm: (rm[1], rm[0]))
+
     # Convert tuple results to dictionaries for JSON response
     raw_materials_list = [{
         "id": rm[0],
         "name": rm[1],
         "vendor": rm[2],
-        "unit_of_measure_name": rm[3]
+        "unit_of_measure_name": rm[3],
+        "tags": rm[8]
     } for rm in raw_materials]
 
-    return jsonify(raw_materials_list)
+    response = jsonify_page(raw_materials_list, next_cursor, "fetch_raw_materials",
+                            limit, tag=tags)
+    return add_cache_headers(response, validator)
 
 
 @app.route("/raw_materials/add", methods=["GET", "POST"])
@@ -967,20 +1104,15 @@ def add_raw_material():
         vendor_id = request.form.get("vendor_id")
         unit_of_measure_id = request.form.get("unit_of_measure_id")
         moq = request.form.get("moq")
-        tags = request.form.get("tags").split(
-            ",")  # Split comma-separated tags into a list
+        tags = parse_tag_input(request.form.get("tags"))
 
-        # Add new tags to the `tags` table
-        for tag in tags:
-            query = load_sql_file("sql/add_tag.sql")
-            cursor.execute(query,
-                           (tag.strip(), ))  # Add tag, ignore duplicates
-
-        # Add raw material with tags as JSONB
+        # Add the raw material, then link its tags (creating new ones)
         query = load_sql_file("sql/add_raw_material.sql")
-        cursor.execute(
-            query,
-            (name, vendor_id, unit_of_measure_id, moq, json.dumps(tags)))
+        cursor.execute(query, (name, vendor_id, unit_of_measure_id, moq))
+        raw_material_id = cursor.fetchone()[0]
+
+        query = load_sql_file("sql/set_raw_material_tags.sql")
+        cursor.execute(query, (tags, raw_material_id, raw_material_id))
         conn.commit()
 
         cursor.close()
@@ -988,13 +1120,8 @@ def add_raw_material():
         return redirect(url_for("raw_materials"))
 
     # Fetch dropdown options
-    query = load_sql_file("sql/list_vendors.sql")
-    cursor.execute(query)
-    vendors = cursor.fetchall()
-
-    query = load_sql_file("sql/list_unit_of_measure.sql")
-    cursor.execute(query)
-    unit_of_measure = cursor.fetchall()
+    vendors = get_reference_data("vendors", cursor)
+    unit_of_measure = get_reference_data("unit_of_measure", cursor)
 
     cursor.close()
     conn.close()
@@ -1015,19 +1142,14 @@ def edit_raw_material(id):
         vendor_id = request.form.get("vendor_id")
         unit_of_measure_id = request.form.get("unit_of_measure_id")
         moq = request.form.get("moq")
-        tags = request.form.get("tags")  # Get CSV string of tags
-
-        # Split CSV into a list of tag strings
-        if tags:
-            tags_list = [{"value": tag.strip()} for tag in tags.split(',')]
-
-        # Serialize tags to JSON
-        tags_json = json.dumps(tags_list)
+        tags = parse_tag_input(request.form.get("tags"))  # CSV string of tags
 
-        # Update raw material in the database
+        # Update raw material in the database, then replace its tags
         query = load_sql_file("sql/edit_raw_material.sql")
-        cursor.execute(
-            query, (name, vendor_id, unit_of_measure_id, moq, tags_json, id))
+        cursor.execute(query, (name, vendor_id, unit_of_measure_id, moq, id))
+
+        query = load_sql_file("sql/set_raw_material_tags.sql")
+        cursor.execute(query, (tags, id, id))
         conn.commit()
 
         cursor.close()
@@ -1045,13 +1167,8 @@ def edit_raw_material(id):
         return "Raw material not found.", 404
 
     # Fetch dropdown options
-    query = load_sql_file("sql/list_vendors.sql")
-    cursor.execute(query)
-    vendors = cursor.fetchall()
-
-    query = load_sql_file("sql/list_unit_of_measure.sql")
-    cursor.execute(query)
-    unit_of_measure = cursor.fetchall()
+    vendors = get_reference_data("vendors", cursor)
+    unit_of_measure = get_reference_data("unit_of_measure", cursor)
 
     query = load_sql_file("sql/list_tags.sql")
     cursor.execute(query)
@@ -1093,25 +1210,24 @@ def stock_adjustment(id):
         # Get form data
         adjustment_amount = float(request.form.get("adjustment_amount"))
         adjustment_reason = request.form.get("adjustment_reason")
+        if request.form.get("adjustment_type") == "remove":
+            adjustment_amount = -abs(adjustment_amount)
 
-        # Fetch raw material details
-        query = load_sql_file("sql/select_raw_material.sql")
-        cursor.execute(query, (id, ))
-        raw_material = cursor.fetchone()
-
-        if not raw_material:
+        # Record the adjustment in the inventory ledger; its trigger applies
+        # the change to the raw material's balance
+        query = load_sql_file("sql/add_stock_adjustment.sql")
+        try:
+            cursor.execute(query, (id, adjustment_amount, adjustment_reason))
+        except errors.ForeignKeyViolation:
+            conn.rollback()
             cursor.close()
             conn.close()
             return "Raw material not found.", 404
-
-        # Update total inventory directly
-        query = load_sql_file("sql/update_total_inventory.sql")
-        cursor.execute(query, (adjustment_amount, id))
-
-        # Log stock adjustment for tracking (optional)
-        query = load_sql_file("sql/add_stock_adjustment.sql")
-        cursor.execute(
-            query, (id, adjustment_amount, raw_material[2], adjustment_reason))
+        except errors.CheckViolation:
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return "Not enough stock on hand to remove that amount.", 400
 
         conn.commit()
         cursor.close()
@@ -1127,44 +1243,213 @@ def stock_adjustment(id):
     cursor.close()
     conn.close()
 
+    if not raw_material:
+        return "Raw material not found.", 404
+
     return render_template("stock_adjustment.html", raw_material=raw_material)
 
 
+@app.route("/raw_materials/<int:id>/costs", methods=["GET", "POST"])
+def raw_material_costs(id):
+    """
+    GET returns the raw material's unit cost history, current cost first.
+    POST records a new unit cost from a form or JSON body: unit_cost and an
+    optional effective_from (date or ISO timestamp, backdating allowed, not
+    the future). The cost rollup of every product using the material is
+    refreshed by trigger in the same transaction.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    if request.method == "POST":
+        data = request.get_json(silent=True) or request.form
+        try:
+            unit_cost = float(data.get("unit_cost"))
+            effective_from = data.get("effective_from") or None
+            if effective_from:
+                effective_from = datetime.fromisoformat(effective_from)
+            if not unit_cost >= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            cursor.close()
+            conn.close()
+            return jsonify({"error": "unit_cost must be a non-negative number and "
+                                     "effective_from a date or ISO timestamp"}), 400
+
+        try:
+            execute_sql(cursor, "sql/add_raw_material_cost.sql", (id, unit_cost, effective_from))
+        except errors.ForeignKeyViolation:
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return jsonify({"error": "Raw material not found"}), 404
+        except (errors.CheckViolation, errors.NumericValueOutOfRange):
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return jsonify({"error": "Costs cannot take effect in the future, "
+                                     "and must be below 100,000,000"}), 400
+        cost_id, effective_from = cursor.fetchone()
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        return jsonify({"id": cost_id, "raw_material_id": id, "unit_cost": unit_cost,
+                        "effective_from": effective_from.isoformat()}), 201
+
+    execute_sql(cursor, "sql/list_raw_material_costs.sql", (id, ))
+    costs = cursor.fetchall()
+
+    cursor.close()
+    conn.close()
+
+    return jsonify([{
+        "id": cost_id,
+        "unit_cost": unit_cost,
+        "effective_from": effective_from.isoformat(),
+        "created_at": created_at.isoformat()
+    } for cost_id, unit_cost, effective_from, created_at in costs])
+
+
+@app.route("/reports/margins", methods=["GET"])
+def margin_report():
+    """
+    Returns per-unit material cost and margin for every product with an
+    active recipe, lowest margin first, read from the trigger-maintained
+    product_costs rollup. ?below=<percent> limits it to products under that
+    margin.
+    """
+    below = request.args.get("below")
+    try:
+        below = float(below) if below else None
+    except ValueError:
+        return jsonify({"error": "Invalid below percentage"}), 400
+
+    conn = get_db_connection()
+    cursor = open_server_cursor(conn, "sql/list_product_margins.sql", (below, below))
+
+    return stream_json_array(conn, cursor)
+
+
+@app.route("/exports/<name>", methods=["GET"])
+def export(name):
+    """
+    Streams a bulk export of products, raw_materials, recipes (every
+    version) or stock_adjustments as ?format=csv (default) or ndjson.
+    """
+    export_format = request.args.get("format", "csv")
+    if name not in EXPORTS:
+        return "Export not found.", 404
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Invalid format; use one of {', '.join(EXPORT_FORMATS)}"}), 400
+
+    return export_response(name, export_format)
+
+
+@app.route("/raw_materials/inventory_as_of", methods=["GET"])
+def inventory_as_of():
+    """
+    Returns raw material balances at a point in time from the inventory
+    ledger: ?as_of=YYYY-MM-DD (end of that day) or an ISO timestamp, with an
+    optional raw_material_id. The ledger starts at the opening balances
+    recorded when it was introduced.
+    """
+    as_of = request.args.get("as_of", "")
+    try:
+        if len(as_of) == 10:
+            as_of = datetime.combine(date.fromisoformat(as_of), time.max)
+        else:
+            as_of = datetime.fromisoformat(as_of)
+    except ValueError:
+        return jsonify({"error": "as_of must be a date (YYYY-MM-DD) or ISO timestamp"}), 400
+
+    raw_material_id = request.args.get("raw_material_id", type=int)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    execute_sql(cursor, "sql/get_inventory_as_of.sql",
+                (as_of, as_of, as_of, raw_material_id, raw_material_id))
+    rows = cursor.fetchall()
+
+    cursor.close()
+    conn.close()
+
+    return jsonify([{
+        "raw_material_id": row[0],
+        "name": row[1],
+        "on_hand": row[2],
+        "reserved": row[3],
+        "available": row[4],
+        "checkpoint_as_of": row[5],
+        "movements_since_checkpoint": row[6]
+    } for row in rows])
+
+
 @app.route("/vendors")
 def vendors():
+    limit = get_page_size(request.args)
+    try:
+        after_name, after_id = decode_cursor(request.args.get("after"), str, int)
+    except ValueError:
+        return "Invalid page cursor.", 400
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    query = load_sql_file("sql/list_vendors.sql")
-    cursor.execute(query)
+    execute_sql(cursor, "sql/list_vendors_page.sql",
+                (after_name, after_name, after_id, limit + 1))
     vendors = cursor.fetchall()
 
     cursor.close()
     conn.close()
 
-    return render_template("vendors.html", vendors=vendors)
+    vendors, next_cursor = split_page(vendors, limit,
+                                      lambda vendor: (vendor[1], vendor[0]))
+
+    return render_template("vendors.html",
+                           vendors=vendors,
+                           next_cursor=next_cursor,
+                           limit=limit)
 
 
 @app.route("/vendors/fetch", methods=["GET"])
 def fetch_vendors():
     """
-    Fetch all vendors from the database for dynamic dropdown updates.
+    Fetch vendors from the database for dynamic dropdown updates, one page at
+    a time (see jsonify_page for the next-page token).
     """
+    limit = get_page_size(request.args, default=MAX_PAGE_SIZE)
+    try:
+        after_name, after_id = decode_cursor(request.args.get("after"), str, int)
+    except ValueError:
+        return jsonify({"error": "Invalid page cursor"}), 400
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Load the SQL query from a file
-    query = load_sql_file("sql/list_vendors.sql")
-    cursor.execute(query)
+    validator = get_validator(cursor, "vendors")
+    if is_not_modified(validator):
+        cursor.close()
+        conn.close()
+        return not_modified(validator)
+
+    execute_sql(cursor, "sql/list_vendors_page.sql",
+                (after_name, after_name, after_id, limit + 1))
     vendors = cursor.fetchall()
 
     cursor.close()
     conn.close()
 
-    return jsonify([{
+    vendors, next_cursor = split_page(vendors, limit,
+                                      lambda vendor: (vendor[1], vendor[0]))
+
+    response = jsonify_page([{
         "id": vendor[0],
         "name": vendor[1]
-    } for vendor in vendors])
+    } for vendor in vendors], next_cursor, "fetch_vendors", limit)
+    return add_cache_headers(response, validator)
 
 
 @app.route("/vendors/add", methods=["GET", "POST"])
@@ -1180,6 +1465,7 @@ def add_vendor():
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute(query, (name, email, address, description, notes))
+        invalidate_reference_data(cursor, "vendors")
         conn.commit()
 
         cursor.close()
@@ -1210,6 +1496,7 @@ def edit_vendor(id):
         # Update vendor in the database
         query = load_sql_file("sql/edit_vendor.sql")
         cursor.execute(query, (name, email, address, description, notes, id))
+        invalidate_reference_data(cursor, "vendors")
         conn.commit()
 
         cursor.close()
@@ -1243,6 +1530,7 @@ def delete_vendor(id):
     # Delete vendor by ID
     query = load_sql_file("sql/delete_vendor.sql")
     cursor.execute(query, (id, ))
+    invalidate_reference_data(cursor, "vendors")
     conn.commit()
 
     cursor.close()
@@ -1256,48 +1544,49 @@ def fetch_tags():
     """
     Fetch all tags from the database for autocomplete suggestions.
     """
-    print('fetch_tags()')
-
     conn = get_db_connection()
     cursor = conn.cursor()
 
+    validator = get_validator(cursor, "tags")
+    if is_not_modified(validator):
+        cursor.close()
+        conn.close()
+        return not_modified(validator)
+
     # Load the SQL query from a file
     query = load_sql_file("sql/list_tags.sql")
     cursor.execute(query)
-    tags = cursor.fetchall()
+    tags = [row[0] for row in cursor.fetchall()]
 
     cursor.close()
     conn.close()
 
-    # Ensure proper extraction of tag values
-    clean_tags = []
-    for tag_tuple in tags:
-        tag_data = tag_tuple[0]  # Extract the first element from tuple
-        if isinstance(tag_data, str):
-            try:
-                parsed_tag = json.loads(tag_data)  # Convert JSON string to dict
-                if isinstance(parsed_tag, list):  # If it's a list of dicts
-                    clean_tags.extend(tag["value"] for tag in parsed_tag if "value" in tag)
-                elif isinstance(parsed_tag, dict) and "value" in parsed_tag:  # If it's a single dict
-                    clean_tags.append(parsed_tag["value"])
-            except json.JSONDecodeError:
-                clean_tags.append(tag_data)  # If it's already a string, keep it as is
-        elif isinstance(tag_data, dict) and "value" in tag_data:
-            clean_tags.append(tag_data["value"])
-
-    print(clean_tags)  # Debugging output to verify extraction
+    log_payload(logger, "Fetched tags", tags)
 
-    return jsonify(clean_tags)  # Return a clean list of tag strings
+    return add_cache_headers(jsonify(tags), validator)  # Plain list of tag strings
 
 
 @app.route("/recipes", methods=["GET"])
 def recipes():
+    limit = get_page_size(request.args)
+    try:
+        after_product_name, after_product_id, after_version = decode_cursor(
+            request.args.get("after"), str, int, int)
+    except ValueError:
+        return "Invalid page cursor.", 400
+
+    # Get selected product from query parameter
+    selected_product_id = request.args.get("product_id", "")
+    product_id = int(selected_product_id) if selected_product_id.isdigit() else None
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Load recipes query
-    recipes_query = load_sql_file("sql/list_recipes.sql")
-    cursor.execute(recipes_query)
+    # Load one page of recipes, optionally for a single product
+    execute_sql(cursor, "sql/list_recipes.sql",
+                (product_id, product_id,
+                 after_product_name, after_product_name, after_product_id,
+                 after_version, limit + 1))
     rows = cursor.fetchall()
 
     # Extract column names from cursor description
@@ -1319,6 +1608,10 @@ def recipes():
         recipe["product_id"] = recipe.get("product_id")  # Add product_id
         recipes.append(recipe)
 
+    recipes, next_cursor = split_page(
+        recipes, limit, lambda recipe:
+        (recipe["product_name"], recipe["product_id"], recipe["version"]))
+
     # Load products query
     products_query = load_sql_file("sql/list_products.sql")
     cursor.execute(products_query)
@@ -1327,15 +1620,12 @@ def recipes():
     cursor.close()
     conn.close()
 
-    # Get selected product from query parameter
-    selected_product_id = request.args.get("product_id", "")
-
-    print(json.dumps(recipes, indent=2))
-
     return render_template("recipes.html",
                            recipes=recipes,
                            products=products,
-                           selected_product_id=selected_product_id)
+                           selected_product_id=selected_product_id,
+                           next_cursor=next_cursor,
+                           limit=limit)
 
 
 @app.route("/recipes/add", methods=["GET", "POST"])
@@ -1345,22 +1635,30 @@ def add_recipe():
 
     if request.method == "POST":
         product_id = request.form.get("product_id")
-        raw_materials = request.form.getlist("raw_material_id[]")
-        quantities = request.form.getlist("quantity[]")
 
         if not product_id:
+            cursor.close()
+            conn.close()
             return "Error: Product ID is required", 400
 
+        try:
+            raw_material_ids, quantities = parse_recipe_lines(
+                request.form.getlist("raw_material_id[]"),
+                request.form.getlist("quantity[]"))
+        except ValueError as e:
+            cursor.close()
+            conn.close()
+            return f"Error: {e}", 400
+
         # Ensure a version is assigned
         query = load_sql_file("sql/add_recipe.sql")
         cursor.execute(query,
                        (product_id, product_id))  # Pass product_id twice
         recipe_id, version = cursor.fetchone()
 
-        # Insert raw materials into recipe_raw_materials
-        query = load_sql_file("sql/add_recipe_raw_material.sql")
-        for raw_material_id, quantity in zip(raw_materials, quantities):
-            cursor.execute(query, (recipe_id, raw_material_id, quantity))
+        # Insert every line in one statement
+        execute_sql(cursor, "sql/sync_recipe_raw_materials.sql",
+                    (raw_material_ids, quantities, recipe_id, recipe_id))
 
         conn.commit()
         cursor.close()
@@ -1391,39 +1689,46 @@ def edit_recipe(id):
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    if request.method == "POST":
-        raw_material_ids = request.form.getlist("raw_material_id[]")
-        quantities = request.form.getlist("quantity[]")
+    # Fetch recipe details
+    query = load_sql_file("sql/select_recipe.sql")
+    cursor.execute(query, (id, ))
+    recipe = cursor.fetchone()
 
-        # Delete existing recipe items
-        query = load_sql_file("sql/delete_recipe_items.sql")
-        cursor.execute(query, (id, ))
+    if not recipe:
+        cursor.close()
+        conn.close()
+        return "Recipe not found.", 404
+
+    if request.method == "POST":
+        try:
+            raw_material_ids, quantities = parse_recipe_lines(
+                request.form.getlist("raw_material_id[]"),
+                request.form.getlist("quantity[]"))
+        except ValueError as e:
+            cursor.close()
+            conn.close()
+            return f"Error: {e}", 400
 
-        # Insert updated recipe items
-        query = load_sql_file("sql/add_recipe_item.sql")
-        for raw_material_id, quantity in zip(raw_material_ids, quantities):
-            cursor.execute(query, (id, raw_material_id, quantity))
+        # Insert, update or delete only the lines that changed, in one statement
+        execute_sql(cursor, "sql/sync_recipe_raw_materials.sql",
+                    (raw_material_ids, quantities, id, id))
+        inserted, updated, deleted = cursor.fetchone()
+        logger.info("Recipe lines updated",
+                    extra={"recipe_id": id, "inserted": inserted,
+                           "updated": updated, "deleted": deleted})
+        invalidate_bom(recipe[4])
 
         conn.commit()
         cursor.close()
         conn.close()
         return redirect(url_for("recipes"))
 
-    # Fetch recipe details
-    query = load_sql_file("sql/select_recipe.sql")
-    cursor.execute(query, (id, ))
-    recipe = cursor.fetchone()
-
     # Fetch recipe items
     query = load_sql_file("sql/list_recipe_items.sql")
     cursor.execute(query, (id, ))
     recipe_items = cursor.fetchall()
 
-    # Fetch products and raw materials
-    query = load_sql_file("sql/list_products.sql")
-    cursor.execute(query)
-    products = cursor.fetchall()
-
+    # Fetch raw materials for the line dropdowns
     query = load_sql_file("sql/list_raw_materials.sql")
     cursor.execute(query)
     raw_materials = cursor.fetchall()
@@ -1433,7 +1738,6 @@ def edit_recipe(id):
     return render_template("edit_recipe.html",
                            recipe=recipe,
                            recipe_items=recipe_items,
-                           products=products,
                            raw_materials=raw_materials)
 
 
@@ -1445,6 +1749,7 @@ def delete_recipe(id):
     # Delete the recipe and its items
     query = load_sql_file("sql/delete_recipe.sql")
     cursor.execute(query, (id, ))
+    invalidate_bom(*(row[0] for row in cursor.fetchall()))
     conn.commit()
 
     cursor.close()
@@ -1469,21 +1774,29 @@ def fetch_recipe():
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Fetch only the active recipe for this product
-    query = load_sql_file("sql/fetch_active_recipe.sql")
-    cursor.execute(query, (product_id, ))
-    rows = cursor.fetchall()
+    # Lines of this product's active recipe, with current inventory levels
+    recipe_data = []
+    bom = get_bom(cursor, product_id)
+    if bom is not None:
+        execute_sql(cursor, "sql/fetch_active_recipe.sql",
+                    (bom.raw_material_ids, bom.quantities))
+        rows = cursor.fetchall()
 
-    # Extract column names from cursor description
-    columns = [col[0] for col in cursor.description]
+        # Extract column names from cursor description
+        columns = [col[0] for col in cursor.description]
 
-    # Convert rows to a list of dictionaries
-    recipe_data = [dict(zip(columns, row)) for row in rows]
+        # Convert rows to a list of dictionaries
+        recipe_data = [dict(zip(columns, row, strict=True)) for row in rows]
 
     cursor.close()
     conn.close()
 
-    return jsonify(recipe_data)
+    # Live inventory levels have no change counter (the ledger updates them on
+    # every movement), so the ETag comes from the data itself
+    validator = validator_for(recipe_data)
+    if is_not_modified(validator):
+        return not_modified(validator)
+    return add_cache_headers(jsonify(recipe_data), validator)
 
 
 @app.route("/recipes/view/<int:recipe_id>")
@@ -1515,6 +1828,7 @@ def activate_recipe(id):
     # Activate the selected recipe
     query = load_sql_file("sql/activate_recipe.sql")
     cursor.execute(query, (id, ))
+    invalidate_bom(*(row[0] for row in cursor.fetchall()))
 
     conn.commit()
     cursor.close()
@@ -1531,6 +1845,7 @@ def deactivate_recipe(id):
 
     query = load_sql_file("sql/deactivate_recipe.sql")
     cursor.execute(query, (id, ))
+    invalidate_bom(*(row[0] for row in cursor.fetchall()))
 
     conn.commit()
     cursor.close()
@@ -1545,6 +1860,13 @@ def fetch_recipe_versions():
     conn = get_db_connection()
     cursor = conn.cursor()
 
+    validator = get_validator(cursor, "recipe_raw_materials", "raw_materials",
+                              "unit_of_measure", "vendors")
+    if is_not_modified(validator):
+        cursor.close()
+        conn.close()
+        return not_modified(validator)
+
     query = load_sql_file("sql/get_recipe_details.sql")
     cursor.execute(query, (recipe_version,))
     recipe_details = cursor.fetchall()
@@ -1552,9 +1874,6 @@ def fetch_recipe_versions():
     cursor.close()
     conn.close()
 
-    # Debugging log
-    print(f"Recipe Details for version {recipe_version}: {recipe_details}")
-
     # Convert SQL result into JSON response
     response_data = [
         {
@@ -1566,8 +1885,9 @@ def fetch_recipe_versions():
         for row in recipe_details
     ]
 
-    print(f"JSON Response: {response_data}")  # Debugging Output
-    return jsonify(response_data)
+    log_payload(logger, "Recipe version details", response_data,
+                recipe_version=recipe_version)
+    return add_cache_headers(jsonify(response_data), validator)
 
 
 @app.route("/recipes/fetch_details", methods=["GET"])
@@ -1578,17 +1898,13 @@ def fetch_recipe_details():
 
     conn = get_db_connection()
     cursor = conn.cursor()
-    query = load_sql_file("sql/fetch_recipe_details.sql")
-    cursor.execute(query, (recipe_id, ))
-    details = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    execute_sql(cursor, "sql/fetch_recipe_details.sql", (recipe_id, ))
 
-    return jsonify([{
+    return stream_json_array(conn, cursor, lambda d: {
         "raw_material_name": d[0],
         "quantity": d[1],
         "unit": d[2]
-    } for d in details])
+    })
 
 
 if __name__ == '__main__':
@@ -0,0 +1,205 @@
+"""
+Request, SQL, connection pool and template timings, exposed in the
+Prometheus text format at /metrics.
+
+SQL statements are labelled with the sql/ file they were loaded from (see
+load_sql_file() in utils.py); statements written inline in Python are
+grouped under "inline". Metrics live in process memory, so with several
+gunicorn workers each scrape reports the worker that served it; the
+"pid" label tells them apart. With METRICS_SERVER_TIMING=1 every response
+also carries a Server-Timing header with the same breakdown for that
+request, readable in the browser's network panel.
+"""
+
+import os
+import threading
+import time
+
+from flask import (
+    Response,
+    before_render_template,
+    g,
+    has_request_context,
+    request,
+    template_rendered,
+)
+
+METRICS_SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING", "0") == "1"
+
+# Prometheus' default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = []
+
+
+def _format_labels(names, values) -> str:
+    """ Renders label pairs as {name="value",...}, escaped per the text format. """
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values, strict=True):
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """ A monotonically increasing value per label combination. """
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = ("pid", *labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount: float = 1, *labels):
+        key = (os.getpid(), *labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """ Bucketed observations (plus count and sum) per label combination. """
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = ("pid", *labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value: float, *labels):
+        key = (os.getpid(), *labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += 1
+            entry[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = [(key, list(entry)) for key, entry in self._values.items()]
+        for key, entry in values:
+            names = (*self.labelnames, "le")
+            # entry holds one count per bucket, then the total count and the sum
+            for bound, count in zip(self.buckets, entry, strict=False):
+                lines.append(f"{self.name}_bucket{_format_labels(names, (*key, bound))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(names, (*key, '+Inf'))} {entry[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {entry[-2]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {entry[-1]}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "prymal_http_request_duration_seconds", "Time spent handling a request.",
+    ("endpoint", "method", "status"))
+SQL_DURATION = Histogram(
+    "prymal_sql_duration_seconds", "Time spent executing a statement, by sql/ file.",
+    ("file", ))
+SQL_ROWS = Counter(
+    "prymal_sql_rows_total", "Rows returned or affected by statements, by sql/ file.",
+    ("file", ))
+CONNECTION_WAIT = Histogram(
+    "prymal_db_connection_wait_seconds", "Time spent checking a connection out of the pool.")
+TEMPLATE_RENDER = Histogram(
+    "prymal_template_render_seconds", "Time spent rendering a template.",
+    ("template", ))
+
+
+def observe_sql(filename: str, seconds: float, rows: int):
+    """ Records one statement execution. """
+    SQL_DURATION.observe(seconds, filename)
+    if rows > 0:
+        SQL_ROWS.inc(rows, filename)
+    _add_request_timing("db", seconds)
+
+
+def observe_connection_wait(seconds: float):
+    """ Records how long a connection checkout took. """
+    CONNECTION_WAIT.observe(seconds)
+    _add_request_timing("conn", seconds)
+
+
+def render_metrics() -> str:
+    """ Returns every metric in the Prometheus text exposition format. """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def init_metrics(app):
+    """
+    Registers the request and template timing hooks and the /metrics
+    endpoint on the Flask app.
+    """
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started_at = time.perf_counter()
+        g.request_timings = {}
+
+    @app.after_request
+    def record_request_duration(response):
+        started_at = g.get("request_started_at")
+        if started_at is None:
+            return response
+
+        seconds = time.perf_counter() - started_at
+        REQUEST_DURATION.observe(seconds, request.endpoint or "unmatched",
+                                 request.method, response.status_code)
+
+        if METRICS_SERVER_TIMING:
+            entries = [f"app;dur={seconds * 1000:.1f}"]
+            for name, (total, count) in g.get("request_timings", {}).items():
+                entries.append(f'{name};dur={total * 1000:.1f};desc="{count}x"')
+            response.headers["Server-Timing"] = ", ".join(entries)
+        return response
+
+    # Signal receivers take the sender and signal arguments whether they use them or not
+    def start_template_timer(sender, template, context, **extra):  # noqa: ARG001
+        g.setdefault("template_started_at", []).append(time.perf_counter())
+
+    def record_template_duration(sender, template, context, **extra):  # noqa: ARG001
+        started = g.get("template_started_at")
+        if not started:
+            return
+        seconds = time.perf_counter() - started.pop()
+        TEMPLATE_RENDER.observe(seconds, template.name or "string")
+        _add_request_timing("tpl", seconds)
+
+    before_render_template.connect(start_template_timer, app, weak=False)
+    template_rendered.connect(record_template_duration, app, weak=False)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """ Prometheus scrape endpoint. """
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+def _add_request_timing(name: str, seconds: float):
+    """ Adds to the current request's Server-Timing totals, if in a request. """
+    if not has_request_context():
+        return
+    timings = g.get("request_timings")
+    if timings is None:
+        return
+    total, count = timings.get(name, (0.0, 0))
+    timings[name] = (total + seconds, count + 1)
@@ -0,0 +1,90 @@
+"""
+Schema migration runner.
+
+Applies the numbered files in sql/migrations/ (e.g. 0002_add_indexes.sql) that
+are not yet recorded in the schema_version table, in order, one transaction
+per migration. Run it before starting the web server:
+
+    python migrate.py
+"""
+
+import glob
+import os
+import re
+
+from utils import BASE_PATH, get_db_connection, load_sql_file
+
+MIGRATIONS_DIR = os.path.join(BASE_PATH, "sql", "migrations")
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_[\w-]+\.sql$")
+
+# Arbitrary key for pg_advisory_lock so concurrent runners (e.g. several
+# workers starting at once) apply migrations one at a time.
+MIGRATION_LOCK_ID = 7291001
+
+
+def list_migrations():
+    """
+    Returns (version, filename) for every migration file, sorted by version.
+    """
+    migrations = []
+    for path in glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql")):
+        filename = os.path.basename(path)
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if not match:
+            raise ValueError(f"Unexpected migration file name: {filename}")
+        migrations.append((int(match.group(1)), filename))
+
+    migrations.sort()
+    versions = [version for version, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration version numbers in sql/migrations/")
+    return migrations
+
+
+def run_migrations():
+    """
+    Applies all pending migrations and returns the list of applied file names.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    applied = []
+
+    try:
+        cursor.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_ID, ))
+
+        cursor.execute(load_sql_file("sql/create_schema_version.sql"))
+        conn.commit()
+
+        cursor.execute(load_sql_file("sql/list_applied_migrations.sql"))
+        applied_versions = {row[0] for row in cursor.fetchall()}
+
+        for version, filename in list_migrations():
+            if version in applied_versions:
+                continue
+
+            print(f"Applying migration {filename}")
+            cursor.execute(load_sql_file(f"sql/migrations/{filename}"))
+            cursor.execute(load_sql_file("sql/record_migration.sql"),
+                           (version, filename))
+            conn.commit()
+            applied.append(filename)
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_ID, ))
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    return applied
+
+
+if __name__ == "__main__":
+    applied = run_migrations()
+    if applied:
+        print(f"Applied {len(applied)} migration(s).")
+    else:
+        print("Schema is up to date.")
@@ -0,0 +1,94 @@
+"""
+Helpers for bulk-loading CSV exports into the database.
+
+Exports are streamed with the csv module and staged into a temporary table
+with COPY in bounded chunks, so memory stays flat regardless of file size.
+The calling script then resolves and upserts the staged rows with set-based
+SQL, all in one transaction. Rows that cannot be loaded are reported rather
+than silently skipped.
+"""
+
+import csv
+import io
+import itertools
+
+# Staged columns are TEXT; this pattern guards numeric casts in the load SQL
+NUMERIC_PATTERN = r"^\s*-?[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?\s*$"
+# Quantities that cannot be negative (stock levels), rejected per row rather than left to
+# a CHECK constraint that would abort the whole load
+NON_NEGATIVE_PATTERN = r"^\s*[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?\s*$"
+
+# Rows buffered per COPY round trip
+CHUNK_SIZE = 5000
+
+
+def read_csv_columns(path, columns):
+    """
+    Opens a CSV export and checks its header for the requested columns
+    straight away, raising KeyError if any are missing. Returns a generator
+    that streams one tuple per row with just those columns, in order; empty
+    cells become None.
+    """
+    f = open(path, "r", newline="", encoding="utf-8-sig")  # noqa: SIM115 (closed by rows())
+    reader = csv.reader(f)
+    header = next(reader, [])
+
+    missing = [column for column in columns if column not in header]
+    if missing:
+        f.close()
+        raise KeyError(f"Missing required column(s) {missing} in CSV file {path}.")
+
+    indexes = [header.index(column) for column in columns]
+
+    def rows():
+        with f:
+            for record in reader:
+                if not any(record):
+                    continue  # Skip blank lines
+                yield tuple(
+                    (record[i] if i < len(record) and record[i] != "" else None)
+                    for i in indexes)
+
+    return rows()
+
+
+def stage_rows(cursor, table, columns, rows):
+    """
+    Creates a temporary table with a row_number column plus one TEXT column
+    per name in columns (dropped on commit), and COPYs the rows into it in
+    chunks of CHUNK_SIZE. rows can be any iterable, including a generator
+    from read_csv_columns(). None values are loaded as NULL. Returns the
+    number of rows staged.
+    """
+    column_defs = ", ".join(f"{column} TEXT" for column in columns)
+    cursor.execute(
+        f"CREATE TEMP TABLE {table} (row_number SERIAL, {column_defs}) ON COMMIT DROP;"
+    )
+    copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+
+    rows = iter(rows)
+    count = 0
+    while True:
+        chunk = list(itertools.islice(rows, CHUNK_SIZE))
+        if not chunk:
+            break
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(chunk)
+        buffer.seek(0)
+        cursor.copy_expert(copy_sql, buffer)
+        count += len(chunk)
+
+    return count
+
+
+def report_rejected(cursor, query, params=None):
+    """
+    Runs a query returning (row_number, reason, ...) for staged rows that
+    could not be loaded, prints them and returns them.
+    """
+    cursor.execute(query, params)
+    rejected = cursor.fetchall()
+    for row_number, reason, *values in rejected:
+        print(f"Rejected row {row_number}: {reason} {values}")
+    return rejected
@@ -1,58 +1,72 @@
-import pandas as pd
-import psycopg2
 import sys
 
 sys.path.append('')  # Adding root of the repo to path for importing modules
 from utils import get_db_connection
+from bulk_ingest import NUMERIC_PATTERN, read_csv_columns, report_rejected, stage_rows
 
 # Path to the CSV file
 CSV_FILE_PATH = "migration/data/ProductCatalogExport_20250216.csv"
 
-# Read the CSV file
-df = pd.read_csv(CSV_FILE_PATH)
-print(df.head())  # Debugging: Show first few rows
-
-# Ensure 'On Hand Quantity' exists in the CSV
-if "On Hand Quantity" not in df.columns:
-    raise KeyError("Missing required column: 'On Hand Quantity' in CSV file.")
+# Stream the CSV file (as text, so SKUs keep their exact form); raises if
+# 'On Hand Quantity' or the other required columns are missing
+rows = read_csv_columns(CSV_FILE_PATH,
+                        ["Product Id", "Product Name", "On Hand Quantity"])
 
 # Connect to the database
 conn = get_db_connection()
 cur = conn.cursor()
 
-# 🛠 Insert products into the database
-for index, row in df.iterrows():
-    product_sku = str(row["Product Id"]).strip()  # Convert to string for uniformity
-    product_name = row["Product Name"].strip()
-    on_hand_quantity = row["On Hand Quantity"]
-
-    # Skip records where On Hand Quantity is <= 0
-    if on_hand_quantity <= 0:
-        print(f'Skipping Product: SKU={product_sku}, Name={product_name} (On Hand={on_hand_quantity})')
-        continue
+try:
+    # 🛠 Stage the export with COPY
+    staged = stage_rows(
+        cur, "staged_products", ["sku", "name", "on_hand_quantity"], rows)
+    print(f"Staged {staged} rows")
 
-    print(f'Processing Product: SKU={product_sku}, Name={product_name}, On Hand={on_hand_quantity}')
+    rejected = report_rejected(
+        cur, """
+        SELECT row_number,
+               CASE
+                   WHEN NULLIF(TRIM(sku), '') IS NULL THEN 'missing SKU'
+                   WHEN NULLIF(TRIM(name), '') IS NULL THEN 'missing name'
+                   ELSE 'invalid On Hand Quantity'
+               END,
+               sku, name, on_hand_quantity
+        FROM staged_products
+        WHERE NULLIF(TRIM(sku), '') IS NULL
+           OR NULLIF(TRIM(name), '') IS NULL
+           OR on_hand_quantity IS NULL
+           OR on_hand_quantity !~ %(numeric)s
+        ORDER BY row_number;
+        """, {"numeric": NUMERIC_PATTERN})
 
-    # Check if product already exists
-    cur.execute("SELECT id FROM products WHERE sku = %s;", (product_sku,))
-    existing_product = cur.fetchone()
+    # Insert new products in one statement; existing SKUs are left untouched
+    # and products with nothing on hand are skipped, so re-runs are idempotent
+    cur.execute(
+        """
+        INSERT INTO products (sku, name, price, created_at, updated_at)
+        SELECT DISTINCT ON (TRIM(sku))
+            TRIM(sku), TRIM(name), 0.00, NOW(), NOW()  -- Default price is 0 for now
+        FROM staged_products
+        WHERE NULLIF(TRIM(sku), '') IS NOT NULL
+          AND NULLIF(TRIM(name), '') IS NOT NULL
+          AND on_hand_quantity ~ %(numeric)s
+          AND on_hand_quantity::FLOAT > 0
+        ORDER BY TRIM(sku), row_number
+        ON CONFLICT (sku) DO NOTHING;
+        """, {"numeric": NUMERIC_PATTERN})
+    inserted = cur.rowcount
 
-    if existing_product:
-        print(f'Product {product_sku} already exists. Skipping insert.')
-    else:
-        print(f'Inserting new product: {product_name}')
+    # Commit changes
+    conn.commit()
 
-        # Insert new product
-        insert_query = """
-            INSERT INTO products (sku, name, price, created_at, updated_at)
-            VALUES (%s, %s, %s, NOW(), NOW());
-        """
-        cur.execute(insert_query, (product_sku, product_name, 0.00))  # Default price is 0 for now
-        print("Insert successful")
+except Exception:
+    conn.rollback()
+    raise
 
-# Commit changes & Close connection
-conn.commit()
-cur.close()
-conn.close()
+finally:
+    cur.close()
+    conn.close()
 
-print("Products imported successfully!")
+print(f"Products imported successfully! Inserted: {inserted}, "
+      f"Rejected: {len(rejected)}, "
+      f"Skipped (existing or duplicate SKU, or nothing on hand): {staged - inserted - len(rejected)}")
@@ -1,106 +1,112 @@
-import pandas as pd
-import numpy as np
-import psycopg2
 import sys
 
 sys.path.append('')  # adding root of the repo to path for importing modules
 from utils import get_db_connection
+from bulk_ingest import NON_NEGATIVE_PATTERN, read_csv_columns, report_rejected, stage_rows
 
 # Path to the CSV file
 CSV_FILE_PATH = "migration/data/InventoryItems-2025-02-16-11_55 - InventoryItems-2025-02-16-11_55.csv"
 
-# Read the CSV file
-df = pd.read_csv(CSV_FILE_PATH)
-print(df.head())
+# Stream the CSV file; raises if a required column is missing
+rows = read_csv_columns(
+    CSV_FILE_PATH,
+    ["Name", "Default supplier", "Units of measure", "In stock", "Committed"])
 
 # Database connection
 conn = get_db_connection()
 cur = conn.cursor()
 
-# Function to get vendor ID
-def get_vendor_id(vendor_name):
-    print(f'Vendor Name: {vendor_name}')
-    cur.execute("SELECT id FROM vendors WHERE name = %s;", (vendor_name,))
-    result = cur.fetchone()
-    print(result[0])
-    return result[0] if result else None
-
-# Function to get unit_of_measure ID
-def get_unit_of_measure_id(unit_name):
-    print(f'UOM: {unit_name}')
-    cur.execute("SELECT id FROM unit_of_measure WHERE name = %s;", (unit_name,))
-    result = cur.fetchone()
-    print(result[0])
-    return result[0] if result else None
-
-# Insert raw materials
-for index, row in df.iterrows():
-    print(f'Inserting raw material: {row["Name"]}')
-    name = row["Name"]
-    # Convert NaN values to None
-    vendor_name = None if pd.isna(row["Default supplier"]) else row["Default supplier"]
-    unit_name = None if pd.isna(row["Units of measure"]) else row["Units of measure"]
-
-    print(f'Vendor Name: {vendor_name}')  # Debugging
-    print(f'Unit Name: {unit_name}')      # Debugging
-
-    total_inventory = row["In stock"]
-    reserved_inventory = row["Committed"]
-    available_inventory = row["Calculated stock"]
-
-
-    print(f'Vendor is np.NaN: {vendor_name == np.nan}')
-    print(f'Vendor is str NAN: {vendor_name == "NaN"}')
-    print(type(vendor_name))
-    
-
-    # Ensure both vendor and unit exist before inserting
-    if vendor_name and unit_name:
-
-        # Get vendor ID and unit ID
-        vendor_id = get_vendor_id(vendor_name)
-        unit_id = get_unit_of_measure_id(unit_name)
-
-        # Ensure both vendor and unit exist before inserting
-        if vendor_id and unit_id:
-            print(f'Vendor ID: {vendor_id}, Unit ID: {unit_id}')
-            
-            # Check if raw material already exists
-            cur.execute("SELECT id FROM raw_materials WHERE name = %s;", (name,))
-            existing_record = cur.fetchone()
-    
-            if existing_record is not None:
-                print(f'Raw material {name} already exists. Updating inventory levels')
-                # Update inventory if raw material exists
-                update_query = """
-                    UPDATE raw_materials
-                    SET total_inventory = %s, reserved_inventory = %s
-                    WHERE id = %s;
-                """
-                cur.execute(update_query, (total_inventory, reserved_inventory, existing_record[0]))
-            else:
-                print(f'Raw material {name} does not exist. Inserting new record')
-    
-                # Insert new raw material
-                insert_query = """
-                    INSERT INTO raw_materials (name, vendor_id, unit_of_measure_id, total_inventory, reserved_inventory)
-                    VALUES (%s, %s, %s, %s, %s);
-                """
-                cur.execute(insert_query, (name, vendor_id, unit_id, total_inventory, reserved_inventory))
-                print("Insert successful")
-    
-    
-                conn.commit()
-
-        else:
-            print(f"Skipping {name} - Vendor or Unit of Measure missing.")
-
-    else:
-        print(f"Skipping {name} - Vendor or Unit of Measure missing.")
-
-# Commit changes and close connection
-conn.commit()
-cur.close()
-conn.close()
-
-print("Raw materials imported successfully!")
+try:
+    # Stage the export with COPY
+    staged = stage_rows(
+        cur, "staged_raw_materials",
+        ["name", "vendor_name", "unit_name", "in_stock", "committed"], rows)
+    print(f"Staged {staged} rows")
+
+    # Rows whose vendor or unit of measure is missing or unknown, or whose stock
+    # levels are not non-negative numbers
+    rejected = report_rejected(
+        cur, """
+        SELECT s.row_number,
+               CASE
+                   WHEN s.vendor_name IS NULL OR s.unit_name IS NULL
+                       THEN 'Vendor or Unit of Measure missing'
+                   WHEN v.id IS NULL THEN 'unknown vendor'
+                   WHEN u.id IS NULL THEN 'unknown unit of measure'
+                   ELSE 'invalid or negative In stock / Committed quantity'
+               END,
+               s.name, s.vendor_name, s.unit_name
+        FROM staged_raw_materials s
+        LEFT JOIN vendors v ON v.name = s.vendor_name
+        LEFT JOIN unit_of_measure u ON u.name = s.unit_name
+        WHERE v.id IS NULL
+           OR u.id IS NULL
+           OR s.in_stock IS NULL
+           OR s.in_stock !~ %(non_negative)s
+           OR COALESCE(s.committed, '0') !~ %(non_negative)s
+        ORDER BY s.row_number;
+        """, {"non_negative": NON_NEGATIVE_PATTERN})
+
+    # Resolve vendors and units with joins, then bring inventory levels to the
+    # exported values through adjustment movements in the inventory ledger
+    # (whose trigger applies them), inserting raw materials that do not exist
+    # yet (raw_materials.name has no unique constraint to use ON CONFLICT with)
+    cur.execute(
+        """
+        WITH resolved AS (
+            SELECT DISTINCT ON (s.name)
+                s.name,
+                v.id AS vendor_id,
+                u.id AS unit_of_measure_id,
+                s.in_stock::FLOAT AS total_inventory,
+                COALESCE(s.committed, '0')::FLOAT AS reserved_inventory
+            FROM staged_raw_materials s
+            JOIN vendors v ON v.name = s.vendor_name
+            JOIN unit_of_measure u ON u.name = s.unit_name
+            WHERE s.in_stock ~ %(non_negative)s
+              AND COALESCE(s.committed, '0') ~ %(non_negative)s
+            ORDER BY s.name, s.row_number DESC  -- Last occurrence in the export wins
+        ),
+        existing AS (
+            SELECT
+                rm.id,
+                r.total_inventory - rm.total_inventory AS on_hand_delta,
+                r.reserved_inventory - rm.reserved_inventory AS reserved_delta
+            FROM raw_materials rm
+            JOIN resolved r ON rm.name = r.name
+        ),
+        inserted AS (
+            INSERT INTO raw_materials (name, vendor_id, unit_of_measure_id)
+            SELECT r.name, r.vendor_id, r.unit_of_measure_id
+            FROM resolved r
+            WHERE NOT EXISTS (SELECT 1 FROM raw_materials rm WHERE rm.name = r.name)
+            RETURNING id, name
+        ),
+        movements AS (
+            INSERT INTO inventory_movements (raw_material_id, movement_type, on_hand_delta, reserved_delta, reason)
+            SELECT id, 'adjustment', on_hand_delta, reserved_delta, 'Inventory import'
+            FROM existing
+            WHERE on_hand_delta <> 0 OR reserved_delta <> 0
+            UNION ALL
+            SELECT i.id, 'adjustment', r.total_inventory, r.reserved_inventory, 'Inventory import'
+            FROM inserted i
+            JOIN resolved r ON r.name = i.name
+            RETURNING id
+        )
+        SELECT (SELECT COUNT(*) FROM existing), (SELECT COUNT(*) FROM inserted);
+        """, {"non_negative": NON_NEGATIVE_PATTERN})
+    updated, inserted = cur.fetchone()
+
+    # Commit changes
+    conn.commit()
+
+except Exception:
+    conn.rollback()
+    raise
+
+finally:
+    cur.close()
+    conn.close()
+
+print(f"Raw materials imported successfully! Inserted: {inserted}, "
+      f"Updated: {updated}, Rejected: {len(rejected)}")
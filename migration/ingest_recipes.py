@@ -1,92 +1,149 @@
-import pandas as pd
-import psycopg2
 import sys
 
 sys.path.append('')  # Adding root of the repo to path for importing modules
 from utils import get_db_connection
+from bulk_ingest import NUMERIC_PATTERN, read_csv_columns, report_rejected, stage_rows
 
 # Path to the CSV file
 CSV_FILE_PATH = "migration/data/ProductRecipes-2025-02-15-19_48.csv"
 
-# Read the CSV file
-df = pd.read_csv(CSV_FILE_PATH)
-print(df.head())  # Debugging: Show first few rows
-
-# Remove records missing "Product variant code / SKU (required)" 
-df = df[df["Product variant code / SKU (required)"].notna()].copy()
-
-# Ensure required columns exist in the CSV
-required_columns = [
+# Stream the CSV file; raises if a required column is missing
+rows = read_csv_columns(CSV_FILE_PATH, [
     "Product variant code / SKU (required)",
     "Ingredient variant name",
     "Quantity (required)",
     "Unit of measure"
-]
-for col in required_columns:
-    if col not in df.columns:
-        raise KeyError(f"Missing required column: '{col}' in CSV file.")
+])
 
-# Convert SKU column to string to ensure consistency with DB
-df["Product variant code / SKU (required)"] = df["Product variant code / SKU (required)"].astype(str)
+# Remove records missing "Product variant code / SKU (required)"
+rows = (row[:3] for row in rows if row[0] is not None)
 
 # Connect to the database
 conn = get_db_connection()
 cur = conn.cursor()
 
-# Iterate through products to insert recipes and raw materials
-for product_sku, product_data in df.groupby("Product variant code / SKU (required)"):
-
-    product_sku = str(product_sku).split('.')[0]
-
-    print(f'Processing Product SKU: {product_sku}')
-
-    # Query the database for the product ID
-    cur.execute("SELECT id FROM products WHERE sku = %s;", (product_sku,))
-    product_id_result = cur.fetchone()
-
-    print(product_id_result)
-
-    if not product_id_result:
-        print(f"Skipping SKU {product_sku}, product not found in database.")
-        continue
-
-    product_id = product_id_result[0]  # Extract the ID from the tuple
-    print(f"Found Product ID: {product_id} for SKU: {product_sku}")
-
-    # Insert a new recipe version
-    insert_recipe_query = """
-        INSERT INTO recipes (product_id, active, created_at)
-        VALUES (%s, FALSE, NOW()) RETURNING id;
-    """
-    cur.execute(insert_recipe_query, (product_id,))
-    recipe_id = cur.fetchone()[0]
-
-    # Insert raw materials for this recipe
-    for _, row in product_data.iterrows():
-        raw_material_name = row["Ingredient variant name"].strip().lower()
+try:
+    # Stage the export with COPY
+    staged = stage_rows(
+        cur, "staged_recipe_lines", ["sku", "ingredient_name", "quantity"], rows)
+    print(f"Staged {staged} rows")
 
-        # Query the database for the raw material ID
-        cur.execute("SELECT id FROM raw_materials WHERE LOWER(name) = %s;", (raw_material_name,))
-        raw_material_result = cur.fetchone()
-
-        if not raw_material_result:
-            print(f"Skipping raw material '{row['Ingredient variant name']}', not found in database.")
-            continue
-
-        raw_material_id = raw_material_result[0]  # Extract the ID from the tuple
-        quantity = row["Quantity (required)"]
-
-        insert_ingredient_query = """
-            INSERT INTO recipe_raw_materials (recipe_id, raw_material_id, quantity, created_at, updated_at)
-            VALUES (%s, %s, %s, NOW(), NOW());
+    # Resolve SKUs and raw material names with joins
+    cur.execute(
         """
-        cur.execute(insert_ingredient_query, (recipe_id, raw_material_id, quantity))
-
-    print(f"Recipe imported for SKU: {product_sku}")
-
-# Commit changes & Close connection
-conn.commit()
-cur.close()
-conn.close()
-
-print("Product recipes imported successfully!")
+        CREATE TEMP TABLE resolved_recipe_lines ON COMMIT DROP AS
+        SELECT
+            s.row_number,
+            s.sku,
+            s.ingredient_name,
+            s.quantity,
+            p.id AS product_id,
+            rm.id AS raw_material_id
+        FROM staged_recipe_lines s
+        LEFT JOIN products p ON p.sku = SPLIT_PART(TRIM(s.sku), '.', 1)
+        LEFT JOIN LATERAL (
+            SELECT id
+            FROM raw_materials
+            WHERE LOWER(name) = LOWER(TRIM(s.ingredient_name))
+            ORDER BY id
+            LIMIT 1
+        ) rm ON TRUE;
+        """)
+
+    rejected = report_rejected(
+        cur, """
+        SELECT row_number,
+               CASE
+                   WHEN product_id IS NULL THEN 'product not found in database'
+                   WHEN raw_material_id IS NULL THEN 'raw material not found in database'
+                   ELSE 'invalid quantity'
+               END,
+               sku, ingredient_name, quantity
+        FROM resolved_recipe_lines
+        WHERE product_id IS NULL
+           OR raw_material_id IS NULL
+           OR quantity IS NULL
+           OR quantity !~ %(numeric)s
+        ORDER BY row_number;
+        """, {"numeric": NUMERIC_PATTERN})
+
+    # Create a new recipe version only for products whose imported lines
+    # differ from their latest version, then insert all of their lines, so
+    # re-running the same export does not create duplicate versions
+    cur.execute(
+        """
+        WITH lines AS (
+            SELECT product_id, raw_material_id, SUM(quantity::FLOAT) AS quantity
+            FROM resolved_recipe_lines
+            WHERE product_id IS NOT NULL
+              AND raw_material_id IS NOT NULL
+              AND quantity ~ %(numeric)s
+            GROUP BY product_id, raw_material_id
+        ),
+        imported AS (
+            SELECT product_id,
+                   ARRAY_AGG(raw_material_id || ':' || quantity ORDER BY raw_material_id) AS signature
+            FROM lines
+            GROUP BY product_id
+        ),
+        changed AS (
+            SELECT i.product_id
+            FROM imported i
+            LEFT JOIN LATERAL (
+                SELECT id
+                FROM recipes r
+                WHERE r.product_id = i.product_id
+                ORDER BY r.version DESC
+                LIMIT 1
+            ) latest ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT ARRAY_AGG(rr.raw_material_id || ':' || rr.quantity ORDER BY rr.raw_material_id) AS signature
+                FROM recipe_raw_materials rr
+                WHERE rr.recipe_id = latest.id
+            ) existing ON TRUE
+            WHERE existing.signature IS DISTINCT FROM i.signature
+        ),
+        allocated AS (
+            INSERT INTO product_version_counters (product_id, last_recipe_version)
+            SELECT product_id, 1
+            FROM changed
+            ON CONFLICT (product_id) DO UPDATE
+                SET last_recipe_version = product_version_counters.last_recipe_version + 1
+            RETURNING product_id, last_recipe_version
+        ),
+        new_recipes AS (
+            INSERT INTO recipes (product_id, version, active, created_at)
+            SELECT product_id, last_recipe_version, FALSE, NOW()
+            FROM allocated
+            RETURNING id, product_id
+        ),
+        new_lines AS (
+            INSERT INTO recipe_raw_materials (recipe_id, raw_material_id, quantity, created_at, updated_at)
+            SELECT nr.id, l.raw_material_id, l.quantity, NOW(), NOW()
+            FROM new_recipes nr
+            JOIN lines l ON l.product_id = nr.product_id
+            ON CONFLICT (recipe_id, raw_material_id)
+                DO UPDATE SET quantity = EXCLUDED.quantity, updated_at = NOW()
+            RETURNING id
+        )
+        SELECT
+            (SELECT COUNT(*) FROM imported),
+            (SELECT COUNT(*) FROM new_recipes),
+            (SELECT COUNT(*) FROM new_lines);
+        """, {"numeric": NUMERIC_PATTERN})
+    products_in_export, recipes_created, lines_created = cur.fetchone()
+
+    # Commit changes
+    conn.commit()
+
+except Exception:
+    conn.rollback()
+    raise
+
+finally:
+    cur.close()
+    conn.close()
+
+print(f"Product recipes imported successfully! Recipes created: {recipes_created} "
+      f"({lines_created} lines), unchanged: {products_in_export - recipes_created}, "
+      f"Rejected rows: {len(rejected)}")
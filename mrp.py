@@ -0,0 +1,86 @@
+"""
+Material requirements planning (MRP) over all open manufacturing orders.
+
+The whole plan is one set-based query (sql/plan_material_requirements.sql):
+Pending orders are exploded through their products' compiled BOMs (bom.py),
+bucketed by planned start date and netted against inventory, so a run costs
+two round trips (three when BOMs need compiling) however many orders are open. Served as JSON at /mrp and from the command
+line:
+
+    python mrp.py
+    python mrp.py --json
+"""
+
+import argparse
+import json
+
+from bom import get_boms
+from utils import execute_sql, get_db_connection
+
+COLUMNS = ("planned_start_date", "raw_material_id", "name", "unit",
+           "gross_requirement", "total_inventory", "reserved_inventory",
+           "available_inventory", "projected_available", "shortage",
+           "suggested_order_quantity", "manufacturing_order_ids")
+
+
+def plan_material_requirements(cursor=None) -> list:
+    """
+    Returns the time-phased shortages, one dict per raw material and planned
+    start date, earliest first. Runs on the given cursor, or on a pooled
+    connection if none is given.
+    """
+    if cursor is None:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            return plan_material_requirements(cursor)
+        finally:
+            cursor.close()
+            conn.close()
+
+    execute_sql(cursor, "sql/list_pending_mo_products.sql")
+    boms = get_boms(cursor, [row[0] for row in cursor.fetchall()])
+
+    # Flatten the BOMs into parallel arrays for the query
+    product_ids, raw_material_ids, quantities = [], [], []
+    for product_id, bom in boms.items():
+        product_ids.extend([product_id] * len(bom.raw_material_ids))
+        raw_material_ids.extend(bom.raw_material_ids)
+        quantities.extend(bom.quantities)
+
+    execute_sql(cursor, "sql/plan_material_requirements.sql",
+                (product_ids, raw_material_ids, quantities))
+    shortages = []
+    for row in cursor.fetchall():
+        shortage = dict(zip(COLUMNS, row, strict=True))
+        shortage["planned_start_date"] = shortage["planned_start_date"].isoformat()
+        shortage["manufacturing_order_ids"] = sorted(shortage["manufacturing_order_ids"])
+        shortages.append(shortage)
+    return shortages
+
+
+def print_plan(shortages: list):
+    """ Prints the shortages as a table. """
+    if not shortages:
+        print("No material shortages for open manufacturing orders.")
+        return
+
+    print(f"{'date':<12}{'raw material':<40}{'required':>12}{'projected':>12}"
+          f"{'shortage':>12}{'order qty':>12}  orders")
+    for s in shortages:
+        print(f"{s['planned_start_date']:<12}{s['name'][:38]:<40}"
+              f"{s['gross_requirement']:>12.2f}{s['projected_available']:>12.2f}"
+              f"{s['shortage']:>12.2f}{s['suggested_order_quantity']:>12.2f}  "
+              f"{', '.join(str(mo_id) for mo_id in s['manufacturing_order_ids'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Material requirements planning for open manufacturing orders.")
+    parser.add_argument("--json", action="store_true", help="print the plan as JSON")
+    args = parser.parse_args()
+
+    plan = plan_material_requirements()
+    if args.json:
+        print(json.dumps(plan, indent=2))
+    else:
+        print_plan(plan)
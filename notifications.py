@@ -0,0 +1,97 @@
+"""
+Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+
+In-process caches (reference data, compiled BOMs) register a channel with
+subscribe(). A route that changes the underlying rows calls notify() before
+committing; Postgres delivers the message on commit to a listener thread in
+every gunicorn worker, which hands the payload to the channel's callback.
+"""
+
+import os
+import select
+import threading
+import time
+
+import psycopg2
+
+from app_logging import get_logger
+from utils import get_connection_params
+
+# REFERENCE_DATA_LISTEN is the setting's original name and still honoured
+CACHE_LISTEN = os.environ.get(
+    "CACHE_LISTEN", os.environ.get("REFERENCE_DATA_LISTEN", "1")) == "1"
+
+logger = get_logger("notifications")
+_subscriptions = {}  # channel -> (on_message, on_reset)
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def subscribe(channel: str, on_message, on_reset):
+    """
+    Registers a channel. on_message(payload) runs for every notification;
+    on_reset() runs when the listener loses its connection, since messages
+    may have been missed. Call at import time, before the listener starts.
+    """
+    _subscriptions[channel] = (on_message, on_reset)
+
+
+def notify(cursor, channel: str, payload: str):
+    """
+    Queues a notification. Call it before conn.commit(): it is only
+    delivered if the transaction commits.
+    """
+    cursor.execute("SELECT pg_notify(%s, %s);", (channel, payload))
+
+
+def ensure_listener():
+    """
+    Starts the LISTEN thread for the current process on first use, so each
+    gunicorn worker gets its own after fork.
+    """
+    global _listener_pid
+
+    pid = os.getpid()
+    if not CACHE_LISTEN or _listener_pid == pid:
+        return
+
+    with _listener_lock:
+        if _listener_pid != pid:
+            thread = threading.Thread(target=_listen,
+                                      name="cache-invalidation-listener",
+                                      daemon=True)
+            thread.start()
+            _listener_pid = pid
+
+
+def _listen():
+    """
+    Waits for notifications on every subscribed channel and dispatches them.
+    On connection loss every subscriber is reset and the listener reconnects.
+    """
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(**get_connection_params())
+            conn.autocommit = True
+            cursor = conn.cursor()
+            for channel in _subscriptions:
+                cursor.execute(f"LISTEN {channel};")
+
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notification = conn.notifies.pop(0)
+                    on_message, _ = _subscriptions[notification.channel]
+                    on_message(notification.payload)
+
+        except psycopg2.Error:
+            logger.warning("Cache invalidation listener lost its connection; reconnecting",
+                           exc_info=True)
+            for _, on_reset in _subscriptions.values():
+                on_reset()
+            if conn is not None:
+                conn.close()
+            time.sleep(5)
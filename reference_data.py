@@ -0,0 +1,68 @@
+"""
+In-process cache for the small reference tables behind the form dropdowns
+(categories, flavors, sizes, vendors, units of measure).
+
+Entries expire after REFERENCE_DATA_TTL seconds and are dropped as soon as a
+route that changes the table calls invalidate_reference_data() before
+committing. That call also sends a Postgres NOTIFY, delivered on commit, which
+the listener thread in every gunicorn worker (see notifications.py) uses to
+drop its own copy.
+"""
+
+import os
+
+from notifications import ensure_listener, notify, subscribe
+from utils import TTLCache, get_db_connection, load_sql_file
+
+REFERENCE_DATA_TTL = float(os.environ.get("REFERENCE_DATA_TTL", "300"))  # seconds
+NOTIFY_CHANNEL = "reference_data_changed"
+
+REFERENCE_QUERIES = {
+    "categories": "sql/list_categories.sql",
+    "flavors": "sql/list_flavors.sql",
+    "sizes": "sql/list_sizes.sql",
+    "vendors": "sql/list_vendors.sql",
+    "unit_of_measure": "sql/list_unit_of_measure.sql",
+}
+
+_cache = TTLCache(ttl=REFERENCE_DATA_TTL, maxsize=len(REFERENCE_QUERIES))
+subscribe(NOTIFY_CHANNEL, _cache.delete, _cache.clear)
+
+
+def get_reference_data(name: str, cursor=None) -> list:
+    """
+    Returns the rows of the named reference query, from the cache when
+    possible. On a miss the query runs on the given cursor, or on a pooled
+    connection if none is given.
+    """
+    ensure_listener()
+
+    rows = _cache.get(name)
+    if rows is not None:
+        return rows
+
+    query = load_sql_file(REFERENCE_QUERIES[name])
+    if cursor is not None:
+        cursor.execute(query)
+        rows = cursor.fetchall()
+    else:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(query)
+        rows = cursor.fetchall()
+        cursor.close()
+        conn.close()
+
+    _cache.set(name, rows)
+    return rows
+
+
+def invalidate_reference_data(cursor, *names: str):
+    """
+    Drops the named entries from this worker's cache and queues a NOTIFY for
+    the other workers. Call it before conn.commit(): the notification is only
+    delivered if the transaction commits.
+    """
+    for name in names:
+        _cache.delete(name)
+        notify(cursor, NOTIFY_CHANNEL, name)
@@ -1 +1,2 @@
-UPDATE recipes SET active = TRUE WHERE id = %s;
+UPDATE recipes SET active = TRUE WHERE id = %s
+RETURNING product_id;
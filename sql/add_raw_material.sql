@@ -1,2 +1,3 @@
-INSERT INTO raw_materials (name, vendor_id, unit_of_measure_id, moq, tags)
-VALUES (%s, %s, %s, %s, %s);
+INSERT INTO raw_materials (name, vendor_id, unit_of_measure_id, moq)
+VALUES (%s, %s, %s, %s)
+RETURNING id;
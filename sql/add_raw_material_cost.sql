@@ -0,0 +1,5 @@
+-- Records a raw material's unit cost, effective from the given time (now when NULL); the
+-- product cost rollup is refreshed by trigger for products whose active recipe uses it
+INSERT INTO raw_material_costs (raw_material_id, unit_cost, effective_from)
+VALUES (%s, %s, COALESCE(%s, NOW()))
+RETURNING id, effective_from;
@@ -1,3 +1,12 @@
+-- Allocates the next version from the product's counter row (locked until commit)
+WITH next_version AS (
+    INSERT INTO product_version_counters (product_id, last_recipe_version)
+    VALUES (%s, 1)
+    ON CONFLICT (product_id) DO UPDATE
+        SET last_recipe_version = product_version_counters.last_recipe_version + 1
+    RETURNING last_recipe_version
+)
 INSERT INTO recipes (product_id, version)
-VALUES (%s, (SELECT COALESCE(MAX(version), 0) + 1 FROM recipes WHERE product_id = %s))
+SELECT %s, last_recipe_version
+FROM next_version
 RETURNING id, version;
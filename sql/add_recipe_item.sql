@@ -1,2 +0,0 @@
-INSERT INTO recipe_items (recipe_id, raw_material_id, quantity) 
-VALUES (%s, %s, %s);
@@ -1,2 +0,0 @@
-INSERT INTO recipe_raw_materials (recipe_id, raw_material_id, quantity) 
-VALUES (%s, %s, %s);
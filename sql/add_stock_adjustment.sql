@@ -1,2 +1,4 @@
-INSERT INTO stock_adjustments (raw_material_id, adjustment_amount, unit_of_measure, reason, created_at)
-VALUES (%s, %s, %s, %s, NOW());
+-- Manual stock adjustment, recorded in the inventory ledger (the balance is applied by
+-- the ledger trigger; stock cannot go below zero)
+INSERT INTO inventory_movements (raw_material_id, movement_type, on_hand_delta, reason)
+VALUES (%s, 'adjustment', %s, %s);
@@ -1,3 +0,0 @@
-INSERT INTO tags (name) 
-VALUES (%s) 
-ON CONFLICT (name) DO NOTHING;
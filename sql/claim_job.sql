@@ -0,0 +1,19 @@
+-- Claims the next due job for a worker. SKIP LOCKED lets concurrent workers pass over
+-- each other's candidates instead of waiting on them. Jobs left running longer than the
+-- timeout (their worker died) are claimed again if they have attempts left.
+UPDATE jobs
+SET status = 'running',
+    attempts = attempts + 1,
+    locked_by = %s,   -- worker_id
+    locked_at = NOW()
+WHERE id = (
+    SELECT id
+    FROM jobs
+    WHERE (status = 'queued' AND run_at <= NOW())
+       OR (status = 'running' AND locked_at < NOW() - %s * INTERVAL '1 second'   -- timeout
+           AND attempts < max_attempts)
+    ORDER BY run_at, id
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING id, job_type, payload, attempts;
@@ -0,0 +1,6 @@
+UPDATE jobs
+SET status = 'succeeded',
+    result = %s::JSONB,
+    last_error = NULL,
+    finished_at = NOW()
+WHERE id = %s;
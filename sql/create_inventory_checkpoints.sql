@@ -0,0 +1,36 @@
+-- Snapshots the balances as of a cutoff for every raw material with movements since its
+-- latest checkpoint, computed from that checkpoint plus the movements in between (never
+-- a full replay). The cutoff lags behind NOW() so transactions still in flight, whose
+-- movements carry their start time, are not skipped. Returns the materials checkpointed.
+WITH cutoff AS (
+    SELECT (NOW() - %s * INTERVAL '1 second')::TIMESTAMP AS as_of   -- lag in seconds
+)
+INSERT INTO inventory_checkpoints (raw_material_id, as_of, on_hand, reserved)
+SELECT 
+    rm.id,
+    cutoff.as_of,
+    COALESCE(cp.on_hand, 0) + tail.on_hand_delta,
+    COALESCE(cp.reserved, 0) + tail.reserved_delta
+FROM raw_materials rm
+CROSS JOIN cutoff
+LEFT JOIN LATERAL (
+    SELECT c.as_of, c.on_hand, c.reserved
+    FROM inventory_checkpoints c
+    WHERE c.raw_material_id = rm.id
+      AND c.as_of <= cutoff.as_of
+    ORDER BY c.as_of DESC
+    LIMIT 1
+) cp ON TRUE
+CROSS JOIN LATERAL (
+    SELECT 
+        COUNT(*) AS movements,
+        COALESCE(SUM(m.on_hand_delta), 0) AS on_hand_delta,
+        COALESCE(SUM(m.reserved_delta), 0) AS reserved_delta
+    FROM inventory_movements m
+    WHERE m.raw_material_id = rm.id
+      AND (cp.as_of IS NULL OR m.created_at > cp.as_of)
+      AND m.created_at <= cutoff.as_of
+) tail
+WHERE tail.movements > 0
+ON CONFLICT (raw_material_id, as_of) DO NOTHING
+RETURNING raw_material_id;
@@ -0,0 +1,60 @@
+-- Snapshots many products at once, each at its active recipe version: the given product
+-- ids, or every product with an active recipe when none are given. Versions come from
+-- the products' counter rows, as in insert_product_snapshot.sql.
+WITH targets AS (
+    SELECT DISTINCT ON (p.id)
+        p.id,
+        p.name,
+        p.sku,
+        p.category_id,
+        c.name AS category_name,
+        p.flavor_id,
+        f.name AS flavor_name,
+        p.size_id,
+        s.name AS size_name,
+        r.version AS recipe_version
+    FROM products p
+    JOIN recipes r ON r.product_id = p.id AND r.active = TRUE
+    LEFT JOIN categories c ON p.category_id = c.id
+    LEFT JOIN flavors f ON p.flavor_id = f.id
+    LEFT JOIN sizes s ON p.size_id = s.id
+    WHERE %s::INTEGER[] IS NULL OR p.id = ANY(%s::INTEGER[])   -- product_ids
+    ORDER BY p.id, r.version DESC
+),
+next_versions AS (
+    INSERT INTO product_version_counters (product_id, last_snapshot_version)
+    SELECT id, 1 FROM targets
+    ON CONFLICT (product_id) DO UPDATE
+        SET last_snapshot_version = product_version_counters.last_snapshot_version + 1
+    RETURNING product_id, last_snapshot_version
+)
+INSERT INTO product_snapshots (
+    product_id,
+    snapshot_version,
+    name,
+    sku,
+    category_id,
+    category_name,
+    flavor_id,
+    flavor_name,
+    size_id,
+    size_name,
+    recipe_version,
+    created_at
+)
+SELECT 
+    t.id,
+    nv.last_snapshot_version,
+    t.name,
+    t.sku,
+    t.category_id,
+    t.category_name,
+    t.flavor_id,
+    t.flavor_name,
+    t.size_id,
+    t.size_name,
+    t.recipe_version,
+    NOW()
+FROM targets t
+JOIN next_versions nv ON nv.product_id = t.id
+RETURNING id;
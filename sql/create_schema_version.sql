@@ -0,0 +1,6 @@
+-- Tracks which numbered files in sql/migrations/ have been applied
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,                -- Migration number (e.g. 1 for 0001_initial_schema.sql)
+    name VARCHAR(255) NOT NULL,                 -- Migration file name
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
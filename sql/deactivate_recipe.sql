@@ -1 +1,2 @@
-UPDATE recipes SET active = FALSE WHERE id = %s;
+UPDATE recipes SET active = FALSE WHERE id = %s
+RETURNING product_id;
@@ -1,3 +1,79 @@
-UPDATE raw_materials 
-SET accounted_quantity = accounted_quantity - %s 
-WHERE id = %s;
+-- Consumes the product's compiled BOM (bom.py) for a completed manufacturing order in one
+-- statement: a consumption movement per material in the inventory ledger releases the
+-- MO's reservation and removes the quantity from stock on hand. Whatever the MO holds
+-- reserved for materials no longer on the BOM (the active recipe changed while it was
+-- In Progress) is released as well, so no reservation outlives the MO.
+-- Rows are locked in id order, and nothing is deducted unless every line has enough stock.
+-- Returns one row per BOM line; is_short marks the materials that blocked the deduction.
+-- Returns no rows if the BOM's recipe is no longer active or its lines changed since the
+-- BOM was compiled (a stale cache entry).
+WITH requirements AS (
+    SELECT 
+        line.raw_material_id, 
+        line.quantity * %s AS required   -- units_to_produce
+    FROM UNNEST(%s::INTEGER[], %s::FLOAT[]) AS line (raw_material_id, quantity)   -- raw_material_ids, quantities
+    WHERE EXISTS (
+        SELECT 1 FROM recipes 
+        WHERE id = %s AND active = TRUE AND lines_version = %s   -- recipe_id, lines_version
+    )
+),
+-- What this MO still holds reserved, per material
+outstanding AS (
+    SELECT raw_material_id, SUM(reserved_delta) AS reserved
+    FROM inventory_movements
+    WHERE manufacturing_order_id = %s   -- manufacturing_order_id
+    GROUP BY raw_material_id
+),
+-- BOM lines plus every other material the MO still holds reserved
+materials AS (
+    SELECT raw_material_id FROM requirements
+    UNION
+    SELECT raw_material_id 
+    FROM outstanding 
+    WHERE reserved > 0 AND EXISTS (SELECT 1 FROM requirements)
+),
+locked AS (
+    SELECT 
+        rm.id, 
+        rm.name, 
+        req.required, 
+        rm.total_inventory,
+        rm.reserved_inventory,
+        o.reserved AS mo_reserved
+    FROM raw_materials rm
+    JOIN materials m ON m.raw_material_id = rm.id
+    LEFT JOIN requirements req ON req.raw_material_id = rm.id
+    LEFT JOIN outstanding o ON o.raw_material_id = rm.id
+    ORDER BY rm.id
+    FOR UPDATE OF rm
+),
+deducted AS (
+    INSERT INTO inventory_movements (raw_material_id, movement_type, on_hand_delta, reserved_delta, manufacturing_order_id, reason)
+    SELECT 
+        l.id, 
+        CASE WHEN l.required IS NULL THEN 'release' ELSE 'consumption' END, 
+        -COALESCE(l.required, 0),
+        -- Release this MO's reservation; MOs started before the ledger existed have no
+        -- reservation movements, so release what the recipe requires instead
+        -LEAST(
+            CASE 
+                WHEN EXISTS (SELECT 1 FROM outstanding) THEN GREATEST(COALESCE(l.mo_reserved, 0), 0) 
+                ELSE COALESCE(l.required, 0) 
+            END,
+            l.reserved_inventory
+        ),
+        %s,   -- manufacturing_order_id
+        'Manufacturing order completed'
+    FROM locked l
+    WHERE NOT EXISTS (SELECT 1 FROM locked WHERE total_inventory < required)
+    RETURNING id
+)
+SELECT 
+    l.id, 
+    l.name, 
+    l.required, 
+    l.total_inventory, 
+    l.total_inventory < l.required AS is_short
+FROM locked l
+WHERE l.required IS NOT NULL
+ORDER BY l.id;
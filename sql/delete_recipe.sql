@@ -1,2 +1,3 @@
 DELETE FROM recipes 
-WHERE id = %s;
+WHERE id = %s
+RETURNING product_id;
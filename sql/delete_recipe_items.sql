@@ -1,2 +0,0 @@
-DELETE FROM recipe_items 
-WHERE recipe_id = %s;
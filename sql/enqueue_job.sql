@@ -0,0 +1,4 @@
+-- Queues a background job, due after the given delay in seconds
+INSERT INTO jobs (job_type, payload, max_attempts, run_at)
+VALUES (%s, %s::JSONB, %s, NOW() + %s * INTERVAL '1 second')
+RETURNING id;
@@ -0,0 +1,22 @@
+-- Products export (GET /exports/products), in id order
+SELECT 
+    p.id,
+    p.sku,
+    p.name,
+    p.price,
+    p.description,
+    c.name AS category,
+    f.name AS flavor,
+    s.name AS size,
+    p.created_at,
+    p.updated_at
+FROM 
+    products p
+LEFT JOIN 
+    categories c ON c.id = p.category_id
+LEFT JOIN 
+    flavors f ON f.id = p.flavor_id
+LEFT JOIN 
+    sizes s ON s.id = p.size_id
+ORDER BY 
+    p.id;
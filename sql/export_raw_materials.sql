@@ -0,0 +1,28 @@
+-- Raw materials export (GET /exports/raw_materials) with current balances and tags,
+-- in id order
+SELECT 
+    rm.id,
+    rm.name,
+    v.name AS vendor_name,
+    uom.name AS unit_of_measure,
+    rm.moq,
+    rm.total_inventory,
+    rm.reserved_inventory,
+    rm.available_inventory,
+    COALESCE(tag_names.tags, '') AS tags,
+    rm.created_at,
+    rm.updated_at
+FROM 
+    raw_materials rm
+JOIN 
+    vendors v ON rm.vendor_id = v.id
+JOIN 
+    unit_of_measure uom ON rm.unit_of_measure_id = uom.id
+LEFT JOIN LATERAL (
+    SELECT STRING_AGG(t.name, ';' ORDER BY t.name) AS tags
+    FROM raw_material_tags rmt
+    JOIN tags t ON t.id = rmt.tag_id
+    WHERE rmt.raw_material_id = rm.id
+) tag_names ON TRUE
+ORDER BY 
+    rm.id;
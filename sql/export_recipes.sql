@@ -0,0 +1,26 @@
+-- Full recipe history export (GET /exports/recipes): one row per line of every recipe
+-- version, active or not, grouped by product and version
+SELECT 
+    r.id AS recipe_id,
+    r.product_id,
+    p.sku,
+    p.name AS product_name,
+    r.version,
+    r.active,
+    r.created_at AS recipe_created_at,
+    rrm.raw_material_id,
+    rm.name AS raw_material_name,
+    rrm.quantity,
+    uom.name AS unit_of_measure
+FROM 
+    recipes r
+JOIN 
+    products p ON p.id = r.product_id
+JOIN 
+    recipe_raw_materials rrm ON rrm.recipe_id = r.id
+JOIN 
+    raw_materials rm ON rm.id = rrm.raw_material_id
+JOIN 
+    unit_of_measure uom ON uom.id = rm.unit_of_measure_id
+ORDER BY 
+    r.product_id, r.version, rrm.raw_material_id;
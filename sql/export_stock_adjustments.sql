@@ -0,0 +1,40 @@
+-- Manual stock adjustments export (GET /exports/stock_adjustments), oldest first: the
+-- adjustments recorded in the inventory ledger plus those in the legacy stock_adjustments
+-- table from before the ledger existed (migration 0007 did not copy them over). source
+-- tells the two apart, as their ids come from different sequences.
+SELECT 
+    'ledger' AS source,
+    m.id,
+    m.raw_material_id,
+    rm.name AS raw_material_name,
+    m.on_hand_delta AS adjustment_amount,
+    uom.name AS unit_of_measure,
+    m.reason,
+    m.created_at
+FROM 
+    inventory_movements m
+JOIN 
+    raw_materials rm ON rm.id = m.raw_material_id
+JOIN 
+    unit_of_measure uom ON uom.id = rm.unit_of_measure_id
+WHERE 
+    m.movement_type = 'adjustment'
+
+UNION ALL
+
+SELECT 
+    'legacy' AS source,
+    sa.id,
+    sa.raw_material_id,
+    rm.name AS raw_material_name,
+    sa.adjustment_amount,
+    sa.unit_of_measure,
+    sa.reason,
+    sa.created_at
+FROM 
+    stock_adjustments sa
+JOIN 
+    raw_materials rm ON rm.id = sa.raw_material_id
+
+ORDER BY 
+    created_at, source, id;
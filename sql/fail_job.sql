@@ -0,0 +1,10 @@
+-- Records a failed attempt: the job is queued again after an exponential backoff
+-- (2, 4, 8... seconds, at most an hour) until it runs out of attempts
+UPDATE jobs
+SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+    run_at = NOW() + LEAST(POWER(2, attempts), 3600) * INTERVAL '1 second',
+    last_error = %s,
+    locked_by = NULL,
+    locked_at = NULL,
+    finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE NOW() END
+WHERE id = %s;
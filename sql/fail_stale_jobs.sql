@@ -0,0 +1,8 @@
+-- Fails running jobs whose worker stopped responding after their last attempt
+UPDATE jobs
+SET status = 'failed',
+    last_error = 'Worker timed out',
+    finished_at = NOW()
+WHERE status = 'running'
+  AND locked_at < NOW() - %s * INTERVAL '1 second'   -- timeout
+  AND attempts >= max_attempts;
@@ -1,21 +1,17 @@
+-- Lines of a product's compiled BOM (bom.py) with each raw material's current inventory
 SELECT 
-    rr.raw_material_id,
+    line.raw_material_id,
     rm.name AS raw_material_name,
-    rr.quantity,
+    line.quantity,
     uom.name AS unit,
     rm.total_inventory,
     rm.reserved_inventory,
     rm.available_inventory
 FROM 
-    recipe_raw_materials rr
+    UNNEST(%s::INTEGER[], %s::FLOAT[]) AS line (raw_material_id, quantity)   -- raw_material_ids, quantities
 JOIN 
-    recipes r ON rr.recipe_id = r.id
-JOIN 
-    raw_materials rm ON rr.raw_material_id = rm.id
+    raw_materials rm ON line.raw_material_id = rm.id
 JOIN 
     unit_of_measure uom ON rm.unit_of_measure_id = uom.id
-WHERE 
-    r.product_id = %s
-    AND r.active = TRUE  -- Ensures we only get the active recipe
 ORDER BY 
     rm.name;
@@ -0,0 +1,24 @@
+-- Compiles the active recipe of each given product into parallel arrays of raw material
+-- ids and quantities per unit, ordered by raw material id (see bom.py), with the recipe's
+-- lines_version.
+-- Products without an active recipe, or whose active recipe has no lines, are omitted.
+SELECT 
+    lines.product_id,
+    lines.recipe_id,
+    lines.lines_version,
+    ARRAY_AGG(lines.raw_material_id ORDER BY lines.raw_material_id) AS raw_material_ids,
+    ARRAY_AGG(lines.quantity ORDER BY lines.raw_material_id) AS quantities
+FROM (
+    SELECT 
+        r.product_id,
+        r.id AS recipe_id,
+        r.lines_version,
+        rr.raw_material_id,
+        SUM(rr.quantity) AS quantity
+    FROM recipes r
+    JOIN recipe_raw_materials rr ON rr.recipe_id = r.id
+    WHERE r.product_id = ANY(%s)
+      AND r.active = TRUE
+    GROUP BY r.product_id, r.id, r.lines_version, rr.raw_material_id
+) lines
+GROUP BY lines.product_id, lines.recipe_id, lines.lines_version;
@@ -0,0 +1,33 @@
+-- Point-in-time inventory: the nearest checkpoint at or before the requested time plus
+-- the movements between the two. Optionally limited to one raw material.
+SELECT 
+    rm.id,
+    rm.name,
+    COALESCE(cp.on_hand, 0) + tail.on_hand_delta AS on_hand,
+    COALESCE(cp.reserved, 0) + tail.reserved_delta AS reserved,
+    COALESCE(cp.on_hand, 0) + tail.on_hand_delta 
+        - COALESCE(cp.reserved, 0) - tail.reserved_delta AS available,
+    cp.as_of AS checkpoint_as_of,
+    tail.movements AS movements_since_checkpoint
+FROM raw_materials rm
+LEFT JOIN LATERAL (
+    SELECT c.as_of, c.on_hand, c.reserved
+    FROM inventory_checkpoints c
+    WHERE c.raw_material_id = rm.id
+      AND c.as_of <= %s::timestamp
+    ORDER BY c.as_of DESC
+    LIMIT 1
+) cp ON TRUE
+CROSS JOIN LATERAL (
+    SELECT 
+        COUNT(*) AS movements,
+        COALESCE(SUM(m.on_hand_delta), 0) AS on_hand_delta,
+        COALESCE(SUM(m.reserved_delta), 0) AS reserved_delta
+    FROM inventory_movements m
+    WHERE m.raw_material_id = rm.id
+      AND (cp.as_of IS NULL OR m.created_at > cp.as_of)
+      AND m.created_at <= %s::timestamp
+) tail
+WHERE rm.created_at <= %s::timestamp
+  AND (%s::int IS NULL OR rm.id = %s::int)
+ORDER BY rm.name, rm.id;
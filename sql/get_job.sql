@@ -0,0 +1,14 @@
+SELECT 
+    id,
+    job_type,
+    payload,
+    status,
+    attempts,
+    max_attempts,
+    run_at,
+    last_error,
+    result,
+    created_at,
+    finished_at
+FROM jobs
+WHERE id = %s;
@@ -0,0 +1,90 @@
+-- Everything the product pages show, built as one JSON document in a single round trip:
+-- the product, its active recipe with current inventory levels, all recipe versions, its
+-- snapshots and its cost rollup. Returns no row for an unknown product.
+SELECT 
+    JSON_BUILD_OBJECT(
+        'product', JSON_BUILD_OBJECT(
+            'id', p.id,
+            'name', p.name,
+            'sku', p.sku,
+            'price', p.price,
+            'description', p.description,
+            'category', c.name,
+            'flavor', f.name,
+            'size', s.name,
+            'created_at', p.created_at,
+            'updated_at', p.updated_at
+        ),
+        'active_recipe', active_recipe.recipe,
+        'recipe_versions', COALESCE(versions.items, '[]'::JSON),
+        'snapshots', COALESCE(snapshots.items, '[]'::JSON),
+        'cost', CASE WHEN pc.product_id IS NOT NULL THEN JSON_BUILD_OBJECT(
+            'unit_cost', pc.unit_cost,
+            'margin', pc.margin,
+            'margin_pct', pc.margin_pct,
+            'lines_without_cost', pc.lines_without_cost
+        ) END
+    )::TEXT
+FROM products p
+LEFT JOIN categories c ON p.category_id = c.id
+LEFT JOIN flavors f ON p.flavor_id = f.id
+LEFT JOIN sizes s ON p.size_id = s.id
+LEFT JOIN product_costs pc ON pc.product_id = p.id
+LEFT JOIN LATERAL (
+    SELECT 
+        JSON_BUILD_OBJECT(
+            'id', r.id,
+            'version', r.version,
+            'raw_materials', COALESCE(
+                JSON_AGG(
+                    JSON_BUILD_OBJECT(
+                        'raw_material_id', rm.id,
+                        'raw_material_name', rm.name,
+                        'quantity', rr.quantity,
+                        'unit', uom.name,
+                        'total_inventory', rm.total_inventory,
+                        'reserved_inventory', rm.reserved_inventory,
+                        'available_inventory', rm.available_inventory
+                    )
+                    ORDER BY rm.name
+                ) FILTER (WHERE rm.id IS NOT NULL),
+                '[]'::JSON
+            )
+        ) AS recipe
+    FROM recipes r
+    LEFT JOIN recipe_raw_materials rr ON rr.recipe_id = r.id
+    LEFT JOIN raw_materials rm ON rm.id = rr.raw_material_id
+    LEFT JOIN unit_of_measure uom ON uom.id = rm.unit_of_measure_id
+    WHERE r.product_id = p.id
+      AND r.active = TRUE
+    GROUP BY r.id
+) active_recipe ON TRUE
+LEFT JOIN LATERAL (
+    SELECT 
+        JSON_AGG(
+            JSON_BUILD_OBJECT(
+                'id', r.id,
+                'version', r.version,
+                'active', COALESCE(r.active, FALSE),
+                'created_at', r.created_at
+            )
+            ORDER BY r.version DESC
+        ) AS items
+    FROM recipes r
+    WHERE r.product_id = p.id
+) versions ON TRUE
+LEFT JOIN LATERAL (
+    SELECT 
+        JSON_AGG(
+            JSON_BUILD_OBJECT(
+                'id', ps.id,
+                'version', ps.snapshot_version,
+                'recipe_version', ps.recipe_version,
+                'created_at', ps.created_at
+            )
+            ORDER BY ps.snapshot_version DESC
+        ) AS items
+    FROM product_snapshots ps
+    WHERE ps.product_id = p.id
+) snapshots ON TRUE
+WHERE p.id = %s;
@@ -0,0 +1,14 @@
+SELECT 
+    id, 
+    product_id, 
+    snapshot_version, 
+    name, 
+    sku, 
+    category_name, 
+    flavor_name, 
+    size_name, 
+    recipe_version, 
+    created_at
+FROM product_snapshots
+WHERE product_id = %s
+  AND snapshot_version = %s;
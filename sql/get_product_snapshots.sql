@@ -1,6 +1,7 @@
 SELECT 
     id, 
+    snapshot_version,
     created_at 
 FROM product_snapshots 
 WHERE product_id = %s
-ORDER BY created_at DESC;
+ORDER BY snapshot_version DESC;
@@ -0,0 +1,4 @@
+SELECT table_name, version, changed_at
+FROM table_versions
+WHERE table_name = ANY(%s)
+ORDER BY table_name;
@@ -1,3 +1,11 @@
+-- Allocates the next snapshot version from the product's counter row (locked until commit)
+WITH next_version AS (
+  INSERT INTO product_version_counters (product_id, last_snapshot_version)
+  VALUES (%s, 1)
+  ON CONFLICT (product_id) DO UPDATE
+    SET last_snapshot_version = product_version_counters.last_snapshot_version + 1
+  RETURNING last_snapshot_version
+)
 INSERT INTO product_snapshots (
   product_id,
   snapshot_version,
@@ -12,9 +20,9 @@ INSERT INTO product_snapshots (
   recipe_version,
   created_at
 )
-VALUES (
+SELECT
   %s,
-  COALESCE((SELECT MAX(snapshot_version) + 1 FROM product_snapshots WHERE product_id = %s), 1),
+  last_snapshot_version,
   %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW()
-)
+FROM next_version
 RETURNING id;
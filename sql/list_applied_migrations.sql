@@ -0,0 +1,3 @@
+SELECT version 
+FROM schema_version 
+ORDER BY version;
@@ -9,5 +9,10 @@ FROM
     manufacturing_orders mo
 JOIN 
     products p ON mo.product_id = p.id
+WHERE 
+    -- Keyset cursor: rows after the last (planned_start_date, id) of the previous page
+    (%s::date IS NULL OR (mo.planned_start_date, mo.id) > (%s::date, %s::int))
 ORDER BY 
-    mo.planned_start_date;
+    mo.planned_start_date,
+    mo.id
+LIMIT %s;
@@ -0,0 +1,4 @@
+-- Products with Pending manufacturing orders, whose BOMs material requirements planning needs
+SELECT DISTINCT product_id
+FROM manufacturing_orders
+WHERE status = 'Pending';
@@ -0,0 +1,19 @@
+-- Margin report from the product cost rollup, lowest margin first; optionally only
+-- products below a margin percentage
+SELECT 
+    pc.product_id,
+    p.name,
+    p.sku,
+    pc.recipe_id,
+    r.version AS recipe_version,
+    pc.unit_cost,
+    pc.price,
+    pc.margin,
+    pc.margin_pct,
+    pc.lines_without_cost,
+    pc.refreshed_at
+FROM product_costs pc
+JOIN products p ON p.id = pc.product_id
+JOIN recipes r ON r.id = pc.recipe_id
+WHERE %s::NUMERIC IS NULL OR pc.margin_pct < %s::NUMERIC   -- below
+ORDER BY pc.margin_pct NULLS LAST, pc.product_id;
@@ -16,6 +16,11 @@ LEFT JOIN
 LEFT JOIN 
     flavors f ON p.flavor_id = f.id
 LEFT JOIN 
-    sizes s ON p.flavor_id = s.id
+    sizes s ON p.size_id = s.id
+WHERE 
+    -- Keyset cursor: rows after the last (created_at, id) of the previous page
+    (%s::timestamp IS NULL OR (p.created_at, p.id) < (%s::timestamp, %s::int))
 ORDER BY 
-    p.created_at DESC;
+    p.created_at DESC,
+    p.id DESC
+LIMIT %s;
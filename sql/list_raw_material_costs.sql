@@ -0,0 +1,5 @@
+-- Cost history of a raw material, current cost first
+SELECT id, unit_cost, effective_from, created_at
+FROM raw_material_costs
+WHERE raw_material_id = %s
+ORDER BY effective_from DESC, id DESC;
@@ -7,7 +7,6 @@ SELECT
     rm.total_inventory,
     rm.reserved_inventory,
     rm.available_inventory,
-    rm.tags, 
     rm.created_at, 
     rm.updated_at
 FROM 
@@ -0,0 +1,41 @@
+SELECT 
+    rm.id, 
+    rm.name, 
+    v.name AS vendor_name, 
+    uom.name AS unit_of_measure, 
+    rm.moq, 
+    rm.total_inventory,
+    rm.reserved_inventory,
+    rm.available_inventory,
+    COALESCE(tag_names.tags, ARRAY[]::TEXT[]) AS tags, 
+    rm.created_at, 
+    rm.updated_at
+FROM 
+    raw_materials rm
+JOIN 
+    vendors v ON rm.vendor_id = v.id
+JOIN 
+    unit_of_measure uom ON rm.unit_of_measure_id = uom.id
+-- Tag names for the rows on this page only
+LEFT JOIN LATERAL (
+    SELECT ARRAY_AGG(t.name ORDER BY t.name) AS tags
+    FROM raw_material_tags rmt
+    JOIN tags t ON t.id = rmt.tag_id
+    WHERE rmt.raw_material_id = rm.id
+) tag_names ON TRUE
+WHERE 
+    -- Optional tag filter: materials carrying every requested tag
+    (%s::text[] IS NULL OR rm.id IN (
+        SELECT rmt.raw_material_id
+        FROM tags t
+        JOIN raw_material_tags rmt ON rmt.tag_id = t.id
+        WHERE t.name = ANY(%s::text[])
+        GROUP BY rmt.raw_material_id
+        HAVING COUNT(*) = CARDINALITY(%s::text[])
+    ))
+    -- Keyset cursor: rows after the last (name, id) of the previous page
+    AND (%s::text IS NULL OR (rm.name, rm.id) > (%s::text, %s::int))
+ORDER BY 
+    rm.name,
+    rm.id
+LIMIT %s;
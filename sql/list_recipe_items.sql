@@ -1,8 +1,10 @@
 SELECT 
-    ri.id, rm.name AS raw_material_name, ri.quantity
+    rr.raw_material_id, rm.name AS raw_material_name, rr.quantity
 FROM 
-    recipe_items ri
+    recipe_raw_materials rr
 JOIN 
-    raw_materials rm ON ri.raw_material_id = rm.id
+    raw_materials rm ON rr.raw_material_id = rm.id
 WHERE 
-    ri.recipe_id = %s;
+    rr.recipe_id = %s
+ORDER BY 
+    rm.name;
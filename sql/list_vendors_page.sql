@@ -0,0 +1,6 @@
+SELECT id, name, email, address, description, notes, created_at, updated_at
+FROM vendors
+-- Keyset cursor: rows after the last (name, id) of the previous page
+WHERE (%s::text IS NULL OR (name, id) > (%s::text, %s::int))
+ORDER BY name, id
+LIMIT %s;
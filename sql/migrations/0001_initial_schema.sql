@@ -1,3 +1,25 @@
+-- Create the `categories` table
+CREATE TABLE IF NOT EXISTS categories (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) UNIQUE NOT NULL,
+    description TEXT
+);
+
+
+
+-- Create the `flavors` table
+CREATE TABLE IF NOT EXISTS flavors (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) UNIQUE NOT NULL
+);
+
+-- Create the `sizes` table
+CREATE TABLE IF NOT EXISTS sizes (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) UNIQUE NOT NULL,
+    weight_g INTEGER
+);
+
 -- Create the `products` table
 CREATE TABLE IF NOT EXISTS products (
     id SERIAL PRIMARY KEY,                       -- Unique identifier for the product
@@ -30,31 +52,6 @@ CREATE TABLE IF NOT EXISTS product_snapshots (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
 );
 
-
-
-
--- Create the `categories` table
-CREATE TABLE IF NOT EXISTS categories (
-    id SERIAL PRIMARY KEY,
-    name VARCHAR(100) UNIQUE NOT NULL,
-    description TEXT
-);
-
-
-
--- Create the `flavors` table
-CREATE TABLE IF NOT EXISTS flavors (
-    id SERIAL PRIMARY KEY,
-    name VARCHAR(100) UNIQUE NOT NULL
-);
-
--- Create the `sizes` table
-CREATE TABLE IF NOT EXISTS sizes (
-    id SERIAL PRIMARY KEY,
-    name VARCHAR(100) UNIQUE NOT NULL,
-    weight_g INTEGER
-);
-
 -- Create the 'tags' table to manage tags on items 
 CREATE TABLE IF NOT EXISTS tags (
     id SERIAL PRIMARY KEY,
@@ -131,11 +128,7 @@ CREATE TABLE IF NOT EXISTS stock_adjustments (
 CREATE TABLE IF NOT EXISTS recipes (
     id SERIAL PRIMARY KEY,
     product_id INT NOT NULL,
-    version INT GENERATED ALWAYS AS (
-        COALESCE(
-            (SELECT MAX(version) + 1 FROM recipes r WHERE r.product_id = recipes.product_id), 1
-        )
-    ) STORED,
+    version INT NOT NULL DEFAULT 1,              -- Assigned on insert (see add_recipe.sql)
     active BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP DEFAULT NOW()
 );
@@ -168,12 +161,3 @@ CREATE TABLE IF NOT EXISTS recipe_items (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
 );
-
-CREATE TABLE IF NOT EXISTS recipe_raw_materials (
-    id SERIAL PRIMARY KEY,                   -- Unique identifier for the entry
-    recipe_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE, -- Links to recipes table
-    raw_material_id INTEGER NOT NULL REFERENCES raw_materials(id) ON DELETE CASCADE, -- Links to raw materials table
-    quantity FLOAT NOT NULL CHECK (quantity > 0), -- Quantity of raw material required
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL, -- Timestamp for when the record is created
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL  -- Timestamp for when the record is updated
-);
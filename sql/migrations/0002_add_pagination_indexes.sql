@@ -0,0 +1,24 @@
+-- Indexes backing the keyset (cursor) pagination on the list pages and JSON fetch endpoints
+
+-- /products: ORDER BY created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_products_created_at_id 
+    ON products (created_at DESC, id DESC);
+
+-- /recipes: products are walked by name, then each product's recipe versions
+CREATE INDEX IF NOT EXISTS idx_products_name_id 
+    ON products (name, id);
+
+CREATE INDEX IF NOT EXISTS idx_recipes_product_id_version 
+    ON recipes (product_id, version DESC);
+
+-- /raw_materials and /fetch_raw_materials: ORDER BY name, id
+CREATE INDEX IF NOT EXISTS idx_raw_materials_name_id 
+    ON raw_materials (name, id);
+
+-- /manufacturing_orders: ORDER BY planned_start_date, id
+CREATE INDEX IF NOT EXISTS idx_manufacturing_orders_planned_start_date_id 
+    ON manufacturing_orders (planned_start_date, id);
+
+-- /vendors and /vendors/fetch: ORDER BY name, id
+CREATE INDEX IF NOT EXISTS idx_vendors_name_id 
+    ON vendors (name, id);
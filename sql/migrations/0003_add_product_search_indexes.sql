@@ -0,0 +1,21 @@
+-- Trigram indexes backing /search_products (ILIKE '%query%' and similarity ranking)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_products_name_trgm 
+    ON products USING GIN (name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_products_sku_trgm 
+    ON products USING GIN (sku gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_categories_name_trgm 
+    ON categories USING GIN (name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_flavors_name_trgm 
+    ON flavors USING GIN (name gin_trgm_ops);
+
+-- Resolve matching categories/flavors back to their products
+CREATE INDEX IF NOT EXISTS idx_products_category_id 
+    ON products (category_id);
+
+CREATE INDEX IF NOT EXISTS idx_products_flavor_id 
+    ON products (flavor_id);
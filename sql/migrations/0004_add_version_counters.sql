@@ -0,0 +1,74 @@
+-- Per-product version counters for recipes and product snapshots. Allocating a version
+-- increments the product's counter row (row-locked until commit) instead of scanning
+-- history with MAX(version) + 1, so concurrent writers can never get the same number.
+CREATE TABLE IF NOT EXISTS product_version_counters (
+    product_id INTEGER PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,
+    last_recipe_version INTEGER NOT NULL DEFAULT 0,     -- Highest recipe version handed out
+    last_snapshot_version INTEGER NOT NULL DEFAULT 0    -- Highest snapshot version handed out
+);
+
+
+-- Renumber duplicate versions left behind by concurrent MAX() + 1 inserts: the oldest row
+-- keeps its number, later duplicates move past the product's current maximum.
+WITH ranked AS (
+    SELECT 
+        id, 
+        product_id, 
+        ROW_NUMBER() OVER (PARTITION BY product_id, version ORDER BY id) AS duplicate_rank
+    FROM recipes
+),
+renumbered AS (
+    SELECT 
+        r.id, 
+        m.max_version + ROW_NUMBER() OVER (PARTITION BY r.product_id ORDER BY r.id) AS new_version
+    FROM ranked r
+    JOIN (SELECT product_id, MAX(version) AS max_version FROM recipes GROUP BY product_id) m 
+        ON m.product_id = r.product_id
+    WHERE r.duplicate_rank > 1
+)
+UPDATE recipes 
+SET version = renumbered.new_version
+FROM renumbered
+WHERE recipes.id = renumbered.id;
+
+WITH ranked AS (
+    SELECT 
+        id, 
+        product_id, 
+        ROW_NUMBER() OVER (PARTITION BY product_id, snapshot_version ORDER BY id) AS duplicate_rank
+    FROM product_snapshots
+),
+renumbered AS (
+    SELECT 
+        r.id, 
+        m.max_version + ROW_NUMBER() OVER (PARTITION BY r.product_id ORDER BY r.id) AS new_version
+    FROM ranked r
+    JOIN (SELECT product_id, MAX(snapshot_version) AS max_version FROM product_snapshots GROUP BY product_id) m 
+        ON m.product_id = r.product_id
+    WHERE r.duplicate_rank > 1
+)
+UPDATE product_snapshots 
+SET snapshot_version = renumbered.new_version
+FROM renumbered
+WHERE product_snapshots.id = renumbered.id;
+
+
+-- One version number per product; the unique indexes also serve product_id lookups
+ALTER TABLE recipes 
+    ADD CONSTRAINT unique_recipe_version UNIQUE (product_id, version);
+
+ALTER TABLE product_snapshots 
+    ADD CONSTRAINT unique_product_snapshot_version UNIQUE (product_id, snapshot_version);
+
+-- Superseded by unique_recipe_version
+DROP INDEX IF EXISTS idx_recipes_product_id_version;
+
+
+-- Seed the counters from existing history
+INSERT INTO product_version_counters (product_id, last_recipe_version, last_snapshot_version)
+SELECT 
+    p.id,
+    COALESCE((SELECT MAX(version) FROM recipes r WHERE r.product_id = p.id), 0),
+    COALESCE((SELECT MAX(snapshot_version) FROM product_snapshots s WHERE s.product_id = p.id), 0)
+FROM products p
+ON CONFLICT (product_id) DO NOTHING;
@@ -0,0 +1,145 @@
+-- Pre-aggregated recipe summaries for the /recipes page: one row per recipe version with
+-- its ingredients already built as JSON. Triggers keep rows current as recipes, their
+-- lines, product names and raw material names change, so the page reads a small slice
+-- instead of re-aggregating every version of every product per request.
+CREATE TABLE IF NOT EXISTS recipe_summaries (
+    recipe_id INTEGER PRIMARY KEY REFERENCES recipes(id) ON DELETE CASCADE,
+    product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    product_name VARCHAR(255) NOT NULL,
+    version INTEGER NOT NULL,
+    active BOOLEAN NOT NULL DEFAULT FALSE,
+    raw_materials JSONB NOT NULL DEFAULT '[]'::JSONB,  -- [{name, quantity, unit}, ...]
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+-- Page order (product name, product, newest version first) and the product filter
+CREATE INDEX IF NOT EXISTS idx_recipe_summaries_page 
+    ON recipe_summaries (product_name, product_id, (-version));
+
+CREATE INDEX IF NOT EXISTS idx_recipe_summaries_product_id 
+    ON recipe_summaries (product_id, version DESC);
+
+
+-- Rebuilds the summary rows for the given recipes
+CREATE OR REPLACE FUNCTION refresh_recipe_summaries(p_recipe_ids INTEGER[]) RETURNS VOID AS $$
+    INSERT INTO recipe_summaries (recipe_id, product_id, product_name, version, active, raw_materials, refreshed_at)
+    SELECT 
+        r.id,
+        r.product_id,
+        p.name,
+        r.version,
+        COALESCE(r.active, FALSE),
+        COALESCE(items.raw_materials, '[]'::JSONB),
+        NOW()
+    FROM recipes r
+    JOIN products p ON p.id = r.product_id
+    LEFT JOIN LATERAL (
+        SELECT 
+            JSONB_AGG(
+                JSONB_BUILD_OBJECT(
+                    'name', rm.name,
+                    'quantity', rr.quantity,
+                    'unit', u.name
+                )
+                ORDER BY rm.name
+            ) AS raw_materials
+        FROM recipe_raw_materials rr
+        JOIN raw_materials rm ON rr.raw_material_id = rm.id
+        LEFT JOIN unit_of_measure u ON rm.unit_of_measure_id = u.id
+        WHERE rr.recipe_id = r.id
+    ) items ON TRUE
+    WHERE r.id = ANY(p_recipe_ids)
+    ON CONFLICT (recipe_id) DO UPDATE 
+        SET product_id = EXCLUDED.product_id,
+            product_name = EXCLUDED.product_name,
+            version = EXCLUDED.version,
+            active = EXCLUDED.active,
+            raw_materials = EXCLUDED.raw_materials,
+            refreshed_at = EXCLUDED.refreshed_at;
+$$ LANGUAGE sql;
+
+
+-- Statement-level triggers: each write refreshes the distinct recipes it touched once
+CREATE OR REPLACE FUNCTION refresh_recipe_summaries_from_recipes() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_recipe_summaries(ARRAY(SELECT id FROM changed_recipes));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION refresh_recipe_summaries_from_lines() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_recipe_summaries(ARRAY(SELECT DISTINCT recipe_id FROM changed_lines));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION refresh_recipe_summaries_from_products() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE recipe_summaries rs
+    SET product_name = p.name,
+        refreshed_at = NOW()
+    FROM changed_products p
+    WHERE rs.product_id = p.id
+      AND rs.product_name IS DISTINCT FROM p.name;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION refresh_recipe_summaries_from_raw_materials() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_recipe_summaries(ARRAY(
+        SELECT DISTINCT rr.recipe_id
+        FROM recipe_raw_materials rr
+        JOIN changed_raw_materials rm ON rm.id = rr.raw_material_id
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables cannot be shared between events, hence one trigger per event
+DROP TRIGGER IF EXISTS recipes_insert_refresh_summary ON recipes;
+CREATE TRIGGER recipes_insert_refresh_summary
+    AFTER INSERT ON recipes
+    REFERENCING NEW TABLE AS changed_recipes
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_recipe_summaries_from_recipes();
+
+DROP TRIGGER IF EXISTS recipes_update_refresh_summary ON recipes;
+CREATE TRIGGER recipes_update_refresh_summary
+    AFTER UPDATE ON recipes
+    REFERENCING NEW TABLE AS changed_recipes
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_recipe_summaries_from_recipes();
+
+DROP TRIGGER IF EXISTS recipe_lines_insert_refresh_summary ON recipe_raw_materials;
+CREATE TRIGGER recipe_lines_insert_refresh_summary
+    AFTER INSERT ON recipe_raw_materials
+    REFERENCING NEW TABLE AS changed_lines
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_recipe_summaries_from_lines();
+
+DROP TRIGGER IF EXISTS recipe_lines_update_refresh_summary ON recipe_raw_materials;
+CREATE TRIGGER recipe_lines_update_refresh_summary
+    AFTER UPDATE ON recipe_raw_materials
+    REFERENCING NEW TABLE AS changed_lines
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_recipe_summaries_from_lines();
+
+DROP TRIGGER IF EXISTS recipe_lines_delete_refresh_summary ON recipe_raw_materials;
+CREATE TRIGGER recipe_lines_delete_refresh_summary
+    AFTER DELETE ON recipe_raw_materials
+    REFERENCING OLD TABLE AS changed_lines
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_recipe_summaries_from_lines();
+
+DROP TRIGGER IF EXISTS products_update_refresh_summary ON products;
+CREATE TRIGGER products_update_refresh_summary
+    AFTER UPDATE ON products
+    REFERENCING NEW TABLE AS changed_products
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_recipe_summaries_from_products();
+
+DROP TRIGGER IF EXISTS raw_materials_update_refresh_summary ON raw_materials;
+CREATE TRIGGER raw_materials_update_refresh_summary
+    AFTER UPDATE ON raw_materials
+    REFERENCING NEW TABLE AS changed_raw_materials
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_recipe_summaries_from_raw_materials();
+
+
+-- Backfill
+SELECT refresh_recipe_summaries(ARRAY(SELECT id FROM recipes));
@@ -0,0 +1,79 @@
+-- Normalized raw material tags. raw_materials.tags held a JSONB array in several shapes
+-- (plain strings, {"value": ...} objects, or a string containing a serialized Tagify
+-- array), which every read had to re-parse in Python and no index could serve. Tag
+-- assignments now live in a join table, so "materials tagged X" is an index lookup.
+CREATE TABLE IF NOT EXISTS raw_material_tags (
+    raw_material_id INTEGER NOT NULL REFERENCES raw_materials(id) ON DELETE CASCADE,
+    tag_id INTEGER NOT NULL REFERENCES tags(id) ON DELETE CASCADE,
+    PRIMARY KEY (raw_material_id, tag_id)
+);
+
+-- Tag filter: all raw materials carrying a tag
+CREATE INDEX IF NOT EXISTS idx_raw_material_tags_tag_id 
+    ON raw_material_tags (tag_id, raw_material_id);
+
+
+-- One-time backfill from the JSONB column, accepting every shape written so far
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns 
+        WHERE table_name = 'raw_materials' AND column_name = 'tags'
+    ) THEN
+        CREATE TEMP TABLE backfilled_tags ON COMMIT DROP AS
+        WITH elements AS (
+            SELECT rm.id AS raw_material_id, e.element
+            FROM raw_materials rm
+            CROSS JOIN LATERAL JSONB_ARRAY_ELEMENTS(
+                CASE WHEN JSONB_TYPEOF(rm.tags) = 'array' THEN rm.tags ELSE '[]'::JSONB END
+            ) AS e(element)
+        ),
+        -- Strings holding serialized JSON (a Tagify value) are parsed first
+        parsed AS (
+            SELECT 
+                raw_material_id,
+                CASE 
+                    WHEN JSONB_TYPEOF(element) = 'string' 
+                         AND (element #>> '{}') ~ '^\s*[\[{]' 
+                         AND PG_INPUT_IS_VALID(element #>> '{}', 'jsonb')
+                        THEN (element #>> '{}')::JSONB
+                    ELSE element
+                END AS element
+            FROM elements
+        ),
+        flattened AS (
+            SELECT p.raw_material_id, inner_element.element
+            FROM parsed p
+            CROSS JOIN LATERAL JSONB_ARRAY_ELEMENTS(
+                CASE WHEN JSONB_TYPEOF(p.element) = 'array' THEN p.element ELSE JSONB_BUILD_ARRAY(p.element) END
+            ) AS inner_element(element)
+        )
+        SELECT DISTINCT 
+            raw_material_id,
+            TRIM(CASE 
+                WHEN JSONB_TYPEOF(element) = 'object' THEN element ->> 'value'
+                WHEN JSONB_TYPEOF(element) = 'string' THEN element #>> '{}'
+            END) AS name
+        FROM flattened;
+
+        DELETE FROM backfilled_tags WHERE name IS NULL OR name = '';
+
+        INSERT INTO tags (name)
+        SELECT DISTINCT name FROM backfilled_tags
+        ON CONFLICT (name) DO NOTHING;
+
+        INSERT INTO raw_material_tags (raw_material_id, tag_id)
+        SELECT b.raw_material_id, t.id
+        FROM backfilled_tags b
+        JOIN tags t ON t.name = b.name
+        ON CONFLICT DO NOTHING;
+
+        ALTER TABLE raw_materials DROP COLUMN tags;
+    END IF;
+END $$;
+
+-- Drop the fragments of serialized JSON that splitting Tagify values on commas left in
+-- the tags table, unless something is actually tagged with them
+DELETE FROM tags t
+WHERE t.name ~ '^\s*[\[{]|[\]}]\s*$'
+  AND NOT EXISTS (SELECT 1 FROM raw_material_tags rmt WHERE rmt.tag_id = t.id);
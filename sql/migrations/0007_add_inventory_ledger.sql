@@ -0,0 +1,85 @@
+-- Append-only inventory ledger. Every stock movement (manual adjustments, MO reservations,
+-- releases and consumption) is recorded as a row here; raw_materials.total_inventory and
+-- reserved_inventory stay as the current balances, maintained from the ledger by the
+-- statement-level trigger below. Periodic checkpoints snapshot the balances so
+-- point-in-time inventory is a checkpoint plus a short tail of movements.
+CREATE TABLE IF NOT EXISTS inventory_movements (
+    id BIGSERIAL PRIMARY KEY,
+    raw_material_id INTEGER NOT NULL REFERENCES raw_materials(id) ON DELETE CASCADE,
+    movement_type VARCHAR(20) NOT NULL 
+        CHECK (movement_type IN ('opening', 'adjustment', 'reservation', 'release', 'consumption')),
+    on_hand_delta FLOAT NOT NULL DEFAULT 0,     -- Change to total_inventory
+    reserved_delta FLOAT NOT NULL DEFAULT 0,    -- Change to reserved_inventory
+    manufacturing_order_id INTEGER REFERENCES manufacturing_orders(id) ON DELETE SET NULL,
+    reason TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+-- Checkpoint tails and point-in-time lookups
+CREATE INDEX IF NOT EXISTS idx_inventory_movements_material_created 
+    ON inventory_movements (raw_material_id, created_at);
+
+-- Movements of a manufacturing order (reservation release on delete)
+CREATE INDEX IF NOT EXISTS idx_inventory_movements_mo 
+    ON inventory_movements (manufacturing_order_id) 
+    WHERE manufacturing_order_id IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS inventory_checkpoints (
+    raw_material_id INTEGER NOT NULL REFERENCES raw_materials(id) ON DELETE CASCADE,
+    as_of TIMESTAMP NOT NULL,                   -- Covers every movement created up to this time
+    on_hand FLOAT NOT NULL,
+    reserved FLOAT NOT NULL,
+    PRIMARY KEY (raw_material_id, as_of)
+);
+
+
+-- Applies new movements to the balances: one UPDATE per statement, aggregated per
+-- material, so the CHECK constraints on raw_materials still reject negative stock
+CREATE OR REPLACE FUNCTION apply_inventory_movements() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE raw_materials rm
+    SET total_inventory = rm.total_inventory + m.on_hand_delta,
+        reserved_inventory = rm.reserved_inventory + m.reserved_delta,
+        updated_at = NOW()
+    FROM (
+        SELECT raw_material_id, SUM(on_hand_delta) AS on_hand_delta, SUM(reserved_delta) AS reserved_delta
+        FROM new_movements
+        WHERE movement_type <> 'opening'
+        GROUP BY raw_material_id
+    ) m
+    WHERE rm.id = m.raw_material_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS inventory_movements_apply ON inventory_movements;
+CREATE TRIGGER inventory_movements_apply
+    AFTER INSERT ON inventory_movements
+    REFERENCING NEW TABLE AS new_movements
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_inventory_movements();
+
+-- The ledger is append-only; corrections are new movements
+CREATE OR REPLACE FUNCTION reject_inventory_movement_update() RETURNS TRIGGER AS $$
+BEGIN
+    RAISE EXCEPTION 'inventory_movements is append-only; record a correcting movement instead';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS inventory_movements_append_only ON inventory_movements;
+CREATE TRIGGER inventory_movements_append_only
+    BEFORE UPDATE ON inventory_movements
+    FOR EACH ROW EXECUTE FUNCTION reject_inventory_movement_update();
+
+
+-- Opening balances: the ledger starts from the current stock levels (they already include
+-- every earlier adjustment), with a matching first checkpoint
+INSERT INTO inventory_movements (raw_material_id, movement_type, on_hand_delta, reserved_delta, reason)
+SELECT id, 'opening', COALESCE(total_inventory, 0), COALESCE(reserved_inventory, 0), 'Opening balance'
+FROM raw_materials rm
+WHERE NOT EXISTS (SELECT 1 FROM inventory_movements m WHERE m.raw_material_id = rm.id);
+
+INSERT INTO inventory_checkpoints (raw_material_id, as_of, on_hand, reserved)
+SELECT raw_material_id, created_at, on_hand_delta, reserved_delta
+FROM inventory_movements
+WHERE movement_type = 'opening'
+ON CONFLICT DO NOTHING;
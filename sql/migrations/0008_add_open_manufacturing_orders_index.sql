@@ -0,0 +1,4 @@
+-- Material requirements planning reads every open manufacturing order on each run
+CREATE INDEX IF NOT EXISTS idx_manufacturing_orders_open 
+    ON manufacturing_orders (product_id, planned_start_date) 
+    WHERE status IN ('Pending', 'In Progress');
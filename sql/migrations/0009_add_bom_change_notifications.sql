@@ -0,0 +1,63 @@
+-- Compiled BOMs (bom.py) are cached per product in every worker. These statement-level
+-- triggers NOTIFY the ids of the products whose active recipe may have changed, on any
+-- write to recipes or recipe_raw_materials (including cascaded deletes), so the caches
+-- are dropped when the transaction commits. Postgres folds duplicate notifications
+-- within a transaction, so bulk writes send one per product.
+CREATE OR REPLACE FUNCTION notify_bom_changed_from_recipes() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('bom_changed', product_id::TEXT)
+    FROM (SELECT DISTINCT product_id FROM changed_recipes) c;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_bom_changed_from_lines() RETURNS TRIGGER AS $$
+BEGIN
+    -- Lines deleted along with their recipe are covered by the recipes trigger
+    PERFORM pg_notify('bom_changed', product_id::TEXT)
+    FROM (
+        SELECT DISTINCT r.product_id
+        FROM changed_lines l
+        JOIN recipes r ON r.id = l.recipe_id
+    ) c;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables cannot be shared between events, hence one trigger per event
+DROP TRIGGER IF EXISTS recipes_insert_notify_bom ON recipes;
+CREATE TRIGGER recipes_insert_notify_bom
+    AFTER INSERT ON recipes
+    REFERENCING NEW TABLE AS changed_recipes
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_bom_changed_from_recipes();
+
+DROP TRIGGER IF EXISTS recipes_update_notify_bom ON recipes;
+CREATE TRIGGER recipes_update_notify_bom
+    AFTER UPDATE ON recipes
+    REFERENCING NEW TABLE AS changed_recipes
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_bom_changed_from_recipes();
+
+DROP TRIGGER IF EXISTS recipes_delete_notify_bom ON recipes;
+CREATE TRIGGER recipes_delete_notify_bom
+    AFTER DELETE ON recipes
+    REFERENCING OLD TABLE AS changed_recipes
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_bom_changed_from_recipes();
+
+DROP TRIGGER IF EXISTS recipe_lines_insert_notify_bom ON recipe_raw_materials;
+CREATE TRIGGER recipe_lines_insert_notify_bom
+    AFTER INSERT ON recipe_raw_materials
+    REFERENCING NEW TABLE AS changed_lines
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_bom_changed_from_lines();
+
+DROP TRIGGER IF EXISTS recipe_lines_update_notify_bom ON recipe_raw_materials;
+CREATE TRIGGER recipe_lines_update_notify_bom
+    AFTER UPDATE ON recipe_raw_materials
+    REFERENCING NEW TABLE AS changed_lines
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_bom_changed_from_lines();
+
+DROP TRIGGER IF EXISTS recipe_lines_delete_notify_bom ON recipe_raw_materials;
+CREATE TRIGGER recipe_lines_delete_notify_bom
+    AFTER DELETE ON recipe_raw_materials
+    REFERENCING OLD TABLE AS changed_lines
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_bom_changed_from_lines();
+
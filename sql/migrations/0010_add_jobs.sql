@@ -0,0 +1,29 @@
+-- Background job queue (see jobs.py). Web requests enqueue rows here and worker
+-- processes claim them with FOR UPDATE SKIP LOCKED, so any number of workers can poll
+-- the same table without blocking each other. Failed jobs are retried with exponential
+-- backoff until max_attempts; the row doubles as the job's status record.
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    job_type VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}'::JSONB,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3 CHECK (max_attempts > 0),
+    run_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,  -- Not claimed before this time
+    locked_by VARCHAR(255),                               -- Worker running the job
+    locked_at TIMESTAMP,
+    last_error TEXT,
+    result JSONB,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    finished_at TIMESTAMP
+);
+
+-- The claim query: the next due job, and running jobs whose worker stopped responding
+CREATE INDEX IF NOT EXISTS idx_jobs_queued 
+    ON jobs (run_at, id) 
+    WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS idx_jobs_running 
+    ON jobs (locked_at) 
+    WHERE status = 'running';
@@ -0,0 +1,56 @@
+-- Per-table change counters for conditional GET on the JSON fetch endpoints (see
+-- http_cache.py). Statement-level triggers bump a table's counter on every write, so an
+-- endpoint can tell whether its data changed with one primary-key read of the counters
+-- it depends on instead of re-running its query. Only the raw_materials columns those
+-- endpoints show bump its counter; inventory balance updates from the ledger do not.
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name VARCHAR(100) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO table_versions (table_name)
+VALUES ('raw_materials'), ('vendors'), ('unit_of_measure'), ('tags'),
+       ('raw_material_tags'), ('recipe_raw_materials')
+ON CONFLICT (table_name) DO NOTHING;
+
+-- TG_ARGV[0] is the counter to bump
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE table_versions
+    SET version = version + 1,
+        changed_at = CLOCK_TIMESTAMP()
+    WHERE table_name = TG_ARGV[0];
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS raw_materials_bump_version ON raw_materials;
+CREATE TRIGGER raw_materials_bump_version
+    AFTER INSERT OR DELETE OR TRUNCATE OR UPDATE OF name, vendor_id, unit_of_measure_id ON raw_materials
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('raw_materials');
+
+DROP TRIGGER IF EXISTS vendors_bump_version ON vendors;
+CREATE TRIGGER vendors_bump_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON vendors
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('vendors');
+
+DROP TRIGGER IF EXISTS unit_of_measure_bump_version ON unit_of_measure;
+CREATE TRIGGER unit_of_measure_bump_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON unit_of_measure
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('unit_of_measure');
+
+DROP TRIGGER IF EXISTS tags_bump_version ON tags;
+CREATE TRIGGER tags_bump_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON tags
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('tags');
+
+DROP TRIGGER IF EXISTS raw_material_tags_bump_version ON raw_material_tags;
+CREATE TRIGGER raw_material_tags_bump_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON raw_material_tags
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('raw_material_tags');
+
+DROP TRIGGER IF EXISTS recipe_raw_materials_bump_version ON recipe_raw_materials;
+CREATE TRIGGER recipe_raw_materials_bump_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON recipe_raw_materials
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('recipe_raw_materials');
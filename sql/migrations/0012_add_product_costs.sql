@@ -0,0 +1,198 @@
+-- Raw material unit costs with effective-dated history, and a per-product cost and margin
+-- rollup over each product's active recipe. Triggers recompute the rollup only for the
+-- products affected by a write (a material cost, a recipe activation, recipe lines or a
+-- product price), so the catalog margin report is a single indexed read.
+CREATE TABLE IF NOT EXISTS raw_material_costs (
+    id BIGSERIAL PRIMARY KEY,
+    raw_material_id INTEGER NOT NULL REFERENCES raw_materials(id) ON DELETE CASCADE,
+    unit_cost NUMERIC(12, 4) NOT NULL CHECK (unit_cost >= 0),  -- USD per unit of measure
+    effective_from TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    -- Costs can be backdated but not scheduled, so the rollup never goes stale by itself
+    CHECK (effective_from <= created_at)
+);
+
+-- Current cost per material: the latest effective row
+CREATE INDEX IF NOT EXISTS idx_raw_material_costs_current 
+    ON raw_material_costs (raw_material_id, effective_from DESC, id DESC);
+
+-- Finding the recipes that use a material
+CREATE INDEX IF NOT EXISTS idx_recipe_raw_materials_raw_material_id 
+    ON recipe_raw_materials (raw_material_id);
+
+CREATE TABLE IF NOT EXISTS product_costs (
+    product_id INTEGER PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,
+    recipe_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,  -- Active recipe version
+    unit_cost NUMERIC(14, 4) NOT NULL,        -- Material cost (COGS) per unit produced
+    price NUMERIC(10, 2) NOT NULL,
+    margin NUMERIC(14, 4) NOT NULL,           -- price - unit_cost
+    margin_pct NUMERIC(10, 2),                -- NULL when the price is zero
+    lines_without_cost INTEGER NOT NULL DEFAULT 0,  -- Recipe lines whose material has no cost yet
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+-- Margin report order (lowest margin first)
+CREATE INDEX IF NOT EXISTS idx_product_costs_margin_pct 
+    ON product_costs (margin_pct, product_id);
+
+
+-- Recomputes the rollup for the given products. Advisory locks, taken in product order,
+-- make concurrent refreshes of the same product run one after the other, and the
+-- following statements take a fresh snapshot, so the last refresh sees every committed
+-- change rather than overwriting it with an older view.
+CREATE OR REPLACE FUNCTION refresh_product_costs(p_product_ids INTEGER[]) RETURNS VOID AS $$
+    SELECT pg_advisory_xact_lock(7291002, id)
+    FROM (SELECT DISTINCT UNNEST(p_product_ids) AS id ORDER BY 1) ids;
+
+    DELETE FROM product_costs pc
+    WHERE pc.product_id = ANY(p_product_ids)
+      AND NOT EXISTS (
+          SELECT 1 FROM recipes r WHERE r.product_id = pc.product_id AND r.active = TRUE
+      );
+
+    INSERT INTO product_costs (product_id, recipe_id, unit_cost, price, margin, margin_pct, lines_without_cost, refreshed_at)
+    SELECT 
+        p.id,
+        r.id,
+        costs.unit_cost,
+        p.price,
+        p.price - costs.unit_cost,
+        CASE WHEN p.price > 0 THEN ROUND((p.price - costs.unit_cost) / p.price * 100, 2) END,
+        costs.lines_without_cost,
+        NOW()
+    FROM products p
+    JOIN recipes r ON r.product_id = p.id AND r.active = TRUE
+    CROSS JOIN LATERAL (
+        SELECT 
+            COALESCE(SUM(rr.quantity::NUMERIC * c.unit_cost), 0) AS unit_cost,
+            COUNT(*) FILTER (WHERE c.unit_cost IS NULL) AS lines_without_cost
+        FROM recipe_raw_materials rr
+        LEFT JOIN LATERAL (
+            SELECT rmc.unit_cost
+            FROM raw_material_costs rmc
+            WHERE rmc.raw_material_id = rr.raw_material_id
+            ORDER BY rmc.effective_from DESC, rmc.id DESC
+            LIMIT 1
+        ) c ON TRUE
+        WHERE rr.recipe_id = r.id
+    ) costs
+    WHERE p.id = ANY(p_product_ids)
+    ON CONFLICT (product_id) DO UPDATE 
+        SET recipe_id = EXCLUDED.recipe_id,
+            unit_cost = EXCLUDED.unit_cost,
+            price = EXCLUDED.price,
+            margin = EXCLUDED.margin,
+            margin_pct = EXCLUDED.margin_pct,
+            lines_without_cost = EXCLUDED.lines_without_cost,
+            refreshed_at = EXCLUDED.refreshed_at;
+$$ LANGUAGE sql;
+
+
+-- Statement-level triggers: each write refreshes the distinct products it affects once
+CREATE OR REPLACE FUNCTION refresh_product_costs_from_costs() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_product_costs(ARRAY(
+        SELECT DISTINCT r.product_id
+        FROM changed_costs c
+        JOIN recipe_raw_materials rr ON rr.raw_material_id = c.raw_material_id
+        JOIN recipes r ON r.id = rr.recipe_id AND r.active = TRUE
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION refresh_product_costs_from_recipes() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_product_costs(ARRAY(SELECT DISTINCT product_id FROM changed_recipes));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION refresh_product_costs_from_lines() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_product_costs(ARRAY(
+        SELECT DISTINCT r.product_id
+        FROM changed_lines l
+        JOIN recipes r ON r.id = l.recipe_id AND r.active = TRUE
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Only products whose price changed (column lists cannot be combined with transition tables)
+CREATE OR REPLACE FUNCTION refresh_product_costs_from_products() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_product_costs(ARRAY(
+        SELECT n.id
+        FROM changed_products n
+        JOIN previous_products o ON o.id = n.id
+        WHERE n.price IS DISTINCT FROM o.price
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables cannot be shared between events, hence one trigger per event
+DROP TRIGGER IF EXISTS raw_material_costs_insert_refresh_costs ON raw_material_costs;
+CREATE TRIGGER raw_material_costs_insert_refresh_costs
+    AFTER INSERT ON raw_material_costs
+    REFERENCING NEW TABLE AS changed_costs
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_product_costs_from_costs();
+
+DROP TRIGGER IF EXISTS raw_material_costs_update_refresh_costs ON raw_material_costs;
+CREATE TRIGGER raw_material_costs_update_refresh_costs
+    AFTER UPDATE ON raw_material_costs
+    REFERENCING NEW TABLE AS changed_costs
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_product_costs_from_costs();
+
+DROP TRIGGER IF EXISTS raw_material_costs_delete_refresh_costs ON raw_material_costs;
+CREATE TRIGGER raw_material_costs_delete_refresh_costs
+    AFTER DELETE ON raw_material_costs
+    REFERENCING OLD TABLE AS changed_costs
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_product_costs_from_costs();
+
+DROP TRIGGER IF EXISTS recipes_insert_refresh_costs ON recipes;
+CREATE TRIGGER recipes_insert_refresh_costs
+    AFTER INSERT ON recipes
+    REFERENCING NEW TABLE AS changed_recipes
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_product_costs_from_recipes();
+
+DROP TRIGGER IF EXISTS recipes_update_refresh_costs ON recipes;
+CREATE TRIGGER recipes_update_refresh_costs
+    AFTER UPDATE ON recipes
+    REFERENCING NEW TABLE AS changed_recipes
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_product_costs_from_recipes();
+
+DROP TRIGGER IF EXISTS recipes_delete_refresh_costs ON recipes;
+CREATE TRIGGER recipes_delete_refresh_costs
+    AFTER DELETE ON recipes
+    REFERENCING OLD TABLE AS changed_recipes
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_product_costs_from_recipes();
+
+DROP TRIGGER IF EXISTS recipe_lines_insert_refresh_costs ON recipe_raw_materials;
+CREATE TRIGGER recipe_lines_insert_refresh_costs
+    AFTER INSERT ON recipe_raw_materials
+    REFERENCING NEW TABLE AS changed_lines
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_product_costs_from_lines();
+
+DROP TRIGGER IF EXISTS recipe_lines_update_refresh_costs ON recipe_raw_materials;
+CREATE TRIGGER recipe_lines_update_refresh_costs
+    AFTER UPDATE ON recipe_raw_materials
+    REFERENCING NEW TABLE AS changed_lines
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_product_costs_from_lines();
+
+DROP TRIGGER IF EXISTS recipe_lines_delete_refresh_costs ON recipe_raw_materials;
+CREATE TRIGGER recipe_lines_delete_refresh_costs
+    AFTER DELETE ON recipe_raw_materials
+    REFERENCING OLD TABLE AS changed_lines
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_product_costs_from_lines();
+
+DROP TRIGGER IF EXISTS products_update_refresh_costs ON products;
+CREATE TRIGGER products_update_refresh_costs
+    AFTER UPDATE ON products
+    REFERENCING OLD TABLE AS previous_products NEW TABLE AS changed_products
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_product_costs_from_products();
+
+
+-- Backfill (every product with an active recipe, at zero material cost until costs are entered)
+SELECT refresh_product_costs(ARRAY(SELECT DISTINCT product_id FROM recipes WHERE active = TRUE));
@@ -0,0 +1,7 @@
+-- inventory_movements.manufacturing_order_id referenced manufacturing_orders with
+-- ON DELETE SET NULL, but the ledger is append-only (0007): the SET NULL is an UPDATE,
+-- which the append-only trigger rejects, so no MO with movements could be deleted (nor a
+-- product with such MOs). The column stays as a plain id, recording which order a
+-- movement belonged to after the order itself is gone.
+ALTER TABLE inventory_movements 
+    DROP CONSTRAINT IF EXISTS inventory_movements_manufacturing_order_id_fkey;
@@ -0,0 +1,25 @@
+-- raw_materials rows are updated by every inventory movement (the ledger trigger from 0007
+-- maintains the balances), but recipe summaries only show a material's name and unit.
+-- Refresh only the recipes using materials whose name or unit changed, instead of every
+-- recipe using any updated row on each stock movement, reservation and MO transition.
+-- Column lists cannot be combined with transition tables, so old and new rows are
+-- compared instead (as for product prices in 0012).
+CREATE OR REPLACE FUNCTION refresh_recipe_summaries_from_raw_materials() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_recipe_summaries(ARRAY(
+        SELECT DISTINCT rr.recipe_id
+        FROM changed_raw_materials n
+        JOIN previous_raw_materials o ON o.id = n.id
+        JOIN recipe_raw_materials rr ON rr.raw_material_id = n.id
+        WHERE n.name IS DISTINCT FROM o.name
+           OR n.unit_of_measure_id IS DISTINCT FROM o.unit_of_measure_id
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS raw_materials_update_refresh_summary ON raw_materials;
+CREATE TRIGGER raw_materials_update_refresh_summary
+    AFTER UPDATE ON raw_materials
+    REFERENCING OLD TABLE AS previous_raw_materials NEW TABLE AS changed_raw_materials
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_recipe_summaries_from_raw_materials();
@@ -0,0 +1,34 @@
+-- Per-recipe counter of line changes. Compiled BOMs (bom.py) record the lines_version they
+-- were built from, and reserving or consuming materials for a manufacturing order only
+-- proceeds while it is still current, so a worker whose cached BOM missed a bom_changed
+-- notification (or has not received it yet) recompiles instead of using old quantities.
+ALTER TABLE recipes ADD COLUMN IF NOT EXISTS lines_version INTEGER NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION bump_recipe_lines_version() RETURNS TRIGGER AS $$
+BEGIN
+    -- Lines deleted along with their recipe find no row to update
+    UPDATE recipes
+    SET lines_version = lines_version + 1
+    WHERE id IN (SELECT DISTINCT recipe_id FROM changed_lines);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables cannot be shared between events, hence one trigger per event
+DROP TRIGGER IF EXISTS recipe_lines_insert_bump_version ON recipe_raw_materials;
+CREATE TRIGGER recipe_lines_insert_bump_version
+    AFTER INSERT ON recipe_raw_materials
+    REFERENCING NEW TABLE AS changed_lines
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_recipe_lines_version();
+
+DROP TRIGGER IF EXISTS recipe_lines_update_bump_version ON recipe_raw_materials;
+CREATE TRIGGER recipe_lines_update_bump_version
+    AFTER UPDATE ON recipe_raw_materials
+    REFERENCING NEW TABLE AS changed_lines
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_recipe_lines_version();
+
+DROP TRIGGER IF EXISTS recipe_lines_delete_bump_version ON recipe_raw_materials;
+CREATE TRIGGER recipe_lines_delete_bump_version
+    AFTER DELETE ON recipe_raw_materials
+    REFERENCING OLD TABLE AS changed_lines
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_recipe_lines_version();
@@ -0,0 +1,65 @@
+-- Material requirements planning over every open manufacturing order in one pass.
+-- Pending orders are exploded through their product's compiled BOM (bom.py, passed as
+-- parallel arrays of product ids, raw material ids and quantities per unit), bucketed by
+-- planned start date and netted, in date order, against each material's available
+-- inventory (In Progress orders already hold their reservations, so they are covered by
+-- reserved_inventory). Returns one row per material and date where projected available
+-- inventory goes negative, with the shortage for that date and a suggested purchase
+-- quantity of at least the material's MOQ.
+WITH bom AS (
+    SELECT *
+    FROM UNNEST(%s::INTEGER[], %s::INTEGER[], %s::FLOAT[])   -- product_ids, raw_material_ids, quantities
+        AS line (product_id, raw_material_id, quantity)
+),
+requirements AS (
+    SELECT 
+        mo.planned_start_date,
+        bom.raw_material_id,
+        mo.id AS manufacturing_order_id,
+        mo.units_to_produce * bom.quantity AS required
+    FROM manufacturing_orders mo
+    JOIN bom ON bom.product_id = mo.product_id
+    WHERE mo.status = 'Pending'
+),
+phased AS (
+    SELECT 
+        raw_material_id,
+        planned_start_date,
+        SUM(required) AS gross_requirement,
+        ARRAY_AGG(DISTINCT manufacturing_order_id) AS manufacturing_order_ids
+    FROM requirements
+    GROUP BY raw_material_id, planned_start_date
+),
+projected AS (
+    SELECT 
+        p.*,
+        rm.name,
+        uom.name AS unit,
+        COALESCE(rm.moq, 0) AS moq,
+        rm.total_inventory,
+        rm.reserved_inventory,
+        rm.available_inventory,
+        rm.available_inventory - SUM(p.gross_requirement) OVER (
+            PARTITION BY p.raw_material_id 
+            ORDER BY p.planned_start_date
+        ) AS projected_available
+    FROM phased p
+    JOIN raw_materials rm ON rm.id = p.raw_material_id
+    LEFT JOIN unit_of_measure uom ON uom.id = rm.unit_of_measure_id
+)
+SELECT 
+    planned_start_date,
+    raw_material_id,
+    name,
+    unit,
+    gross_requirement,
+    total_inventory,
+    reserved_inventory,
+    available_inventory,
+    projected_available,
+    LEAST(gross_requirement, -projected_available) AS shortage,
+    GREATEST(LEAST(gross_requirement, -projected_available), moq) AS suggested_order_quantity,
+    manufacturing_order_ids
+FROM projected
+WHERE projected_available < 0
+ORDER BY planned_start_date, name, raw_material_id;
@@ -0,0 +1,2 @@
+INSERT INTO schema_version (version, name)
+VALUES (%s, %s);
@@ -0,0 +1,21 @@
+-- Releases whatever a manufacturing order still holds reserved (e.g. before deleting an
+-- In Progress MO), as release movements in the inventory ledger. Rows are locked in id
+-- order, like the reservation itself.
+WITH outstanding AS (
+    SELECT raw_material_id, SUM(reserved_delta) AS reserved
+    FROM inventory_movements
+    WHERE manufacturing_order_id = %s
+    GROUP BY raw_material_id
+    HAVING SUM(reserved_delta) > 0
+),
+locked AS (
+    SELECT rm.id, rm.reserved_inventory
+    FROM raw_materials rm
+    JOIN outstanding o ON o.raw_material_id = rm.id
+    ORDER BY rm.id
+    FOR UPDATE OF rm
+)
+INSERT INTO inventory_movements (raw_material_id, movement_type, reserved_delta, manufacturing_order_id, reason)
+SELECT o.raw_material_id, 'release', -LEAST(o.reserved, l.reserved_inventory), %s, 'Manufacturing order deleted'
+FROM outstanding o
+JOIN locked l ON l.id = o.raw_material_id;
@@ -0,0 +1,22 @@
+-- Releases whatever a product's manufacturing orders still hold reserved, as release
+-- movements in the inventory ledger, before the product (and with it its MOs) is
+-- deleted. Rows are locked in id order, like the reservation itself.
+WITH outstanding AS (
+    SELECT m.manufacturing_order_id, m.raw_material_id, SUM(m.reserved_delta) AS reserved
+    FROM inventory_movements m
+    JOIN manufacturing_orders mo ON mo.id = m.manufacturing_order_id
+    WHERE mo.product_id = %s
+    GROUP BY m.manufacturing_order_id, m.raw_material_id
+    HAVING SUM(m.reserved_delta) > 0
+),
+locked AS (
+    SELECT rm.id, rm.reserved_inventory
+    FROM raw_materials rm
+    WHERE rm.id IN (SELECT raw_material_id FROM outstanding)
+    ORDER BY rm.id
+    FOR UPDATE OF rm
+)
+INSERT INTO inventory_movements (raw_material_id, movement_type, reserved_delta, manufacturing_order_id, reason)
+SELECT o.raw_material_id, 'release', -LEAST(o.reserved, l.reserved_inventory), o.manufacturing_order_id, 'Product deleted'
+FROM outstanding o
+JOIN locked l ON l.id = o.raw_material_id;
@@ -1,4 +1,43 @@
-UPDATE raw_materials 
-SET available_quantity = available_quantity - %s, 
-    accounted_quantity = accounted_quantity + %s 
-WHERE id = %s;
+-- Reserves every raw material on the product's compiled BOM (bom.py) for a manufacturing
+-- order in one statement, as reservation movements in the inventory ledger. Rows are
+-- locked in id order so concurrent MOs cannot deadlock or oversubscribe inventory, and
+-- nothing is reserved unless every line is available.
+-- Returns one row per BOM line; is_short marks the materials that blocked the reservation.
+-- Returns no rows if the BOM's recipe is no longer active or its lines changed since the
+-- BOM was compiled (a stale cache entry).
+WITH requirements AS (
+    SELECT 
+        line.raw_material_id, 
+        line.quantity * %s AS required   -- units_to_produce
+    FROM UNNEST(%s::INTEGER[], %s::FLOAT[]) AS line (raw_material_id, quantity)   -- raw_material_ids, quantities
+    WHERE EXISTS (
+        SELECT 1 FROM recipes 
+        WHERE id = %s AND active = TRUE AND lines_version = %s   -- recipe_id, lines_version
+    )
+),
+locked AS (
+    SELECT 
+        rm.id, 
+        rm.name, 
+        req.required, 
+        rm.available_inventory
+    FROM raw_materials rm
+    JOIN requirements req ON req.raw_material_id = rm.id
+    ORDER BY rm.id
+    FOR UPDATE OF rm
+),
+reserved AS (
+    INSERT INTO inventory_movements (raw_material_id, movement_type, reserved_delta, manufacturing_order_id, reason)
+    SELECT l.id, 'reservation', l.required, %s, 'Manufacturing order started'   -- manufacturing_order_id
+    FROM locked l
+    WHERE NOT EXISTS (SELECT 1 FROM locked WHERE available_inventory < required)
+    RETURNING id
+)
+SELECT 
+    l.id, 
+    l.name, 
+    l.required, 
+    l.available_inventory, 
+    l.available_inventory < l.required AS is_short
+FROM locked l
+ORDER BY l.id;
@@ -1,4 +1,28 @@
-SELECT id, name
-FROM products
-WHERE name ILIKE %s
-ORDER BY name ASC;
+-- Autocomplete search over product name, SKU, category and flavor.
+-- Each branch of the candidate set is served by a pg_trgm GIN index (see migration 0003).
+-- Ranking: exact SKU match first, then name prefix matches, then trigram similarity.
+WITH candidates AS (
+    SELECT id
+    FROM products
+    WHERE name ILIKE %s    -- contains pattern
+       OR sku ILIKE %s     -- contains pattern
+    UNION
+    SELECT p.id
+    FROM products p
+    JOIN categories c ON p.category_id = c.id
+    WHERE c.name ILIKE %s  -- contains pattern
+    UNION
+    SELECT p.id
+    FROM products p
+    JOIN flavors f ON p.flavor_id = f.id
+    WHERE f.name ILIKE %s  -- contains pattern
+)
+SELECT p.id, p.name
+FROM candidates
+JOIN products p ON p.id = candidates.id
+ORDER BY 
+    LOWER(p.sku) = LOWER(%s) DESC,   -- raw query
+    p.name ILIKE %s DESC,            -- prefix pattern
+    similarity(p.name, %s) DESC,     -- raw query
+    p.name ASC
+LIMIT %s;
@@ -1,3 +1,5 @@
+-- Locks the order so concurrent status changes on the same MO are applied one at a time
 SELECT product_id, units_to_produce, status 
 FROM manufacturing_orders 
-WHERE id = %s;
+WHERE id = %s
+FOR UPDATE;
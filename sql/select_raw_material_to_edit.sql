@@ -6,7 +6,13 @@ SELECT
     raw_materials.unit_of_measure_id,
     unit_of_measure.name AS unit_of_measure_name,
     raw_materials.moq,
-    raw_materials.tags,
+    ARRAY(
+        SELECT t.name
+        FROM raw_material_tags rmt
+        JOIN tags t ON t.id = rmt.tag_id
+        WHERE rmt.raw_material_id = raw_materials.id
+        ORDER BY t.name
+    ) AS tags,
     raw_materials.created_at,
     raw_materials.updated_at
 FROM raw_materials
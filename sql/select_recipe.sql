@@ -1,5 +1,5 @@
 SELECT 
-    r.id, p.name AS product_name, r.created_at, r.updated_at
+    r.id, p.name AS product_name, r.created_at, r.version, r.product_id
 FROM 
     recipes r
 JOIN 
@@ -0,0 +1,26 @@
+-- Replaces a raw material's tags with the given list of names, creating missing tags
+WITH wanted AS (
+    SELECT DISTINCT TRIM(name) AS name
+    FROM UNNEST(%s::text[]) AS name
+    WHERE TRIM(name) <> ''
+),
+new_tags AS (
+    INSERT INTO tags (name)
+    SELECT name FROM wanted
+    ON CONFLICT (name) DO NOTHING
+    RETURNING id
+),
+-- Tags created above are not visible to the other parts of this statement, hence the UNION
+wanted_ids AS (
+    SELECT id FROM new_tags
+    UNION
+    SELECT t.id FROM tags t JOIN wanted w ON w.name = t.name
+),
+removed AS (
+    DELETE FROM raw_material_tags
+    WHERE raw_material_id = %s
+      AND tag_id NOT IN (SELECT id FROM wanted_ids)
+)
+INSERT INTO raw_material_tags (raw_material_id, tag_id)
+SELECT %s, id FROM wanted_ids
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,29 @@
+-- Brings a recipe's lines in line with the submitted form in one statement, touching
+-- only what changed: lines no longer listed are deleted, new ones inserted and changed
+-- quantities updated. Unchanged lines are left alone, so edits do not churn the table,
+-- its indexes or the triggers that follow recipe lines.
+-- Returns how many lines were inserted, updated and deleted.
+WITH desired AS (
+    SELECT raw_material_id, quantity
+    FROM UNNEST(%s::INTEGER[], %s::FLOAT[]) AS line (raw_material_id, quantity)   -- raw_material_ids, quantities
+),
+removed AS (
+    DELETE FROM recipe_raw_materials rr
+    WHERE rr.recipe_id = %s   -- recipe_id
+      AND NOT EXISTS (SELECT 1 FROM desired d WHERE d.raw_material_id = rr.raw_material_id)
+    RETURNING rr.raw_material_id
+),
+upserted AS (
+    INSERT INTO recipe_raw_materials (recipe_id, raw_material_id, quantity)
+    SELECT %s, d.raw_material_id, d.quantity   -- recipe_id
+    FROM desired d
+    ON CONFLICT (recipe_id, raw_material_id) DO UPDATE
+        SET quantity = EXCLUDED.quantity,
+            updated_at = NOW()
+        WHERE recipe_raw_materials.quantity IS DISTINCT FROM EXCLUDED.quantity
+    RETURNING raw_material_id, (xmax = 0) AS inserted
+)
+SELECT 
+    (SELECT COUNT(*) FROM upserted WHERE inserted) AS inserted,
+    (SELECT COUNT(*) FROM upserted WHERE NOT inserted) AS updated,
+    (SELECT COUNT(*) FROM removed) AS deleted;
@@ -1,3 +1,4 @@
 UPDATE manufacturing_orders 
-SET status = %s 
+SET status = %s, 
+    updated_at = CURRENT_TIMESTAMP
 WHERE id = %s;
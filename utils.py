@@ -1,26 +1,521 @@
 
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+import base64
+import binascii
+import datetime
+import glob
+import itertools
+import json
+import math
 import os
+import re
+import threading
+import time
+
+from collections import OrderedDict
+
+from flask import g, has_app_context, jsonify, url_for
+
+from metrics import observe_connection_wait, observe_sql
+
+# Connection pool settings. Each gunicorn worker process builds its own pool,
+# so the total number of Postgres connections is (workers x PG_POOL_MAX).
+POOL_MIN_CONNECTIONS = int(os.environ.get("PG_POOL_MIN", "1"))
+POOL_MAX_CONNECTIONS = int(os.environ.get("PG_POOL_MAX", "5"))
+POOL_CHECKOUT_TIMEOUT = float(os.environ.get("PG_POOL_TIMEOUT", "10"))  # seconds
+POOL_MAX_LIFETIME = float(os.environ.get("PG_POOL_MAX_LIFETIME", "1800"))  # seconds
+POOL_HEALTHCHECK_IDLE = float(os.environ.get("PG_POOL_HEALTHCHECK_IDLE", "30"))  # seconds
+
+# Opt-in server-side prepared statements for queries run through execute_sql()
+USE_PREPARED_STATEMENTS = os.environ.get("PG_PREPARED_STATEMENTS", "0") == "1"
+
+# Page size limits for the keyset-paginated list pages and JSON endpoints
+DEFAULT_PAGE_SIZE = int(os.environ.get("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "500"))
+SEARCH_RESULT_LIMIT = int(os.environ.get("SEARCH_RESULT_LIMIT", "20"))
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+SQL_REFERENCE_PATTERN = re.compile(r"""["'](sql/[\w./-]+\.sql)["']""")
+
+_pool = None
+_pool_pid = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+
+_sql_registry = {}
+_sql_filenames = {}  # SQL text -> sql/ file name, for per-file metrics
+_server_cursor_ids = itertools.count(1)
+
+
+class TTLCache:
+  """
+  Small thread-safe in-process cache. Entries expire after ttl seconds and the
+  least recently used entry is evicted once maxsize is reached.
+  """
+
+  def __init__(self, ttl: float, maxsize: int = 256):
+    self.ttl = ttl
+    self.maxsize = maxsize
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key, default=None):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return default
+      expires_at, value = entry
+      if expires_at < time.monotonic():
+        del self._entries[key]
+        return default
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value):
+    with self._lock:
+      self._entries[key] = (time.monotonic() + self.ttl, value)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.maxsize:
+        self._entries.popitem(last=False)
+
+  def delete(self, key):
+    with self._lock:
+      self._entries.pop(key, None)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+
+
+class _InstrumentedCursor(psycopg2.extensions.cursor):
+  """
+  psycopg2 cursor that times every statement and reports it under the sql/
+  file it was loaded from, or "inline" for SQL written in Python.
+  """
+
+  def execute(self, query, vars=None):
+    started_at = time.perf_counter()
+    try:
+      return super().execute(query, vars)
+    finally:
+      observe_sql(_sql_filenames.get(query, "inline"),
+                  time.perf_counter() - started_at, self.rowcount)
+
+
+class _TrackedConnection(psycopg2.extensions.connection):
+  """
+  psycopg2 connection that remembers when it was opened and last handed out,
+  so the pool can recycle old connections and health check idle ones.
+  """
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.cursor_factory = _InstrumentedCursor
+    self.opened_at = time.monotonic()
+    self.last_used_at = self.opened_at
+    self.prepared_statements = set()
+
+
+class PooledConnection:
+  """
+  Proxy around a connection checked out of the pool. Behaves like a regular
+  psycopg2 connection, except close() hands the connection back to the pool
+  instead of tearing down the session.
+  """
+
+  def __init__(self, conn):
+    self._conn = conn
+    self._returned = False
+
+  def __getattr__(self, name):
+    return getattr(self._conn, name)
+
+  def __enter__(self):
+    return self._conn.__enter__()
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    return self._conn.__exit__(exc_type, exc_value, traceback)
+
+  @property
+  def closed(self):
+    return 1 if self._returned else self._conn.closed
+
+  def close(self):
+    if self._returned:
+      return
+    self._returned = True
+    _release_connection(self._conn)
+
+
+def get_connection_params() -> dict:
+  """
+  Returns the psycopg2.connect() keyword arguments for the Replit-hosted
+  Postgres database.
+  """
+  return {
+      "host": os.environ.get("PGHOST", "localhost"),
+      "database": os.environ.get("PGDATABASE", "replitdb"),
+      "user": os.environ.get("PGUSER", "user"),
+      "password": os.environ.get("PGPASSWORD", "password"),
+  }
+
+
+def _get_pool():
+  """
+  Returns the connection pool for the current process, creating it on first
+  use. A pool inherited across fork() is discarded (not closed, since the
+  parent still owns those sockets) and rebuilt for the worker.
+  """
+  global _pool, _pool_pid, _pool_slots
+
+  pid = os.getpid()
+  if _pool is not None and _pool_pid == pid:
+    return _pool
+
+  with _pool_lock:
+    if _pool is None or _pool_pid != pid:
+      _pool = psycopg2.pool.ThreadedConnectionPool(
+          POOL_MIN_CONNECTIONS,
+          POOL_MAX_CONNECTIONS,
+          connection_factory=_TrackedConnection,
+          **get_connection_params()
+      )
+      _pool_slots = threading.BoundedSemaphore(POOL_MAX_CONNECTIONS)
+      _pool_pid = pid
+  return _pool
+
+
+def _is_healthy(conn) -> bool:
+  """
+  Checks that a pooled connection is still usable before handing it out.
+  """
+  if conn.closed:
+    return False
+  if time.monotonic() - conn.opened_at > POOL_MAX_LIFETIME:
+    return False
+  if time.monotonic() - conn.last_used_at > POOL_HEALTHCHECK_IDLE:
+    try:
+      with conn.cursor() as cursor:
+        cursor.execute("SELECT 1;")
+      conn.rollback()
+    except psycopg2.Error:
+      return False
+  return True
+
+
+def _checkout_connection():
+  """
+  Takes a healthy connection out of the pool, waiting up to
+  PG_POOL_TIMEOUT seconds for one to become free.
+  """
+  pool = _get_pool()
+  if not _pool_slots.acquire(timeout=POOL_CHECKOUT_TIMEOUT):
+    raise psycopg2.pool.PoolError(
+        f"Timed out after {POOL_CHECKOUT_TIMEOUT}s waiting for a database connection")
+
+  try:
+    conn = pool.getconn()
+    while not _is_healthy(conn):
+      pool.putconn(conn, close=True)
+      conn = pool.getconn()
+  except Exception:
+    _pool_slots.release()
+    raise
+
+  conn.last_used_at = time.monotonic()
+  return conn
+
+
+def _release_connection(conn):
+  """
+  Returns a connection to the pool. Any open transaction is rolled back by the
+  pool; connections past their max lifetime are closed instead of reused.
+  """
+  try:
+    expired = time.monotonic() - conn.opened_at > POOL_MAX_LIFETIME
+    _pool.putconn(conn, close=bool(conn.closed) or expired)
+  finally:
+    _pool_slots.release()
+
+
+def release_request_connections(exception=None):  # noqa: ARG001 (teardown hook signature)
+  """
+  Flask teardown hook: returns every connection checked out during the
+  request, including ones a route forgot to close or skipped because of an
+  exception.
+  """
+  for conn in g.pop("db_connections", []):
+    conn.close()
+
+
+def init_db_pool(app):
+  """
+  Registers the request-scoped connection cleanup on the Flask app.
+  """
+  app.teardown_appcontext(release_request_connections)
 
 
 def get_db_connection():
   """
-  Returns a new psycopg2 connection to the Replit-hosted Postgres database.
+  Returns a pooled psycopg2 connection to the Replit-hosted Postgres database.
+  Calling close() on it returns it to the pool.
   """
-  conn = psycopg2.connect(
-      host=os.environ.get("PGHOST", "localhost"),
-      database=os.environ.get("PGDATABASE", "replitdb"),
-      user=os.environ.get("PGUSER", "user"),
-      password=os.environ.get("PGPASSWORD", "password")
-  )
+  started_at = time.perf_counter()
+  conn = PooledConnection(_checkout_connection())
+  observe_connection_wait(time.perf_counter() - started_at)
+  if has_app_context():
+    g.setdefault("db_connections", []).append(conn)
   return conn
 
 
+def load_sql_registry() -> dict:
+  """
+  Reads every sql/*.sql file into the in-memory statement registry, keyed by
+  the same relative path routes pass to load_sql_file().
+  """
+  for sql_path in sorted(glob.glob(os.path.join(BASE_PATH, "sql", "*.sql"))):
+    filename = os.path.relpath(sql_path, BASE_PATH).replace(os.sep, "/")
+    with open(sql_path, "r", encoding="utf-8") as f:
+      _sql_registry[filename] = f.read()
+    _sql_filenames[_sql_registry[filename]] = filename
+  return _sql_registry
+
+
+def init_sql_registry(app):
+  """
+  Preloads the SQL registry at startup and checks that every sql/ file named
+  in the app's modules exists, so a missing statement fails at boot rather
+  than mid-request.
+  """
+  load_sql_registry()
+
+  missing = set()
+  for source_path in glob.glob(os.path.join(app.root_path, "*.py")):
+    with open(source_path, "r", encoding="utf-8") as f:
+      for filename in SQL_REFERENCE_PATTERN.findall(f.read()):
+        if filename not in _sql_registry:
+          missing.add(filename)
+
+  if missing:
+    raise FileNotFoundError(
+        f"Referenced SQL files not found: {', '.join(sorted(missing))}")
+
+
 def load_sql_file(filename: str) -> str:
   """
-  Loads a SQL file from the specified filename.
+  Returns the SQL text for the specified filename from the registry, reading
+  and caching it on first use if it was not preloaded.
+  """
+  query = _sql_registry.get(filename)
+  if query is None:
+    sql_path = os.path.join(BASE_PATH, filename)
+    with open(sql_path, "r", encoding="utf-8") as f:
+      query = _sql_registry[filename] = f.read()
+    _sql_filenames[query] = filename
+  return query
+
+
+def _to_positional(query: str) -> str:
+  """
+  Rewrites psycopg2 %s placeholders as $1, $2, ... for use in PREPARE.
+  """
+  position = 0
+
+  def replace(match):
+    nonlocal position
+    if match.group(0) == "%%":
+      return "%"
+    position += 1
+    return f"${position}"
+
+  return re.sub(r"%%|%s", replace, query.strip().rstrip(";"))
+
+
+def execute_sql(cursor, filename: str, params=()):
+  """
+  Executes a registered SQL file on the cursor. With PG_PREPARED_STATEMENTS=1
+  the statement is PREPAREd once per pooled connection and run with EXECUTE
+  afterwards, so Postgres skips re-parsing and re-planning it.
+  """
+  query = load_sql_file(filename)
+  prepared = getattr(cursor.connection, "prepared_statements", None)
+  if not USE_PREPARED_STATEMENTS or prepared is None:
+    cursor.execute(query, params)
+    return
+
+  name = os.path.splitext(os.path.basename(filename))[0]
+  if name not in prepared:
+    cursor.execute(f"PREPARE {name} AS {_to_positional(query)}")
+    prepared.add(name)
+
+  if params:
+    placeholders = ", ".join(["%s"] * len(params))
+    statement = f"EXECUTE {name} ({placeholders})"
+  else:
+    statement = f"EXECUTE {name}"
+  _sql_filenames.setdefault(statement, filename)
+  cursor.execute(statement, params or None)
+
+
+def open_server_cursor(conn, filename: str, params=(), itersize: int = 2000):
+  """
+  Runs a registered SQL file on a named (server-side) cursor, so Postgres
+  keeps the result and fetchmany() pulls it over in batches instead of the
+  whole result landing in memory at once. The cursor lives until the
+  transaction ends; close it before returning the connection. Prepared
+  statements are not used: Postgres cannot DECLARE a cursor over EXECUTE.
+  """
+  cursor = conn.cursor(name=f"server_cursor_{next(_server_cursor_ids)}")
+  cursor.itersize = itersize
+  cursor.execute(load_sql_file(filename), params)
+  return cursor
+
+
+def get_page_size(args, default: int = DEFAULT_PAGE_SIZE) -> int:
+  """
+  Reads the 'limit' query parameter, clamped to 1..MAX_PAGE_SIZE.
+  """
+  try:
+    limit = int(args.get("limit", default))
+  except (TypeError, ValueError):
+    limit = default
+  return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(*values) -> str:
   """
-  base_path = os.path.dirname(os.path.abspath(__file__))
-  sql_path = os.path.join(base_path, filename)
-  with open(sql_path, "r", encoding="utf-8") as f:
-      return f.read()
\ No newline at end of file
+  Encodes the sort key of the last row on a page as an opaque, URL-safe
+  next-page token.
+  """
+  values = [
+      value.isoformat()
+      if isinstance(value, (datetime.date, datetime.datetime)) else value
+      for value in values
+  ]
+  token = base64.urlsafe_b64encode(json.dumps(values).encode("utf-8"))
+  return token.decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, *types) -> list:
+  """
+  Decodes a next-page token back into its sort key values, one per type in
+  types (int, str, datetime.date or datetime.datetime; the date types are
+  parsed back from their ISO format). An empty token (first page) decodes to
+  a list of None. Raises ValueError if the token is malformed or a value does
+  not match its type, so a tampered token is a 400 rather than a database
+  error.
+  """
+  if not token:
+    return [None] * len(types)
+
+  try:
+    padded = token + "=" * (-len(token) % 4)
+    values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+  except (ValueError, binascii.Error) as e:
+    raise ValueError("Invalid page cursor") from e
+
+  if not isinstance(values, list) or len(values) != len(types):
+    raise ValueError("Invalid page cursor")
+  return [_decode_cursor_value(value, value_type)
+          for value, value_type in zip(values, types, strict=True)]
+
+
+def _decode_cursor_value(value, value_type):
+  if value is None:
+    return None
+  if value_type in (datetime.date, datetime.datetime) and isinstance(value, str):
+    try:
+      return value_type.fromisoformat(value)
+    except ValueError as e:
+      raise ValueError("Invalid page cursor") from e
+  # bool is an int subclass, but never a sort key
+  if isinstance(value, value_type) and not isinstance(value, bool):
+    return value
+  raise ValueError("Invalid page cursor")
+
+
+def split_page(rows, limit: int, cursor_key):
+  """
+  Splits a result fetched with LIMIT limit + 1 into the page itself and the
+  next-page token (None on the last page). cursor_key maps a row to the
+  values of its sort key.
+  """
+  if len(rows) <= limit:
+    return rows, None
+  rows = rows[:limit]
+  return rows, encode_cursor(*cursor_key(rows[-1]))
+
+
+def jsonify_page(items, next_cursor, endpoint: str, limit: int, **url_args):
+  """
+  Returns a JSON array response for one page of results. The next-page token
+  is sent in an X-Next-Cursor header plus a Link rel="next" header, so the
+  body stays a plain array for existing callers.
+  """
+  response = jsonify(items)
+  if next_cursor:
+    next_url = url_for(endpoint, after=next_cursor, limit=limit, **url_args)
+    response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
+  return response
+
+
+def escape_like(value: str) -> str:
+  """
+  Escapes LIKE/ILIKE wildcards so user input is matched literally.
+  """
+  return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def parse_tag_input(value) -> list:
+  """
+  Parses the tags field of the raw material forms into a list of distinct,
+  non-empty tag names. Accepts either a Tagify JSON value
+  ('[{"value": "a"}, ...]') or a comma-separated string.
+  """
+  if not value:
+    return []
+
+  try:
+    parsed = json.loads(value)
+  except ValueError:
+    parsed = None
+
+  if isinstance(parsed, list):
+    names = [
+        item.get("value", "") if isinstance(item, dict) else str(item)
+        for item in parsed
+    ]
+  else:
+    names = value.split(",")
+
+  return list(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+def parse_recipe_lines(raw_material_ids: list, quantities: list) -> tuple:
+  """
+  Parses the raw_material_id[] / quantity[] rows of the recipe forms into
+  parallel lists of raw material ids and quantities, ordered by raw material
+  id. Raises ValueError for an incomplete row, a quantity that is not a
+  positive number or a raw material listed twice.
+  """
+  if len(raw_material_ids) != len(quantities):
+    raise ValueError("Every recipe line needs a raw material and a quantity.")
+
+  lines = {}
+  for raw_material_id, quantity in zip(raw_material_ids, quantities, strict=True):
+    try:
+      raw_material_id = int(raw_material_id)
+      quantity = float(quantity)
+    except (TypeError, ValueError) as e:
+      raise ValueError("Every recipe line needs a raw material and a quantity.") from e
+    if not math.isfinite(quantity) or quantity <= 0:
+      raise ValueError("Recipe quantities must be positive numbers.")
+    if raw_material_id in lines:
+      raise ValueError("A raw material can only appear once in a recipe.")
+    lines[raw_material_id] = quantity
+
+  ids = sorted(lines)
+  return ids, [lines[raw_material_id] for raw_material_id in ids]